@@ -8,11 +8,9 @@ from django.conf import settings
 from django.core.mail import EmailMessage
 from .models import (
     Empleado, Plan, Promocion, Servicio, Huesped,
-    Rol, Permiso, RolPermiso, UsuarioRol
+    Rol, Permiso, RolPermiso, UsuarioRol, CorreoSaliente, Campana, EnvioCampana
 )
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
-from django.core.mail import EmailMultiAlternatives
+from . import campanas
 from django.utils import timezone
 
 
@@ -95,6 +93,40 @@ class UsuarioRolAdmin(admin.ModelAdmin):
         return super().get_queryset(request).select_related('usuario', 'rol', 'asignado_por')
 
 
+@admin.register(CorreoSaliente)
+class CorreoSalienteAdmin(admin.ModelAdmin):
+    list_display = ['asunto', 'destinatarios', 'estado', 'intentos', 'proximo_intento', 'fecha_creacion', 'fecha_envio']
+    list_filter = ['estado', 'fecha_creacion']
+    search_fields = ['asunto', 'destinatarios']
+    readonly_fields = ['intentos', 'ultimo_error', 'fecha_creacion', 'fecha_inicio', 'fecha_envio']
+    actions = ['reintentar']
+
+    def reintentar(self, request, queryset):
+        """Vuelve a poner en cola correos fallidos (send_outbox los toma en la próxima pasada)"""
+        actualizados = queryset.filter(estado='fallido').update(
+            estado='pendiente', intentos=0, proximo_intento=timezone.now()
+        )
+        self.message_user(request, f'{actualizados} correo(s) vuelven a la cola.')
+    reintentar.short_description = "Reintentar correos fallidos"
+
+
+class EnvioCampanaInline(admin.TabularInline):
+    model = EnvioCampana
+    extra = 0
+    can_delete = False
+    fields = ['email', 'estado', 'error', 'fecha_envio']
+    readonly_fields = fields
+
+
+@admin.register(Campana)
+class CampanaAdmin(admin.ModelAdmin):
+    list_display = ['asunto', 'tipo', 'estado', 'total', 'excluidos', 'creada_por', 'fecha_creacion', 'fecha_fin']
+    list_filter = ['tipo', 'estado', 'fecha_creacion']
+    search_fields = ['asunto']
+    readonly_fields = ['total', 'excluidos', 'error', 'fecha_creacion', 'fecha_inicio', 'fecha_actualizacion', 'fecha_fin']
+    inlines = [EnvioCampanaInline]
+
+
 # Extender el UserAdmin para mostrar roles
 class UserAdmin(BaseUserAdmin):
     inlines = BaseUserAdmin.inlines + (UsuarioRolInline,)
@@ -127,47 +159,16 @@ class PlanAdmin(admin.ModelAdmin):
     actions = ['enviar_plan_por_email']
 
     def enviar_plan_por_email(self, request, queryset):
-        """Envía el plan seleccionado por email a usuarios con notificaciones activadas (HTML + CTA)."""
-        users = User.objects.filter(is_active=True).exclude(email="").select_related('profile')
-        recipients = []
-        for u in users:
-            try:
-                prefs = getattr(u.profile, 'preferences', {}) or {}
-                if prefs.get('notifications_enabled', True):
-                    recipients.append(u.email)
-            except Exception:
-                recipients.append(u.email)
-        recipients = list(dict.fromkeys(recipients))
-        if not recipients:
-            self.message_user(request, 'No hay usuarios con notificaciones activadas o emails válidos.', level='warning')
-            return
-        enviados = 0
-        today = timezone.now().date()
+        """Crea una campaña por plan seleccionado para usuarios con notificaciones activadas (la envía `enviar_campanas`)."""
+        creadas = 0
         for plan in queryset:
-            subject = f"Plan: {plan.nombre}"
-            plan_url = request.build_absolute_uri(reverse('detalle_plan', args=[plan.id]))
-            imagen_url = request.build_absolute_uri(plan.imagen.url) if getattr(plan, 'imagen', None) else None
-
-            html_body = render_to_string('emails/plan_email.html', {
-                'plan': plan,
-                'plan_url': plan_url,
-                'imagen_url': imagen_url,
-                'year': today.year,
-            })
-            text_body = strip_tags(html_body)
-            try:
-                email = EmailMultiAlternatives(
-                    subject=subject,
-                    body=text_body,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    bcc=recipients,
-                )
-                email.attach_alternative(html_body, "text/html")
-                email.send(fail_silently=False)
-                enviados += 1
-            except Exception as e:
-                self.message_user(request, f'Error al enviar "{plan.nombre}": {e}', level='error')
-        self.message_user(request, f"Planes enviados: {enviados}. Destinatarios: {len(recipients)} usuarios.")
+            asunto, html = campanas.contenido_plan(plan, request.build_absolute_uri)
+            campana = campanas.crear('planes', asunto, html, request.user)
+            if campana is None:
+                self.message_user(request, 'No hay usuarios con notificaciones activadas o emails válidos.', level='warning')
+                return
+            creadas += 1
+        self.message_user(request, f"Campañas en cola: {creadas}. Destinatarios: {campana.total} usuarios.")
     enviar_plan_por_email.short_description = 'Enviar plan por email a usuarios (respeta notificaciones)'
 
 
@@ -190,54 +191,16 @@ class PromocionAdmin(admin.ModelAdmin):
     activa.short_description = 'Activa'
 
     def enviar_promocion_por_email(self, request, queryset):
-        """Envía la promoción seleccionada por email a usuarios con notificaciones activadas (HTML + CTA)."""
-        users = User.objects.filter(is_active=True).exclude(email="").select_related('profile')
-        recipients = []
-        for u in users:
-            try:
-                prefs = getattr(u.profile, 'preferences', {}) or {}
-                if prefs.get('notifications_enabled', True):
-                    recipients.append(u.email)
-            except Exception:
-                recipients.append(u.email)
-        recipients = list(dict.fromkeys(recipients))
-        if not recipients:
-            self.message_user(request, 'No hay usuarios con notificaciones activadas o emails válidos.', level='warning')
-            return
-        enviados = 0
-        today = timezone.now().date()
+        """Crea una campaña por promoción seleccionada para usuarios con notificaciones activadas (la envía `enviar_campanas`)."""
+        creadas = 0
         for promo in queryset:
-            subject = f"Promoción: {promo.nombre} ({promo.descuento}%)"
-            is_active = promo.fecha_inicio <= today <= promo.fecha_fin
-            estado = 'activa' if is_active else ('proxima' if today < promo.fecha_inicio else 'finalizada')
-            dias_restantes = (promo.fecha_fin - today).days if is_active else 0
-            dias_para_inicio = (promo.fecha_inicio - today).days if today < promo.fecha_inicio else 0
-            promo_url = request.build_absolute_uri(reverse('promocion_detalle', args=[promo.id]))
-            imagen_url = request.build_absolute_uri(promo.imagen.url) if getattr(promo, 'imagen', None) else None
-
-            html_body = render_to_string('emails/promocion_email.html', {
-                'promocion': promo,
-                'estado': estado,
-                'dias_restantes': dias_restantes,
-                'dias_para_inicio': dias_para_inicio,
-                'promo_url': promo_url,
-                'imagen_url': imagen_url,
-                'year': today.year,
-            })
-            text_body = strip_tags(html_body)
-            try:
-                email = EmailMultiAlternatives(
-                    subject=subject,
-                    body=text_body,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    bcc=recipients,
-                )
-                email.attach_alternative(html_body, "text/html")
-                email.send(fail_silently=False)
-                enviados += 1
-            except Exception as e:
-                self.message_user(request, f'Error al enviar "{promo.nombre}": {e}', level='error')
-        self.message_user(request, f"Promociones enviadas: {enviados}. Destinatarios: {len(recipients)} usuarios.")
+            asunto, html = campanas.contenido_promocion(promo, request.build_absolute_uri)
+            campana = campanas.crear('promociones', asunto, html, request.user)
+            if campana is None:
+                self.message_user(request, 'No hay usuarios con notificaciones activadas o emails válidos.', level='warning')
+                return
+            creadas += 1
+        self.message_user(request, f"Campañas en cola: {creadas}. Destinatarios: {campana.total} usuarios.")
     enviar_promocion_por_email.short_description = 'Enviar promoción por email a usuarios (respeta notificaciones)'
 
 
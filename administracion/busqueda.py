@@ -0,0 +1,219 @@
+"""
+Búsqueda de los listados de administración.
+
+Cada objeto indexado guarda en DocumentoBusqueda el texto de sus campos
+(en minúsculas, sin acentos ni puntuación), y la base mantiene sobre esa
+columna su índice de texto completo (ver la migración 0004):
+
+- SQLite: tabla virtual FTS5 con tokenizador trigram, sincronizada por
+  triggers. Coincide en cualquier parte de la palabra ("mart" encuentra
+  "jmartinez") y ordena por bm25.
+- MariaDB/MySQL: índice FULLTEXT, consultado en modo booleano por prefijo
+  de palabra y ordenado por relevancia.
+- Otras bases: LIKE sobre la columna normalizada (un recorrido, pero de una
+  sola columna y sin OR).
+
+Las palabras de una o dos letras buscan el comienzo de palabra; las que el
+índice no cubre se filtran dentro de sus resultados. Las señales de
+administracion.models mantienen los documentos al día; las escrituras masivas
+(que no disparan señales) llaman a `indexar_ids`, y `indexar_busqueda` los
+reconstruye.
+"""
+import re
+import unicodedata
+
+from django.contrib import messages
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Case, IntegerField, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Length
+
+from .models import DocumentoBusqueda, Huesped, Plan, Promocion, Servicio
+
+
+# indice: (modelo, campos indexados)
+INDICES = {
+    'usuarios': (User, ('username', 'email', 'first_name', 'last_name')),
+    'huespedes': (Huesped, ('nombre', 'apellido', 'dni', 'email', 'telefono')),
+    'planes': (Plan, ('nombre', 'descripcion')),
+    'promociones': (Promocion, ('nombre', 'descripcion')),
+    'servicios': (Servicio, ('nombre', 'descripcion')),
+}
+
+# Tabla FTS5 sobre DocumentoBusqueda.texto (sólo SQLite)
+TABLA_FTS = 'administracion_documentobusqueda_fts'
+
+# Máximo de IDs que devuelve search() y que ordena filtrar() por relevancia
+MAX_RESULTADOS = 500
+
+_SEPARADORES = re.compile(r'[^0-9a-z]+')
+
+
+def indice_de(modelo):
+    for indice, (modelo_indice, _campos) in INDICES.items():
+        if modelo is modelo_indice:
+            return indice
+    return None
+
+
+def palabras(texto):
+    """Palabras en minúsculas y sin acentos; puntos y guiones no cortan ('12.345.678' -> '12345678')."""
+    texto = unicodedata.normalize('NFKD', str(texto or '')).encode('ascii', 'ignore').decode()
+    texto = texto.lower().replace('.', '').replace('-', '')
+    return [p for p in _SEPARADORES.split(texto) if p]
+
+
+def texto_de(valores):
+    """Texto a indexar; empieza con un espacio para poder buscar ' palabra' como comienzo de palabra."""
+    return ' ' + ' '.join(p for valor in valores for p in palabras(valor))
+
+
+def _documento(indice, objeto_id, valores):
+    return DocumentoBusqueda(indice=indice, objeto_id=objeto_id, texto=texto_de(valores))
+
+
+def _guardar(documentos, batch_size=None):
+    DocumentoBusqueda.objects.bulk_create(
+        documentos,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['indice', 'objeto_id'],
+        update_fields=['texto'],
+    )
+
+
+def indexar(objeto, indice=None):
+    """(Re)indexa un objeto de uno de los modelos de INDICES (un solo upsert)."""
+    indice = indice or indice_de(type(objeto))
+    _modelo, campos = INDICES[indice]
+    _guardar([_documento(indice, objeto.pk, [getattr(objeto, campo) for campo in campos])])
+
+
+def indexar_ids(indice, ids, lote=1000):
+    """
+    (Re)indexa los objetos de `indice` con esos IDs leyéndolos de la base: para
+    escrituras masivas (bulk_create, update) que no disparan post_save.
+    """
+    modelo, campos = INDICES[indice]
+    filas = modelo.objects.filter(pk__in=list(ids)).order_by().values_list('pk', *campos)
+    documentos = [_documento(indice, fila[0], fila[1:]) for fila in filas]
+    _guardar(documentos, batch_size=lote)
+    return len(documentos)
+
+
+def desindexar(indice, objeto_id):
+    DocumentoBusqueda.objects.filter(indice=indice, objeto_id=objeto_id).delete()
+
+
+def reindexar(indice, lote=1000):
+    """Reconstruye un índice completo. Devuelve la cantidad de objetos indexados."""
+    modelo, campos = INDICES[indice]
+    DocumentoBusqueda.objects.filter(indice=indice).delete()
+    documentos, total = [], 0
+    for fila in modelo.objects.order_by().values_list('pk', *campos).iterator(chunk_size=lote):
+        documentos.append(_documento(indice, fila[0], fila[1:]))
+        if len(documentos) >= lote:
+            _guardar(documentos)
+            total += len(documentos)
+            documentos = []
+    _guardar(documentos)
+    return total + len(documentos)
+
+
+def search(indice, consulta, limite=MAX_RESULTADOS):
+    """
+    IDs de los objetos de `indice` que coinciden con todas las palabras de
+    `consulta`, del más al menos relevante (a lo sumo `limite`; None = todos).
+    """
+    sql = _sql_busqueda(indice, consulta)
+    if sql is None:
+        return []
+    sql, params = sql
+    if limite is not None:
+        sql, params = f'{sql} LIMIT %s', [*params, limite]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [fila[0] for fila in cursor.fetchall()]
+
+
+def coincidencias(indice, consulta):
+    """Subconsulta con los IDs de todos los objetos que coinciden, para usar en `campo__in`."""
+    sql = _sql_busqueda(indice, consulta)
+    return RawSQL(*sql) if sql else []
+
+
+def _sql_busqueda(indice, consulta):
+    """(sql, params) de la búsqueda, ordenada por relevancia y sin LIMIT; None si no hay palabras."""
+    todas = palabras(consulta)
+    largas = [p for p in todas if len(p) >= 3]
+    cortas = [p for p in todas if len(p) < 3]
+    if not todas:
+        return None
+    if connection.vendor == 'sqlite':
+        # ' ab' (comienzo de palabra) también es un trigrama del índice
+        trigramas = largas + [f' {p}' for p in cortas if len(p) == 2]
+        if trigramas:
+            return _sql_fts5(indice, trigramas, [p for p in cortas if len(p) == 1])
+    if largas and connection.vendor == 'mysql':
+        return _sql_fulltext(indice, largas, cortas)
+
+    documentos = DocumentoBusqueda.objects.filter(indice=indice)
+    for palabra in largas:
+        documentos = documentos.filter(texto__contains=palabra)
+    for palabra in cortas:
+        documentos = documentos.filter(texto__contains=f' {palabra}')
+    documentos = documentos.order_by(Length('texto'), '-objeto_id')
+    return documentos.values_list('objeto_id', flat=True).query.sql_with_params()
+
+
+def _filtro_cortas(cortas, columna):
+    return ''.join(f' AND {columna} LIKE %s' for _ in cortas), [f'% {p}%' for p in cortas]
+
+
+def _sql_fts5(indice, terminos, cortas):
+    tabla = DocumentoBusqueda._meta.db_table
+    extra, params = _filtro_cortas(cortas, 'd.texto')
+    sql = (
+        f'SELECT d.objeto_id FROM {TABLA_FTS} JOIN {tabla} d ON d.id = {TABLA_FTS}.rowid '
+        f'WHERE {TABLA_FTS} MATCH %s AND d.indice = %s{extra} '
+        f'ORDER BY {TABLA_FTS}.rank'
+    )
+    match = ' AND '.join(f'"{t}"' for t in terminos)
+    return sql, [match, indice, *params]
+
+
+def _sql_fulltext(indice, largas, cortas):
+    tabla = DocumentoBusqueda._meta.db_table
+    extra, params = _filtro_cortas(cortas, 'texto')
+    sql = (
+        f'SELECT objeto_id FROM {tabla} '
+        f'WHERE indice = %s AND MATCH(texto) AGAINST (%s IN BOOLEAN MODE){extra} '
+        f'ORDER BY MATCH(texto) AGAINST (%s IN BOOLEAN MODE) DESC'
+    )
+    match = ' '.join(f'+{p}*' for p in largas)
+    return sql, [indice, match, *params, match]
+
+
+def filtrar(queryset, indice, consulta, request=None, limite=MAX_RESULTADOS):
+    """
+    Restringe `queryset` a los resultados de search(), en orden de relevancia.
+    Si hay más de `limite`, se queda con los más relevantes y, con `request`,
+    avisa al usuario que la lista está recortada. Con limite=None conserva
+    todos (en el orden del queryset), p. ej. para exportar.
+    """
+    if limite is None:
+        return queryset.filter(pk__in=coincidencias(indice, consulta))
+    ids = search(indice, consulta, limite + 1)
+    if not ids:
+        return queryset.none()
+    if len(ids) > limite:
+        ids = ids[:limite]
+        if request is not None:
+            messages.warning(
+                request,
+                f'La búsqueda "{consulta}" coincide con más de {limite} registros: se muestran los '
+                f'{limite} más relevantes. Agregá palabras para acotarla.',
+            )
+    orden = Case(*[When(pk=pk, then=posicion) for posicion, pk in enumerate(ids)], output_field=IntegerField())
+    return queryset.filter(pk__in=ids).order_by(orden)
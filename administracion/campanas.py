@@ -0,0 +1,274 @@
+"""
+Campañas de email de planes y promociones.
+
+Las vistas sólo crean la campaña (`crear`): una fila Campana y una
+EnvioCampana por destinatario. El comando `enviar_campanas` las toma de a una
+(`tomar_pendiente`) y las entrega con `enviar`:
+
+- por lotes de `tamano_lote` destinatarios, todos por la misma conexión SMTP
+  (se reabre sólo si el servidor la corta),
+- a no más de `por_minuto` correos por minuto,
+- tomando cada destinatario ('enviando') antes de enviarle y marcándolo
+  enviado o con error apenas se intenta, así dos procesos nunca le escriben
+  al mismo.
+
+Mientras envía, el proceso renueva fecha_actualizacion antes de cada
+destinatario (compare-and-swap, `_latido`). Si pasa TIEMPO_MAXIMO_LOTE sin
+señales la campaña se da por abandonada y otro proceso la retoma sin repetir
+envíos; el anterior, si seguía vivo, lo nota en su próximo latido y se detiene.
+
+Cada destinatario recibe su propio correo (no un BCC gigante). El avance para
+la página de la campaña sale de `progreso`.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Count, Q
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .models import Campana, EnvioCampana
+
+
+TAMANO_LOTE = 50
+POR_MINUTO = 120
+
+# Filas de EnvioCampana por INSERT al crear la campaña
+TAMANO_INSERCION = 1000
+
+# Una campaña "enviando" sin latidos en este tiempo se considera abandonada
+TIEMPO_MAXIMO_LOTE = timedelta(minutes=10)
+
+
+def destinatarios():
+    """
+    (usuario_id, email) de los usuarios activos con email y suscriptos a
+    notificaciones (Profile.notifications_enabled), como QuerySet para
+    recorrer con .iterator().
+    """
+    return (
+        User.objects
+        .filter(is_active=True)
+        .exclude(email="")
+        .filter(Q(profile__notifications_enabled=True) | Q(profile__isnull=True))
+        .order_by('pk')
+        .values_list('pk', 'email')
+    )
+
+
+def excluidos():
+    """Usuarios activos con email que desactivaron las notificaciones."""
+    return User.objects.filter(is_active=True, profile__notifications_enabled=False).exclude(email="").count()
+
+
+def contenido_plan(plan, url_absoluta):
+    """(asunto, html) del email de un plan; `url_absoluta` = request.build_absolute_uri."""
+    html = render_to_string('emails/plan_email.html', {
+        'plan': plan,
+        'plan_url': url_absoluta(reverse('detalle_plan', args=[plan.id])),
+        'imagen_url': url_absoluta(plan.imagen.url) if getattr(plan, 'imagen', None) else None,
+        'year': timezone.now().date().year,
+    })
+    return f"Plan: {plan.nombre}", html
+
+
+def contenido_promocion(promo, url_absoluta):
+    """(asunto, html) del email de una promoción; `url_absoluta` = request.build_absolute_uri."""
+    today = timezone.now().date()
+    is_active = promo.fecha_inicio <= today <= promo.fecha_fin
+    html = render_to_string('emails/promocion_email.html', {
+        'promocion': promo,
+        'estado': 'activa' if is_active else ('proxima' if today < promo.fecha_inicio else 'finalizada'),
+        'dias_restantes': (promo.fecha_fin - today).days if is_active else 0,
+        'dias_para_inicio': (promo.fecha_inicio - today).days if today < promo.fecha_inicio else 0,
+        'promo_url': url_absoluta(reverse('promocion_detalle', args=[promo.id])),
+        'imagen_url': url_absoluta(promo.imagen.url) if getattr(promo, 'imagen', None) else None,
+        'year': today.year,
+    })
+    return f"Promoción: {promo.nombre} ({promo.descuento}%)", html
+
+
+@transaction.atomic
+def crear(tipo, asunto, html, usuario=None):
+    """Crea la campaña con sus destinatarios, lista para `enviar_campanas`. None si no hay destinatarios."""
+    usuarios = destinatarios()
+    if not usuarios.exists():
+        return None
+    campana = Campana.objects.create(
+        tipo=tipo, asunto=asunto, cuerpo=strip_tags(html), cuerpo_html=html,
+        excluidos=excluidos(), creada_por=usuario,
+    )
+    # Destinatarios en una consulta recorrida por partes, sin cargarlos todos en memoria
+    vistos = set()
+    lote = []
+    for usuario_id, email in usuarios.iterator(chunk_size=2000):
+        if email in vistos:
+            continue
+        vistos.add(email)
+        lote.append(EnvioCampana(campana=campana, usuario_id=usuario_id, email=email))
+        if len(lote) >= TAMANO_INSERCION:
+            EnvioCampana.objects.bulk_create(lote)
+            lote = []
+    EnvioCampana.objects.bulk_create(lote)
+    campana.total = len(vistos)
+    campana.save(update_fields=['total'])
+    return campana
+
+
+def progreso(campana):
+    """Avance de la campaña como dict serializable a JSON (una consulta)."""
+    conteo = campana.envios.aggregate(
+        enviados=Count('pk', filter=Q(estado='enviado')),
+        fallidos=Count('pk', filter=Q(estado='error')),
+    )
+    procesados = conteo['enviados'] + conteo['fallidos']
+    return {
+        'id': campana.pk,
+        'estado': campana.estado,
+        'estado_display': campana.get_estado_display(),
+        'total': campana.total,
+        'enviados': conteo['enviados'],
+        'fallidos': conteo['fallidos'],
+        'pendientes': campana.total - procesados,
+        'porcentaje': round(procesados * 100 / campana.total, 1) if campana.total else 100.0,
+        'error': campana.error,
+    }
+
+
+def tomar_pendiente():
+    """Reserva para este proceso la campaña más antigua en cola (compare-and-swap), o None."""
+    while True:
+        limite = timezone.now() - TIEMPO_MAXIMO_LOTE
+        candidato = (
+            Campana.objects
+            .filter(Q(estado='pendiente') | Q(estado='enviando', fecha_actualizacion__lt=limite))
+            .order_by('fecha_creacion')
+            .values_list('pk', 'estado', 'fecha_actualizacion')
+            .first()
+        )
+        if candidato is None:
+            return None
+        pk, estado, fecha_actualizacion = candidato
+        ahora = timezone.now()
+        if Campana.objects.filter(pk=pk, estado=estado, fecha_actualizacion=fecha_actualizacion).update(
+            estado='enviando', fecha_actualizacion=ahora
+        ):
+            Campana.objects.filter(pk=pk, fecha_inicio__isnull=True).update(fecha_inicio=ahora)
+            if estado == 'enviando':
+                # El proceso anterior murió con destinatarios tomados: no se sabe si
+                # les llegó el correo, así que no se reintentan (nunca dos veces)
+                EnvioCampana.objects.filter(campana_id=pk, estado='enviando').update(
+                    estado='error', error='Envío interrumpido: no se pudo confirmar si llegó.',
+                )
+            return Campana.objects.get(pk=pk)
+
+
+def _mensaje(campana, email, conexion):
+    mensaje = EmailMultiAlternatives(
+        subject=campana.asunto,
+        body=campana.cuerpo,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[email],
+        connection=conexion,
+    )
+    if campana.cuerpo_html:
+        mensaje.attach_alternative(campana.cuerpo_html, 'text/html')
+    return mensaje
+
+
+def _latido(campana):
+    """
+    Renueva fecha_actualizacion de la campaña tomada (compare-and-swap).
+    False si otro proceso la retomó por abandonada: hay que dejar de enviar.
+    """
+    ahora = timezone.now()
+    if not Campana.objects.filter(
+        pk=campana.pk, estado='enviando', fecha_actualizacion=campana.fecha_actualizacion
+    ).update(fecha_actualizacion=ahora):
+        return False
+    campana.fecha_actualizacion = ahora
+    return True
+
+
+def enviar(campana, tamano_lote=TAMANO_LOTE, por_minuto=POR_MINUTO, conexion=None):
+    """
+    Envía los destinatarios pendientes de `campana` (tomada con
+    `tomar_pendiente`) y la deja completada, o en error si no se pudo conectar
+    al servidor (se reanuda con `reanudar`). Si otro proceso la retoma, se
+    detiene sin tocarla.
+    """
+    conexion = conexion or get_connection()
+    intervalo = 60 / por_minuto if por_minuto else 0
+    proximo = time.monotonic()
+    abierta = False
+    propia = Campana.objects.filter(pk=campana.pk, estado='enviando')
+    try:
+        while True:
+            lote = list(
+                campana.envios.filter(estado='pendiente').order_by('pk').values_list('pk', 'email')[:tamano_lote]
+            )
+            if not lote:
+                break
+            for envio_id, email in lote:
+                if not abierta:
+                    try:
+                        conexion.open()
+                    except Exception as e:
+                        propia.filter(fecha_actualizacion=campana.fecha_actualizacion).update(
+                            estado='error', error=f"No se pudo conectar al servidor de correo: {e}",
+                            fecha_actualizacion=timezone.now(),
+                        )
+                        campana.refresh_from_db()
+                        return campana
+                    abierta = True
+
+                # Ritmo máximo de envío
+                espera = proximo - time.monotonic()
+                if espera > 0:
+                    time.sleep(espera)
+                proximo = max(proximo, time.monotonic()) + intervalo
+
+                if not _latido(campana):
+                    campana.refresh_from_db()
+                    return campana
+                # Se toma el destinatario antes de enviarle: nunca le escriben dos procesos
+                if not EnvioCampana.objects.filter(pk=envio_id, estado='pendiente').update(
+                    estado='enviando', fecha_envio=timezone.now()
+                ):
+                    continue
+
+                try:
+                    _mensaje(campana, email, conexion).send()
+                except Exception as e:
+                    EnvioCampana.objects.filter(pk=envio_id).update(estado='error', error=str(e))
+                    # Si el servidor cortó la conexión, se reabre para el siguiente
+                    try:
+                        conexion.close()
+                    except Exception:
+                        pass
+                    abierta = False
+                else:
+                    EnvioCampana.objects.filter(pk=envio_id).update(estado='enviado', fecha_envio=timezone.now())
+    finally:
+        if abierta:
+            try:
+                conexion.close()
+            except Exception:
+                pass
+
+    propia.filter(fecha_actualizacion=campana.fecha_actualizacion).update(
+        estado='completada', error='', fecha_fin=timezone.now(),
+    )
+    campana.refresh_from_db()
+    return campana
+
+
+def reanudar(campana):
+    """Vuelve a poner en cola una campaña en error; sigue con los destinatarios pendientes."""
+    return Campana.objects.filter(pk=campana.pk, estado='error').update(estado='pendiente', error='')
@@ -0,0 +1,134 @@
+"""
+Bandeja de salida de emails (CorreoSaliente).
+
+Las vistas no hablan con el servidor SMTP: `encolar` guarda el correo en la
+base, dentro de la transacción del cambio que lo origina (si el cambio se
+revierte, el correo también). El comando `send_outbox` toma lotes
+(`tomar_lote`) y los entrega por una sola conexión (`entregar`).
+
+Un envío fallido se reintenta con espera exponencial (ESPERA_BASE, 2x, 4x...,
+hasta ESPERA_MAXIMA); después de MAX_INTENTOS el correo queda 'fallido'.
+Con EMAIL_BACKEND locmem o console (tests, desarrollo) el comando funciona
+igual, sin red.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import CorreoSaliente
+
+
+MAX_INTENTOS = 6
+ESPERA_BASE = timedelta(minutes=1)
+ESPERA_MAXIMA = timedelta(hours=2)
+
+# Un correo "enviando" más viejo que esto se considera abandonado
+TIEMPO_MAXIMO_ENVIO = timedelta(minutes=10)
+
+TAMANO_LOTE = 100
+
+
+def encolar(asunto, cuerpo, destinatarios, remitente=None, cuerpo_html=''):
+    """Agrega un correo a la bandeja de salida. Devuelve el CorreoSaliente (o None sin destinatarios)."""
+    destinatarios = [d for d in destinatarios if d]
+    if not destinatarios:
+        return None
+    return CorreoSaliente.objects.create(
+        asunto=asunto,
+        cuerpo=cuerpo,
+        cuerpo_html=cuerpo_html or '',
+        remitente=remitente or '',
+        destinatarios=destinatarios,
+    )
+
+
+def espera(intentos):
+    """Tiempo hasta el próximo intento después de `intentos` fallidos."""
+    # El exponente se acota antes de multiplicar: timedelta desborda con valores enormes
+    return min(ESPERA_BASE * 2 ** min(max(intentos - 1, 0), 30), ESPERA_MAXIMA)
+
+
+def tomar_lote(limite=TAMANO_LOTE):
+    """
+    Reserva para este proceso hasta `limite` correos listos para enviar
+    (pendientes cuyo próximo intento ya llegó, o envíos abandonados).
+    """
+    ahora = timezone.now()
+    disponibles = (
+        Q(estado='pendiente', proximo_intento__lte=ahora)
+        | Q(estado='enviando', fecha_inicio__lt=ahora - TIEMPO_MAXIMO_ENVIO)
+    )
+    ids = list(
+        CorreoSaliente.objects.filter(disponibles)
+        .order_by('proximo_intento')
+        .values_list('pk', flat=True)[:limite]
+    )
+    if not ids:
+        return []
+    # Compare-and-swap: otro proceso pudo tomar algunos entre la consulta y el UPDATE
+    CorreoSaliente.objects.filter(disponibles, pk__in=ids).update(estado='enviando', fecha_inicio=ahora)
+    return list(CorreoSaliente.objects.filter(pk__in=ids, estado='enviando', fecha_inicio=ahora).order_by('proximo_intento'))
+
+
+def _mensaje(correo, conexion):
+    mensaje = EmailMultiAlternatives(
+        subject=correo.asunto,
+        body=correo.cuerpo,
+        from_email=correo.remitente or settings.DEFAULT_FROM_EMAIL,
+        to=correo.destinatarios,
+        connection=conexion,
+    )
+    if correo.cuerpo_html:
+        mensaje.attach_alternative(correo.cuerpo_html, 'text/html')
+    return mensaje
+
+
+def _fallo(correo, error):
+    correo.intentos += 1
+    correo.ultimo_error = str(error) or error.__class__.__name__
+    if correo.intentos >= MAX_INTENTOS:
+        correo.estado = 'fallido'
+    else:
+        correo.estado = 'pendiente'
+        correo.proximo_intento = timezone.now() + espera(correo.intentos)
+    correo.save(update_fields=['intentos', 'ultimo_error', 'estado', 'proximo_intento'])
+
+
+def entregar(correos, conexion=None):
+    """
+    Envía `correos` por una sola conexión SMTP (la abre y la cierra) y deja
+    cada uno enviado o reprogramado. Devuelve (enviados, fallidos).
+    """
+    conexion = conexion or get_connection()
+    enviados = fallidos = 0
+    try:
+        conexion.open()
+    except Exception as e:
+        # Sin servidor no se envía nada: todo el lote se reprograma
+        for correo in correos:
+            _fallo(correo, e)
+        return 0, len(correos)
+
+    try:
+        for correo in correos:
+            try:
+                _mensaje(correo, conexion).send()
+            except Exception as e:
+                _fallo(correo, e)
+                fallidos += 1
+            else:
+                correo.estado = 'enviado'
+                correo.intentos += 1
+                correo.ultimo_error = ''
+                correo.fecha_envio = timezone.now()
+                correo.save(update_fields=['estado', 'intentos', 'ultimo_error', 'fecha_envio'])
+                enviados += 1
+    finally:
+        try:
+            conexion.close()
+        except Exception:
+            pass
+    return enviados, fallidos
@@ -0,0 +1,179 @@
+"""
+Exportación de listados a CSV y XLSX en streaming.
+
+Las filas llegan de un iterador (p. ej. `values_list().iterator(chunk_size=...)`)
+y se envían a medida que se generan con StreamingHttpResponse: la memoria no
+depende de la cantidad de filas y la descarga empieza enseguida.
+
+El XLSX se escribe a mano (sin dependencias): un zip con la hoja en XML y
+cadenas en línea, que zipfile comprime y entrega por partes.
+"""
+import csv
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Filas de la hoja que se acumulan antes de entregar una parte del zip
+FILAS_POR_PARTE = 500
+
+_CONTROL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# Un texto que empieza así, Excel/LibreOffice lo toman como fórmula
+_INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: writerow() devuelve la línea escrita."""
+
+    def write(self, valor):
+        return valor
+
+
+class _Buffer:
+    """Pseudo-archivo (sin seek) donde zipfile escribe; vaciar() entrega lo acumulado."""
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self.partes)
+        self.partes = []
+        return datos
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        if timezone.is_aware(valor):
+            valor = timezone.localtime(valor)
+        return valor.strftime('%Y-%m-%d %H:%M')
+    if isinstance(valor, date):
+        return valor.isoformat()
+    if isinstance(valor, bool):
+        return 'Sí' if valor else 'No'
+    if isinstance(valor, str) and valor.startswith(_INICIO_FORMULA):
+        # Texto cargado por usuarios: el apóstrofo lo deja como texto literal
+        return "'" + valor
+    return str(valor)
+
+
+def filas_csv(encabezados, filas):
+    """Genera el CSV línea por línea (con BOM, para que Excel lo abra en UTF-8)."""
+    escritor = csv.writer(_Eco())
+    yield '\ufeff' + escritor.writerow(encabezados)
+    for fila in filas:
+        yield escritor.writerow([_texto(valor) for valor in fila])
+
+
+def _columna(indice):
+    letras = ''
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def _fila_xml(numero, valores, columnas):
+    celdas = []
+    for columna, valor in zip(columnas, valores):
+        ref = f'{columna}{numero}'
+        if isinstance(valor, (int, float, Decimal)) and not isinstance(valor, bool):
+            celdas.append(f'<c r="{ref}"><v>{valor}</v></c>')
+        elif valor is not None and valor != '':
+            texto = escape(_CONTROL.sub('', _texto(valor)))
+            celdas.append(f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>')
+    return f'<row r="{numero}">{"".join(celdas)}</row>'
+
+
+_XLSX_FIJOS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def filas_xlsx(encabezados, filas, hoja='Datos'):
+    """Genera un XLSX de una hoja por partes, a medida que se comprimen las filas."""
+    destino = _Buffer()
+    with zipfile.ZipFile(destino, 'w', compression=zipfile.ZIP_DEFLATED) as libro:
+        for nombre, contenido in _XLSX_FIJOS.items():
+            libro.writestr(nombre, contenido)
+        libro.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(hoja[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ))
+        yield destino.vaciar()
+
+        columnas = [_columna(i) for i in range(len(encabezados))]
+        with libro.open('xl/worksheets/sheet1.xml', 'w') as hoja_xml:
+            hoja_xml.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + _fila_xml(1, encabezados, columnas)
+            ).encode())
+            partes = []
+            for numero, fila in enumerate(filas, start=2):
+                partes.append(_fila_xml(numero, fila, columnas))
+                if len(partes) >= FILAS_POR_PARTE:
+                    hoja_xml.write(''.join(partes).encode())
+                    partes = []
+                    yield destino.vaciar()
+            hoja_xml.write((''.join(partes) + '</sheetData></worksheet>').encode())
+    yield destino.vaciar()
+
+
+def respuesta_exportacion(nombre, encabezados, filas, formato='csv'):
+    """StreamingHttpResponse con `filas` en `formato` ('csv' o 'xlsx') como adjunto `nombre`.<formato>."""
+    generador = filas_xlsx(encabezados, filas) if formato == 'xlsx' else filas_csv(encabezados, filas)
+    formato = 'xlsx' if formato == 'xlsx' else 'csv'
+    respuesta = StreamingHttpResponse(generador, content_type=FORMATOS[formato])
+    fecha = timezone.localdate().isoformat()
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre}-{fecha}.{formato}"'
+    return respuesta
@@ -0,0 +1,71 @@
+import random
+import time
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from habitaciones.models import TipoHabitacion
+from reservas import pricing
+from reservas.models import Reserva
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara pricing.quote_batch (NumPy, centavos) con Reserva.calcular_total '
+        'sobre estadías aleatorias y verifica que coincidan al centavo. No escribe en la base.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cotizaciones', type=int, default=10000, help='Estadías a cotizar (por defecto 10000)')
+        parser.add_argument('--semilla', type=int, default=0, help='Semilla aleatoria (por defecto 0)')
+
+    def handle(self, *args, **options):
+        cantidad = options['cotizaciones']
+        if cantidad < 1:
+            raise CommandError('--cotizaciones debe ser mayor que 0')
+        azar = random.Random(options['semilla'])
+
+        tipos = list(TipoHabitacion.objects.filter(activo=True))
+        if not tipos:
+            # Sin datos cargados se usan tipos en memoria con precios arbitrarios
+            tipos = [
+                TipoHabitacion(pk=i, nombre=f'Tipo {i}', precio=Decimal(azar.randint(1000, 99999)) / 100)
+                for i in range(1, 9)
+            ]
+
+        hoy = timezone.localdate()
+        estadias = []
+        for _ in range(cantidad):
+            check_in = hoy + timedelta(days=azar.randint(0, 365))
+            estadias.append((
+                azar.choice(tipos),
+                check_in,
+                check_in + timedelta(days=azar.randint(1, 14)),
+                azar.randint(1, 4),
+            ))
+        tipos_col, check_ins, check_outs, cantidades = zip(*estadias)
+
+        inicio = time.perf_counter()
+        totales = pricing.quote_batch(tipos_col, check_ins, check_outs, cantidades)
+        t_lote = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        esperados = [
+            Reserva(tipo_habitacion=tipo, check_in=ci, check_out=co, cantidad_habitaciones=qty).calcular_total()
+            for tipo, ci, co, qty in estadias
+        ]
+        t_decimal = time.perf_counter() - inicio
+
+        centavo = Decimal('0.01')
+        diferencias = sum(
+            1 for esperado, total in zip(esperados, totales)
+            if esperado.quantize(centavo, rounding=ROUND_HALF_UP) != Decimal(int(total)) / 100
+        )
+
+        self.stdout.write(f'{cantidad} cotizaciones, {len(tipos)} tipos')
+        self.stdout.write(f'quote_batch (NumPy):     {t_lote * 1000:.1f} ms')
+        self.stdout.write(f'calcular_total (Decimal): {t_decimal * 1000:.1f} ms')
+        estilo = self.style.ERROR if diferencias else self.style.SUCCESS
+        self.stdout.write(estilo(f'Diferencias al centavo: {diferencias}'))
@@ -0,0 +1,90 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from reservas import analitica
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide analitica.calcular (NumPy, arreglos de diferencias) sobre estadías aleatorias '
+        'y verifica el resultado contra una expansión noche por noche en Python. No usa la base.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reservas', type=int, default=1_000_000, help='Estadías a generar (por defecto 1000000)')
+        parser.add_argument('--tipos', type=int, default=8, help='Tipos de habitación (por defecto 8)')
+        parser.add_argument('--dias', type=int, default=365, help='Noches del período (por defecto 365)')
+        parser.add_argument('--semilla', type=int, default=0, help='Semilla aleatoria (por defecto 0)')
+        parser.add_argument(
+            '--verificar',
+            type=int,
+            default=100_000,
+            help='Estadías a comparar con la versión en Python (por defecto 100000; 0 = no comparar)',
+        )
+
+    def handle(self, *args, **options):
+        import numpy as np
+
+        cantidad, dias = options['reservas'], options['dias']
+        if cantidad < 1 or options['tipos'] < 1 or dias < 1:
+            raise CommandError('--reservas, --tipos y --dias deben ser mayores que 0')
+        azar = np.random.default_rng(options['semilla'])
+
+        hasta = timezone.localdate()
+        desde = hasta - timedelta(days=dias)
+        tipos = np.arange(1, options['tipos'] + 1)
+        # Stock para una ocupación media cercana al 70% (~15 noches de habitación por estadía)
+        escala = cantidad * 15 / (dias * len(tipos) * 0.7)
+        stock = np.maximum((escala * azar.uniform(0.8, 1.2, size=len(tipos))).astype(np.int64), 1)
+
+        # Estadías de 1 a 14 noches que empiezan hasta 14 días antes del período
+        tipo_ids = azar.choice(tipos, size=cantidad)
+        primera = np.datetime64(desde) - np.timedelta64(14, 'D')
+        check_ins = primera + azar.integers(0, dias + 14, size=cantidad).astype('timedelta64[D]')
+        check_outs = check_ins + azar.integers(1, 15, size=cantidad).astype('timedelta64[D]')
+        cantidades = azar.integers(1, 4, size=cantidad)
+        montos = azar.integers(5_000, 500_000, size=cantidad) / 100
+
+        inicio = time.perf_counter()
+        ocupacion = analitica.calcular(desde, hasta, tipos, stock, tipo_ids, check_ins, check_outs, cantidades, montos)
+        t_numpy = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        resumen = analitica.resumen(ocupacion)
+        t_resumen = time.perf_counter() - inicio
+
+        self.stdout.write(f'{cantidad} estadías, {len(tipos)} tipos, {dias} noches')
+        self.stdout.write(f'calcular (NumPy): {t_numpy * 1000:.1f} ms')
+        self.stdout.write(f'resumen:          {t_resumen * 1000:.1f} ms')
+        total = resumen['total']
+        self.stdout.write(f"Ocupación {total['ocupacion']}% · ADR ${total['adr']} · RevPAR ${total['revpar']}")
+
+        muestra = min(options['verificar'], cantidad)
+        if not muestra:
+            return
+        esperado = analitica.calcular(
+            desde, hasta, tipos, stock,
+            tipo_ids[:muestra], check_ins[:muestra], check_outs[:muestra], cantidades[:muestra], montos[:muestra],
+        )
+        inicio = time.perf_counter()
+        fila = {int(t): i for i, t in enumerate(tipos)}
+        vendidas = np.zeros_like(esperado.vendidas)
+        ingresos = np.zeros_like(esperado.ingresos)
+        base = desde.toordinal()
+        for tipo_id, entrada, salida, qty, monto in zip(
+            tipo_ids[:muestra].tolist(), check_ins[:muestra].tolist(), check_outs[:muestra].tolist(),
+            cantidades[:muestra].tolist(), montos[:muestra].tolist(),
+        ):
+            por_noche = monto / (salida - entrada).days
+            for noche in range(max(entrada.toordinal() - base, 0), min(salida.toordinal() - base, dias)):
+                vendidas[fila[tipo_id], noche] += qty
+                ingresos[fila[tipo_id], noche] += por_noche
+        t_python = time.perf_counter() - inicio
+
+        self.stdout.write(f'Expansión en Python ({muestra} estadías): {t_python * 1000:.1f} ms')
+        diferencias = int((vendidas != esperado.vendidas).sum()) + int((~np.isclose(ingresos, esperado.ingresos)).sum())
+        estilo = self.style.ERROR if diferencias else self.style.SUCCESS
+        self.stdout.write(estilo(f'Noches con diferencias: {diferencias}'))
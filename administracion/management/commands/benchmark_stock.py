@@ -0,0 +1,132 @@
+import threading
+import time
+import uuid
+from datetime import timedelta
+from queue import Empty, Queue
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections, connection
+from django.db.models import Max
+from django.utils import timezone
+
+from habitaciones.models import InventarioNoche, TipoHabitacion
+from reservas.models import Reserva
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark de contención: varios hilos llaman a confirmar() sobre reservas '
+        'pendientes de un mismo tipo con stock limitado y se informa el throughput '
+        'y la sobreventa. Usa la base configurada en settings (SQLite o MariaDB) '
+        'y elimina los datos de prueba al terminar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8, help='Hilos concurrentes (por defecto 8)')
+        parser.add_argument('--reservas', type=int, default=200, help='Reservas pendientes a confirmar (por defecto 200)')
+        parser.add_argument('--stock', type=int, default=20, help='Stock total del tipo de prueba (por defecto 20)')
+        parser.add_argument(
+            '--sin-condicion',
+            action='store_true',
+            help='Emula el descuento anterior (leer, comparar y guardar) para comparar la sobreventa',
+        )
+
+    def handle(self, *args, **options):
+        hilos, cantidad, stock = options['hilos'], options['reservas'], options['stock']
+        if hilos < 1 or cantidad < 1 or stock < 1:
+            raise CommandError('--hilos, --reservas y --stock deben ser mayores que 0')
+
+        tipo = TipoHabitacion.objects.create(
+            nombre=f'benchmark-{uuid.uuid4().hex[:8]}',
+            precio=100,
+            capacidad=2,
+            stock_total=stock,
+            stock_disponible=stock,
+        )
+        usuario, _ = User.objects.get_or_create(username='benchmark_stock', defaults={'is_active': False})
+        check_in = timezone.localdate() + timedelta(days=365)
+        # bulk_create evita la retención en el inventario: sólo compite confirmar()
+        Reserva.objects.bulk_create([
+            Reserva(
+                usuario=usuario,
+                tipo_habitacion=tipo,
+                check_in=check_in,
+                check_out=check_in + timedelta(days=2),
+                estado='pendiente',
+            )
+            for _ in range(cantidad)
+        ], batch_size=500)
+
+        pendientes = Queue()
+        for reserva_id in Reserva.objects.filter(tipo_habitacion=tipo).values_list('id', flat=True):
+            pendientes.put(reserva_id)
+
+        resultados = {'confirmadas': 0, 'rechazadas': 0, 'errores': 0}
+        candado = threading.Lock()
+        barrera = threading.Barrier(hilos)
+        confirmar = self.confirmar_sin_condicion if options['sin_condicion'] else Reserva.confirmar
+
+        def trabajar():
+            barrera.wait()
+            try:
+                while True:
+                    try:
+                        reserva_id = pendientes.get_nowait()
+                    except Empty:
+                        break
+                    try:
+                        reserva = Reserva.objects.select_related('tipo_habitacion').get(pk=reserva_id)
+                        clave = 'confirmadas' if confirmar(reserva) else 'rechazadas'
+                    except DatabaseError:
+                        # p. ej. "database is locked" en SQLite
+                        clave = 'errores'
+                    with candado:
+                        resultados[clave] += 1
+            finally:
+                connection.close()
+
+        self.stdout.write(
+            f'{connection.vendor}: {hilos} hilos, {cantidad} reservas, stock {stock}'
+            f'{" (sin condición)" if options["sin_condicion"] else ""}'
+        )
+        inicio = time.perf_counter()
+        trabajadores = [threading.Thread(target=trabajar) for _ in range(hilos)]
+        for t in trabajadores:
+            t.start()
+        for t in trabajadores:
+            t.join()
+        duracion = time.perf_counter() - inicio
+        close_old_connections()
+
+        try:
+            tipo.refresh_from_db()
+            confirmadas = Reserva.objects.filter(tipo_habitacion=tipo, estado='confirmada').count()
+            pico = InventarioNoche.objects.filter(tipo_habitacion=tipo).aggregate(pico=Max('vendidas'))['pico'] or 0
+            sobreventa = max(0, confirmadas - stock)
+
+            self.stdout.write(f'Tiempo: {duracion:.2f}s  Throughput: {cantidad / duracion:.1f} confirmar()/s')
+            self.stdout.write(
+                f'Confirmadas: {resultados["confirmadas"]}  Rechazadas: {resultados["rechazadas"]}  '
+                f'Errores de BD: {resultados["errores"]}'
+            )
+            self.stdout.write(
+                f'En BD: {confirmadas} confirmadas, stock_disponible={tipo.stock_disponible}, '
+                f'pico de vendidas por noche={pico}'
+            )
+            estilo = self.style.ERROR if sobreventa or tipo.stock_disponible + confirmadas != stock else self.style.SUCCESS
+            self.stdout.write(estilo(f'Sobreventa: {sobreventa}'))
+        finally:
+            tipo.delete()
+
+    @staticmethod
+    def confirmar_sin_condicion(reserva):
+        """Descuento de stock como se hacía antes: lectura, comparación y save()."""
+        tipo = reserva.tipo_habitacion
+        tipo.refresh_from_db(fields=['stock_disponible'])
+        if tipo.stock_disponible < reserva.cantidad_habitaciones:
+            return False
+        tipo.stock_disponible -= reserva.cantidad_habitaciones
+        tipo.save(update_fields=['stock_disponible'])
+        Reserva.objects.filter(pk=reserva.pk).update(estado='confirmada')
+        return True
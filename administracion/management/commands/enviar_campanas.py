@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from administracion import campanas
+
+
+class Command(BaseCommand):
+    help = 'Envía las campañas de email en cola (Campana) por lotes. Con --continuo queda esperando campañas nuevas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--continuo',
+            action='store_true',
+            help='No termina al vaciar la cola: vuelve a revisarla cada --intervalo segundos',
+        )
+        parser.add_argument('--intervalo', type=float, default=5, help='Segundos entre revisiones (por defecto 5)')
+        parser.add_argument(
+            '--lote', type=int, default=campanas.TAMANO_LOTE,
+            help=f'Destinatarios por lote (por defecto {campanas.TAMANO_LOTE})',
+        )
+        parser.add_argument(
+            '--por-minuto', type=int, default=campanas.POR_MINUTO,
+            help=f'Máximo de correos por minuto; 0 = sin límite (por defecto {campanas.POR_MINUTO})',
+        )
+
+    def handle(self, *args, **options):
+        if options['intervalo'] <= 0:
+            raise CommandError('--intervalo debe ser mayor que 0')
+        if options['lote'] <= 0:
+            raise CommandError('--lote debe ser mayor que 0')
+        if options['por_minuto'] < 0:
+            raise CommandError('--por-minuto no puede ser negativo')
+
+        while True:
+            campana = campanas.tomar_pendiente()
+            if campana is None:
+                if not options['continuo']:
+                    break
+                time.sleep(options['intervalo'])
+                continue
+
+            self.stdout.write(f'Enviando {campana}...')
+            campanas.enviar(campana, options['lote'], options['por_minuto'])
+            avance = campanas.progreso(campana)
+            if campana.estado == 'completada':
+                self.stdout.write(self.style.SUCCESS(
+                    f"  ✓ {avance['enviados']} enviado(s), {avance['fallidos']} con error"
+                ))
+            elif campana.estado == 'enviando':
+                self.stdout.write(self.style.WARNING('  La retomó otro proceso; se deja de enviar'))
+            else:
+                self.stdout.write(self.style.ERROR(f'  ✗ {campana.error}'))
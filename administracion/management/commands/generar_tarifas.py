@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from habitaciones import tarifas
+from habitaciones.models import TipoHabitacion
+
+
+class Command(BaseCommand):
+    help = 'Genera o extiende la grilla de tarifas por noche a partir de las reglas de tarifa'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tipo',
+            type=str,
+            help='Nombre del tipo de habitación. Por defecto, todos los activos',
+        )
+        parser.add_argument(
+            '--desde',
+            type=str,
+            help='Primera noche a regenerar (YYYY-MM-DD). Por defecto, hoy',
+        )
+
+    def handle(self, *args, **options):
+        desde = None
+        if options['desde']:
+            try:
+                desde = datetime.strptime(options['desde'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError(f"Fecha inválida: {options['desde']} (formato YYYY-MM-DD)")
+
+        tipos = TipoHabitacion.objects.filter(activo=True)
+        if options['tipo']:
+            tipos = TipoHabitacion.objects.filter(nombre__iexact=options['tipo'])
+            if not tipos.exists():
+                raise CommandError(f"No existe el tipo de habitación: {options['tipo']}")
+
+        for tipo in tipos:
+            noches = tarifas.regenerar(tipo, desde=desde)
+            self.stdout.write(f'  {tipo.nombre}: {noches} noches')
+        self.stdout.write(self.style.SUCCESS('✓ Grilla de tarifas actualizada'))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from administracion import busqueda
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda de los listados de administración'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'indices',
+            nargs='*',
+            help=f"Índices a reconstruir ({', '.join(busqueda.INDICES)}). Por defecto, todos",
+        )
+        parser.add_argument('--lote', type=int, default=1000, help='Objetos por lote (por defecto 1000)')
+
+    def handle(self, *args, **options):
+        indices = options['indices'] or list(busqueda.INDICES)
+        desconocidos = [i for i in indices if i not in busqueda.INDICES]
+        if desconocidos:
+            raise CommandError(f"Índices desconocidos: {', '.join(desconocidos)}")
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser mayor que 0')
+
+        for indice in indices:
+            inicio = time.perf_counter()
+            total = busqueda.reindexar(indice, lote=options['lote'])
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ {indice}: {total} objetos indexados en {time.perf_counter() - inicio:.1f} s'
+            ))
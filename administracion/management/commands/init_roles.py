@@ -42,12 +42,14 @@ class Command(BaseCommand):
             ('reservas', 'eliminar', 'Eliminar reservas'),
             ('reservas', 'confirmar', 'Confirmar reservas'),
             ('reservas', 'cancelar', 'Cancelar reservas'),
+            ('reservas', 'exportar', 'Exportar reservas'),
             
             # Huéspedes
             ('huespedes', 'ver', 'Ver huéspedes'),
             ('huespedes', 'crear', 'Crear huéspedes'),
             ('huespedes', 'editar', 'Editar huéspedes'),
             ('huespedes', 'eliminar', 'Eliminar huéspedes'),
+            ('huespedes', 'exportar', 'Exportar huéspedes'),
             
             # Servicios
             ('servicios', 'ver', 'Ver servicios'),
@@ -84,6 +86,7 @@ class Command(BaseCommand):
             ('usuarios', 'crear', 'Crear usuarios'),
             ('usuarios', 'editar', 'Editar usuarios'),
             ('usuarios', 'eliminar', 'Eliminar usuarios'),
+            ('usuarios', 'exportar', 'Exportar usuarios'),
             ('roles', 'ver', 'Ver roles'),
             ('roles', 'asignar', 'Asignar roles'),
             ('roles', 'crear', 'Crear roles'),
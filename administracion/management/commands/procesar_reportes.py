@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from administracion import reportes
+
+
+class Command(BaseCommand):
+    help = 'Genera los reportes DOCX en cola (TrabajoReporte). Con --continuo queda esperando trabajos nuevos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--continuo',
+            action='store_true',
+            help='No termina al vaciar la cola: vuelve a revisarla cada --intervalo segundos',
+        )
+        parser.add_argument('--intervalo', type=float, default=5, help='Segundos entre revisiones (por defecto 5)')
+
+    def handle(self, *args, **options):
+        if options['intervalo'] <= 0:
+            raise CommandError('--intervalo debe ser mayor que 0')
+
+        while True:
+            trabajo = reportes.tomar_pendiente()
+            if trabajo is None:
+                if not options['continuo']:
+                    break
+                time.sleep(options['intervalo'])
+                continue
+
+            self.stdout.write(f'Generando {trabajo}...')
+            reportes.generar(trabajo)
+            if trabajo.estado == 'listo':
+                self.stdout.write(self.style.SUCCESS(f'  ✓ {trabajo.archivo.name}'))
+            else:
+                self.stdout.write(self.style.ERROR(f'  ✗ {trabajo.error}'))
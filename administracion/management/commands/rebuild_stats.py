@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from reservas import estadisticas
+
+
+class Command(BaseCommand):
+    help = 'Recalcula las estadísticas diarias de reservas (DailyStats) a partir de las reservas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--desde',
+            type=str,
+            help='Primer día de reserva a recalcular (YYYY-MM-DD). Por defecto, todos',
+        )
+        parser.add_argument(
+            '--hasta',
+            type=str,
+            help='Último día de reserva, incluido (YYYY-MM-DD). Por defecto, todos',
+        )
+
+    def handle(self, *args, **options):
+        desde = self.parse_fecha(options['desde'])
+        hasta = self.parse_fecha(options['hasta'])
+        if desde and hasta and hasta < desde:
+            raise CommandError('--hasta no puede ser anterior a --desde')
+
+        self.stdout.write('Recalculando estadísticas diarias...')
+        filas = estadisticas.reconstruir(desde=desde, hasta=hasta)
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Estadísticas recalculadas: {filas} filas (día, tipo de habitación)')
+        )
+
+    def parse_fecha(self, valor):
+        if not valor:
+            return None
+        try:
+            return datetime.strptime(valor, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Fecha inválida: {valor} (formato YYYY-MM-DD)')
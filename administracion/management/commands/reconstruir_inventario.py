@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from habitaciones import inventario
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el inventario por noche de los tipos de habitación a partir de las reservas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--desde',
+            type=str,
+            help='Primera noche a reconstruir (YYYY-MM-DD). Por defecto, todas',
+        )
+        parser.add_argument(
+            '--hasta',
+            type=str,
+            help='Noche final, excluida (YYYY-MM-DD). Por defecto, todas',
+        )
+
+    def handle(self, *args, **options):
+        desde = self.parse_fecha(options['desde'])
+        hasta = self.parse_fecha(options['hasta'])
+        if desde and hasta and hasta <= desde:
+            raise CommandError('--hasta debe ser posterior a --desde')
+
+        self.stdout.write('Reconstruyendo inventario por noche...')
+        noches = inventario.reconstruir(desde=desde, hasta=hasta)
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Inventario reconstruido: {noches} noches con ocupación')
+        )
+
+    def parse_fecha(self, valor):
+        if not valor:
+            return None
+        try:
+            return datetime.strptime(valor, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Fecha inválida: {valor} (formato YYYY-MM-DD)')
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from administracion import correo
+
+
+class Command(BaseCommand):
+    help = 'Envía los correos de la bandeja de salida (CorreoSaliente). Con --continuo queda esperando correos nuevos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--continuo',
+            action='store_true',
+            help='No termina al vaciar la cola: vuelve a revisarla cada --intervalo segundos',
+        )
+        parser.add_argument('--intervalo', type=float, default=5, help='Segundos entre revisiones (por defecto 5)')
+        parser.add_argument(
+            '--lote', type=int, default=correo.TAMANO_LOTE,
+            help=f'Correos por conexión SMTP (por defecto {correo.TAMANO_LOTE})',
+        )
+
+    def handle(self, *args, **options):
+        if options['intervalo'] <= 0:
+            raise CommandError('--intervalo debe ser mayor que 0')
+        if options['lote'] <= 0:
+            raise CommandError('--lote debe ser mayor que 0')
+
+        while True:
+            lote = correo.tomar_lote(options['lote'])
+            if not lote:
+                if not options['continuo']:
+                    break
+                time.sleep(options['intervalo'])
+                continue
+
+            enviados, fallidos = correo.entregar(lote)
+            self.stdout.write(self.style.SUCCESS(f'  ✓ {enviados} enviado(s)'))
+            if fallidos:
+                self.stdout.write(self.style.ERROR(f'  ✗ {fallidos} con error (se reintentan o quedan fallidos)'))
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from administracion.models import Huesped as AdminHuesped, normalizar_dni
+from reservas.models import Huesped
+
+
+class Command(BaseCommand):
+    help = (
+        'Completa el DNI normalizado del padrón y de los huéspedes de reservas y '
+        'vincula cada huésped de reserva con su registro del padrón'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help='Filas por lote (por defecto 1000)')
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        if lote < 1:
+            raise CommandError('--lote debe ser mayor que 0')
+
+        self.stdout.write('Normalizando DNI del padrón...')
+        padron = self.normalizar(AdminHuesped, lote, vincular=False)
+        self.stdout.write('Vinculando huéspedes de reservas...')
+        estadias = self.normalizar(Huesped, lote, vincular=True)
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Padrón: {padron} actualizados. Huéspedes de reservas: {estadias} actualizados'
+        ))
+
+    def normalizar(self, modelo, lote, vincular):
+        """Recorre `modelo` por id en lotes y guarda sólo las filas que cambian."""
+        campos = ['dni_normalizado', 'padron'] if vincular else ['dni_normalizado']
+        ultimo, total = 0, 0
+        while True:
+            filas = list(modelo.objects.filter(pk__gt=ultimo).order_by('pk')[:lote])
+            if not filas:
+                return total
+            ultimo = filas[-1].pk
+
+            ids_padron = {}
+            if vincular:
+                dnis = {normalizar_dni(f.dni) for f in filas} - {''}
+                ids_padron = dict(
+                    AdminHuesped.objects.filter(dni_normalizado__in=dnis).values_list('dni_normalizado', 'id')
+                )
+
+            cambios = []
+            for fila in filas:
+                dni = normalizar_dni(fila.dni)
+                cambio = fila.dni_normalizado != dni
+                fila.dni_normalizado = dni
+                if vincular and fila.padron_id is None and fila.dni_normalizado in ids_padron:
+                    fila.padron_id = ids_padron[fila.dni_normalizado]
+                    cambio = True
+                if cambio:
+                    cambios.append(fila)
+            with transaction.atomic():
+                modelo.objects.bulk_update(cambios, campos, batch_size=lote)
+            total += len(cambios)
@@ -0,0 +1,112 @@
+"""
+Matriz de permisos por rol (RolPermiso) para la gestión de roles.
+
+- `leer` trae todos los pares rol x permiso en una sola consulta.
+- `guardar` recibe la matriz deseada de unos roles, la compara con la actual
+  y aplica sólo la diferencia: un bulk_create con los pares nuevos y un
+  DELETE filtrado con los que sobran, dentro de `edicion_en_bloque` para que
+  las señales por fila no recalculen nada: la máscara de cada rol
+  (Rol.mascara_permisos) y la caché de permisos se actualizan una sola vez
+  al final.
+"""
+from collections import defaultdict, namedtuple
+
+from django.db import transaction
+
+from .models import MASCARA_TODOS, Permiso, Rol, RolPermiso, edicion_en_bloque, mascara_de
+
+
+Cambios = namedtuple('Cambios', ['agregados', 'quitados'])
+
+
+def leer(roles=None):
+    """{rol_id: {permiso_id}} de `roles` (IDs o Rol; por defecto todos)."""
+    pares = RolPermiso.objects.all()
+    if roles is not None:
+        pares = pares.filter(rol__in=roles)
+    matriz = defaultdict(set)
+    for rol_id, permiso_id in pares.values_list('rol_id', 'permiso_id'):
+        matriz[rol_id].add(permiso_id)
+    return matriz
+
+
+def filas(roles, permisos, matriz):
+    """[(permiso, [(rol, asignado)])] para dibujar la matriz (una fila por permiso)."""
+    return [
+        (permiso, [(rol, permiso.pk in matriz.get(rol.pk, ())) for rol in roles])
+        for permiso in permisos
+    ]
+
+
+def leer_formulario(valores):
+    """Matriz a partir de valores 'rol_id:permiso_id' (checkboxes del formulario)."""
+    matriz = defaultdict(set)
+    for valor in valores:
+        rol_id, _, permiso_id = str(valor).partition(':')
+        try:
+            matriz[int(rol_id)].add(int(permiso_id))
+        except ValueError:
+            continue
+    return matriz
+
+
+def _ids(valores):
+    ids = set()
+    for valor in valores:
+        try:
+            ids.add(int(valor))
+        except (TypeError, ValueError):
+            continue
+    return ids
+
+
+@transaction.atomic
+def guardar(matriz):
+    """
+    Deja los permisos de cada rol de `matriz` ({rol_id: [permiso_id]}, los IDs
+    pueden venir como texto) tal como
+    se indican; los roles que no figuran no se tocan y los permisos
+    inexistentes se ignoran. Devuelve Cambios(agregados, quitados).
+    """
+    from .permissions import invalidar_permisos
+
+    matriz = {int(rol_id): permiso_ids for rol_id, permiso_ids in matriz.items() if str(rol_id).isdigit()}
+    roles = list(Rol.objects.select_for_update().filter(pk__in=list(matriz)))
+    if not roles:
+        return Cambios(0, 0)
+    permisos = {
+        pk: (modulo, accion)
+        for pk, modulo, accion in Permiso.objects.values_list('pk', 'modulo', 'accion')
+    }
+    deseada = {rol.pk: _ids(matriz[rol.pk]) & permisos.keys() for rol in roles}
+
+    actuales = defaultdict(dict)
+    for pk, rol_id, permiso_id in RolPermiso.objects.filter(rol__in=roles).values_list('pk', 'rol_id', 'permiso_id'):
+        actuales[rol_id][permiso_id] = pk
+
+    nuevos = [
+        RolPermiso(rol_id=rol_id, permiso_id=permiso_id)
+        for rol_id, permiso_ids in deseada.items()
+        for permiso_id in sorted(permiso_ids - actuales[rol_id].keys())
+    ]
+    sobrantes = [
+        pk
+        for rol_id, permiso_ids in deseada.items()
+        for permiso_id, pk in actuales[rol_id].items()
+        if permiso_id not in permiso_ids
+    ]
+    if nuevos:
+        RolPermiso.objects.bulk_create(nuevos, ignore_conflicts=True)
+    if sobrantes:
+        with edicion_en_bloque():
+            RolPermiso.objects.filter(pk__in=sobrantes).delete()
+
+    if nuevos or sobrantes:
+        for rol in roles:
+            # Super admin tiene todos los permisos
+            rol.mascara_permisos = MASCARA_TODOS if rol.nombre == 'super_admin' else mascara_de(
+                permisos[permiso_id] for permiso_id in deseada[rol.pk]
+            )
+        Rol.objects.bulk_update(roles, ['mascara_permisos'])
+        invalidar_permisos()
+    return Cambios(len(nuevos), len(sobrantes))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0002_rol_permiso_rolpermiso_usuariorol'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='huesped',
+            name='dni_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20),
+        ),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:44
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+TABLA = 'administracion_documentobusqueda'
+TABLA_FTS = 'administracion_documentobusqueda_fts'
+
+
+def crear_indice_texto(apps, schema_editor):
+    """FTS5 (trigram) sincronizada por triggers en SQLite; FULLTEXT en MariaDB/MySQL."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {TABLA_FTS} USING fts5("
+            f"texto, content='{TABLA}', content_rowid='id', tokenize='trigram')"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {TABLA}_ai AFTER INSERT ON {TABLA} BEGIN "
+            f"INSERT INTO {TABLA_FTS}(rowid, texto) VALUES (new.id, new.texto); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {TABLA}_ad AFTER DELETE ON {TABLA} BEGIN "
+            f"INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, texto) VALUES ('delete', old.id, old.texto); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {TABLA}_au AFTER UPDATE ON {TABLA} BEGIN "
+            f"INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, texto) VALUES ('delete', old.id, old.texto); "
+            f"INSERT INTO {TABLA_FTS}(rowid, texto) VALUES (new.id, new.texto); END"
+        )
+    elif vendor == 'mysql':
+        schema_editor.execute(f"ALTER TABLE {TABLA} ADD FULLTEXT INDEX busqueda_texto_ft (texto)")
+
+
+def borrar_indice_texto(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sufijo in ('ai', 'ad', 'au'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {TABLA}_{sufijo}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLA_FTS}")
+
+
+# Copia de administracion.busqueda (INDICES y el armado del texto) al crear
+# esta migración: la migración no debe cambiar si después cambia el módulo
+INDICES = {
+    'usuarios': ('auth', 'User', ('username', 'email', 'first_name', 'last_name')),
+    'huespedes': ('administracion', 'Huesped', ('nombre', 'apellido', 'dni', 'email', 'telefono')),
+    'planes': ('administracion', 'Plan', ('nombre', 'descripcion')),
+    'promociones': ('administracion', 'Promocion', ('nombre', 'descripcion')),
+    'servicios': ('administracion', 'Servicio', ('nombre', 'descripcion')),
+}
+
+_SEPARADORES = re.compile(r'[^0-9a-z]+')
+
+
+def texto_de(valores):
+    palabras = []
+    for valor in valores:
+        texto = unicodedata.normalize('NFKD', str(valor or '')).encode('ascii', 'ignore').decode()
+        texto = texto.lower().replace('.', '').replace('-', '')
+        palabras.extend(p for p in _SEPARADORES.split(texto) if p)
+    return ' ' + ' '.join(palabras)
+
+
+def indexar_existentes(apps, schema_editor):
+    DocumentoBusqueda = apps.get_model('administracion', 'DocumentoBusqueda')
+    for indice, (app_label, nombre_modelo, campos) in INDICES.items():
+        modelo = apps.get_model(app_label, nombre_modelo)
+        documentos = [
+            DocumentoBusqueda(indice=indice, objeto_id=fila[0], texto=texto_de(fila[1:]))
+            for fila in modelo.objects.values_list('pk', *campos).iterator(chunk_size=1000)
+        ]
+        DocumentoBusqueda.objects.bulk_create(documentos, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0003_huesped_dni_normalizado'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentoBusqueda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('indice', models.CharField(max_length=20)),
+                ('objeto_id', models.PositiveBigIntegerField()),
+                ('texto', models.TextField()),
+            ],
+            options={
+                'verbose_name': 'Documento de búsqueda',
+                'verbose_name_plural': 'Documentos de búsqueda',
+                'unique_together': {('indice', 'objeto_id')},
+            },
+        ),
+        migrations.RunPython(crear_indice_texto, borrar_indice_texto),
+        migrations.RunPython(indexar_existentes, migrations.RunPython.noop),
+    ]
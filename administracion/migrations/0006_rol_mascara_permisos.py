@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:01
+
+from django.db import migrations, models
+
+
+# Copia de administracion.models.BITS_PERMISOS al crear esta migración: la
+# migración no debe cambiar si después se agregan pares
+_ACCIONES_BASICAS = ('ver', 'crear', 'editar', 'eliminar', 'exportar')
+BITS_PERMISOS = (
+    *((modulo, accion) for modulo in (
+        'empleados', 'habitaciones', 'planes', 'promociones', 'servicios',
+        'huespedes', 'reservas', 'usuarios', 'dashboard',
+    ) for accion in _ACCIONES_BASICAS),
+    ('reservas', 'confirmar'), ('reservas', 'cancelar'),
+    *(('roles', accion) for accion in ('ver', 'crear', 'editar', 'eliminar', 'asignar', 'revocar')),
+    ('reportes', 'ver'), ('reportes', 'generar'), ('reportes', 'exportar'),
+    ('configuracion', 'ver'), ('configuracion', 'editar'),
+)
+BIT_PERMISO = {par: 1 << posicion for posicion, par in enumerate(BITS_PERMISOS)}
+MASCARA_TODOS = (1 << len(BITS_PERMISOS)) - 1
+
+
+def mascara_de(pares):
+    mascara = 0
+    for par in pares:
+        mascara |= BIT_PERMISO.get(tuple(par), 0)
+    return mascara
+
+
+def compilar_mascaras(apps, schema_editor):
+    Rol = apps.get_model('administracion', 'Rol')
+    RolPermiso = apps.get_model('administracion', 'RolPermiso')
+    pares = {}
+    for rol_id, modulo, accion in RolPermiso.objects.values_list('rol_id', 'permiso__modulo', 'permiso__accion'):
+        pares.setdefault(rol_id, []).append((modulo, accion))
+    for rol in Rol.objects.all():
+        mascara = MASCARA_TODOS if rol.nombre == 'super_admin' else mascara_de(pares.get(rol.pk, []))
+        Rol.objects.filter(pk=rol.pk).update(mascara_permisos=mascara)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0005_trabajoreporte'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rol',
+            name='mascara_permisos',
+            field=models.PositiveBigIntegerField(default=0, editable=False, help_text='Permisos del rol compilados (ver BITS_PERMISOS); se recalcula al cambiar RolPermiso'),
+        ),
+        migrations.RunPython(compilar_mascaras, migrations.RunPython.noop),
+    ]
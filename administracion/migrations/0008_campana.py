@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0007_correosaliente'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Campana',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('planes', 'Plan'), ('promociones', 'Promoción')], max_length=20)),
+                ('asunto', models.CharField(max_length=255)),
+                ('cuerpo', models.TextField()),
+                ('cuerpo_html', models.TextField(blank=True)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('enviando', 'Enviando'), ('completada', 'Completada'), ('error', 'Error')], default='pendiente', max_length=20)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('excluidos', models.PositiveIntegerField(default=0, help_text='Usuarios sin notificaciones activadas')),
+                ('error', models.TextField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_actualizacion', models.DateTimeField(blank=True, help_text='Último lote enviado', null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('creada_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='campanas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Campaña',
+                'verbose_name_plural': 'Campañas',
+                'ordering': ['-fecha_creacion'],
+            },
+        ),
+        migrations.CreateModel(
+            name='EnvioCampana',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('enviado', 'Enviado'), ('error', 'Error')], default='pendiente', max_length=20)),
+                ('error', models.TextField(blank=True)),
+                ('fecha_envio', models.DateTimeField(blank=True, null=True)),
+                ('campana', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='envios', to='administracion.campana')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Envío de campaña',
+                'verbose_name_plural': 'Envíos de campañas',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='campana',
+            index=models.Index(fields=['estado', 'fecha_creacion'], name='campana_cola_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enviocampana',
+            index=models.Index(fields=['campana', 'estado'], name='envio_campana_estado_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='enviocampana',
+            unique_together={('campana', 'email')},
+        ),
+    ]
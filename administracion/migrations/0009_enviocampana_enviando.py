@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0008_campana'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='campana',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(blank=True, help_text='Última señal de vida del proceso que la envía', null=True),
+        ),
+        migrations.AlterField(
+            model_name='enviocampana',
+            name='estado',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('enviando', 'Enviando'), ('enviado', 'Enviado'), ('error', 'Error')], default='pendiente', max_length=20),
+        ),
+    ]
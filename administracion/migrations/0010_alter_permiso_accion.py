@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0009_enviocampana_enviando'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='permiso',
+            name='accion',
+            field=models.CharField(choices=[('ver', 'Ver'), ('crear', 'Crear'), ('editar', 'Editar'), ('eliminar', 'Eliminar'), ('exportar', 'Exportar')], max_length=50),
+        ),
+    ]
@@ -1,6 +1,12 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
 from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth.models import User
+from django.utils import timezone
 from habitaciones.models import Habitacion
 
 class Empleado(models.Model):
@@ -61,10 +67,16 @@ class Servicio(models.Model):
     def __str__(self):
         return self.nombre
 
+def normalizar_dni(dni):
+    """DNI comparable: sin espacios ni puntos y en mayúsculas ('12.345.678' -> '12345678')."""
+    return ''.join(str(dni or '').split()).replace('.', '').upper()
+
+
 class Huesped(models.Model):
     nombre = models.CharField(max_length=100)
     apellido = models.CharField(max_length=100)
     dni = models.CharField(max_length=20, unique=True)
+    dni_normalizado = models.CharField(max_length=20, blank=True, db_index=True, editable=False)
     telefono = models.CharField(max_length=20)
     email = models.EmailField(blank=True, null=True)
 
@@ -74,6 +86,41 @@ class Huesped(models.Model):
     def __str__(self):
         return f"{self.apellido}, {self.nombre}"
 
+    def save(self, *args, **kwargs):
+        self.dni_normalizado = normalizar_dni(self.dni)
+        super().save(*args, **kwargs)
+
+
+# Posición de cada (modulo, accion) en Rol.mascara_permisos. Sólo se agregan
+# pares al final: cambiar el orden cambia el significado de las máscaras
+# guardadas. Entran hasta 63 (PositiveBigIntegerField).
+_ACCIONES_BASICAS = ('ver', 'crear', 'editar', 'eliminar', 'exportar')
+BITS_PERMISOS = (
+    *((modulo, accion) for modulo in (
+        'empleados', 'habitaciones', 'planes', 'promociones', 'servicios',
+        'huespedes', 'reservas', 'usuarios', 'dashboard',
+    ) for accion in _ACCIONES_BASICAS),
+    ('reservas', 'confirmar'), ('reservas', 'cancelar'),
+    *(('roles', accion) for accion in ('ver', 'crear', 'editar', 'eliminar', 'asignar', 'revocar')),
+    ('reportes', 'ver'), ('reportes', 'generar'), ('reportes', 'exportar'),
+    ('configuracion', 'ver'), ('configuracion', 'editar'),
+)
+BIT_PERMISO = {par: 1 << posicion for posicion, par in enumerate(BITS_PERMISOS)}
+MASCARA_TODOS = (1 << len(BITS_PERMISOS)) - 1
+
+
+def mascara_de(pares):
+    """Máscara de bits de unos pares (modulo, accion); los que no están en BITS_PERMISOS no cuentan."""
+    mascara = 0
+    for par in pares:
+        mascara |= BIT_PERMISO.get(tuple(par), 0)
+    return mascara
+
+
+def pares_de(mascara):
+    """Pares (modulo, accion) encendidos en `mascara`, en el orden de BITS_PERMISOS."""
+    return [par for par, bit in BIT_PERMISO.items() if mascara & bit]
+
 
 class Rol(models.Model):
     """Modelo para definir roles del sistema"""
@@ -92,6 +139,10 @@ class Rol(models.Model):
     nombre = models.CharField(max_length=50, choices=ROLES_CHOICES, unique=True)
     descripcion = models.TextField(blank=True)
     activo = models.BooleanField(default=True)
+    mascara_permisos = models.PositiveBigIntegerField(
+        default=0, editable=False,
+        help_text="Permisos del rol compilados (ver BITS_PERMISOS); se recalcula al cambiar RolPermiso",
+    )
     
     class Meta:
         ordering = ['nombre']
@@ -101,6 +152,24 @@ class Rol(models.Model):
     def __str__(self):
         return self.get_nombre_display()
 
+    def calcular_mascara(self):
+        # Super admin tiene todos los permisos
+        if self.nombre == 'super_admin':
+            return MASCARA_TODOS
+        if self.pk is None:
+            return 0
+        return mascara_de(self.permisos.values_list('permiso__modulo', 'permiso__accion'))
+
+    def recalcular_mascara(self):
+        """Vuelve a compilar mascara_permisos desde RolPermiso y la guarda (sin señales)."""
+        self.mascara_permisos = self.calcular_mascara()
+        Rol.objects.filter(pk=self.pk).update(mascara_permisos=self.mascara_permisos)
+        return self.mascara_permisos
+
+    def save(self, *args, **kwargs):
+        self.mascara_permisos = self.calcular_mascara()
+        super().save(*args, **kwargs)
+
 
 class Permiso(models.Model):
     """Modelo para definir permisos específicos"""
@@ -116,13 +185,13 @@ class Permiso(models.Model):
         ('dashboard', 'Dashboard'),
     ]
     
+    # Cada (modulo, accion) que se pueda elegir necesita su bit en BITS_PERMISOS
     ACCIONES_CHOICES = [
         ('ver', 'Ver'),
         ('crear', 'Crear'),
         ('editar', 'Editar'),
         ('eliminar', 'Eliminar'),
         ('exportar', 'Exportar'),
-        ('aprobar', 'Aprobar'),
     ]
     
     modulo = models.CharField(max_length=50, choices=MODULOS_CHOICES)
@@ -169,3 +238,247 @@ class UsuarioRol(models.Model):
     
     def __str__(self):
         return f"{self.usuario.username} - {self.rol}"
+
+
+class DocumentoBusqueda(models.Model):
+    """
+    Texto normalizado de cada objeto de los listados de administración, con
+    el índice de texto completo de la base (FTS5 en SQLite, FULLTEXT en
+    MariaDB). Ver administracion.busqueda.
+    """
+    indice = models.CharField(max_length=20)
+    objeto_id = models.PositiveBigIntegerField()
+    texto = models.TextField()
+
+    class Meta:
+        unique_together = ['indice', 'objeto_id']
+        verbose_name = 'Documento de búsqueda'
+        verbose_name_plural = 'Documentos de búsqueda'
+
+    def __str__(self):
+        return f"{self.indice}:{self.objeto_id}"
+
+
+class TrabajoReporte(models.Model):
+    """
+    Pedido de un reporte DOCX para un período (mes). Lo genera el comando
+    `procesar_reportes`; un trabajo listo y no obsoleto se reutiliza para el
+    mismo (tipo, periodo) hasta que cambia alguna reserva de ese mes.
+    """
+    TIPOS = [
+        ('ocupacion', 'Ocupación mensual'),
+        ('ingresos', 'Ingresos mensuales'),
+    ]
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('listo', 'Listo'),
+        ('error', 'Error'),
+    ]
+
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    periodo = models.DateField(help_text="Primer día del mes del reporte")
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    obsoleto = models.BooleanField(default=False, help_text="Cambiaron reservas del período después de generarlo")
+    archivo = models.FileField(upload_to='reportes/', blank=True)
+    error = models.TextField(blank=True)
+    solicitado_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='reportes')
+    fecha_solicitud = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-fecha_solicitud']
+        indexes = [
+            models.Index(fields=['periodo', 'obsoleto', 'tipo'], name='reporte_periodo_idx'),
+            models.Index(fields=['estado', 'fecha_solicitud'], name='reporte_cola_idx'),
+        ]
+        verbose_name = 'Trabajo de reporte'
+        verbose_name_plural = 'Trabajos de reportes'
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.periodo:%m/%Y} ({self.get_estado_display()})"
+
+
+class CorreoSaliente(models.Model):
+    """
+    Email en la bandeja de salida. Las vistas lo encolan dentro de la misma
+    transacción que el cambio que lo origina (administracion.correo.encolar);
+    lo entrega el comando `send_outbox`, con reintentos y espera creciente.
+    Un correo que agota sus intentos queda 'fallido' para revisarlo a mano.
+    """
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('enviando', 'Enviando'),
+        ('enviado', 'Enviado'),
+        ('fallido', 'Fallido'),
+    ]
+
+    asunto = models.CharField(max_length=255)
+    cuerpo = models.TextField()
+    cuerpo_html = models.TextField(blank=True)
+    remitente = models.CharField(max_length=255, blank=True)
+    destinatarios = models.JSONField(default=list)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    intentos = models.PositiveIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_envio = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['estado', 'proximo_intento'], name='correo_cola_idx'),
+        ]
+        verbose_name = 'Correo saliente'
+        verbose_name_plural = 'Correos salientes'
+
+    def __str__(self):
+        return f"{self.asunto} → {', '.join(self.destinatarios)} ({self.get_estado_display()})"
+
+
+class Campana(models.Model):
+    """
+    Envío de un plan o una promoción por email a los usuarios con
+    notificaciones activadas. Lo entrega el comando `enviar_campanas` por
+    lotes (administracion.campanas); el avance queda en cada EnvioCampana,
+    así que una campaña interrumpida se retoma donde quedó.
+    """
+    TIPOS = [
+        ('planes', 'Plan'),
+        ('promociones', 'Promoción'),
+    ]
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('enviando', 'Enviando'),
+        ('completada', 'Completada'),
+        ('error', 'Error'),
+    ]
+
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    asunto = models.CharField(max_length=255)
+    cuerpo = models.TextField()
+    cuerpo_html = models.TextField(blank=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    total = models.PositiveIntegerField(default=0)
+    excluidos = models.PositiveIntegerField(default=0, help_text="Usuarios sin notificaciones activadas")
+    error = models.TextField(blank=True)
+    creada_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='campanas')
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_actualizacion = models.DateTimeField(null=True, blank=True,
+                                               help_text="Última señal de vida del proceso que la envía")
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['estado', 'fecha_creacion'], name='campana_cola_idx'),
+        ]
+        verbose_name = 'Campaña'
+        verbose_name_plural = 'Campañas'
+
+    def __str__(self):
+        return f"{self.asunto} ({self.get_estado_display()})"
+
+
+class EnvioCampana(models.Model):
+    """Un destinatario de una Campana y el resultado de su envío."""
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('enviando', 'Enviando'),
+        ('enviado', 'Enviado'),
+        ('error', 'Error'),
+    ]
+
+    campana = models.ForeignKey(Campana, on_delete=models.CASCADE, related_name='envios')
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    email = models.EmailField()
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    error = models.TextField(blank=True)
+    fecha_envio = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ['campana', 'email']
+        indexes = [
+            models.Index(fields=['campana', 'estado'], name='envio_campana_estado_idx'),
+        ]
+        verbose_name = 'Envío de campaña'
+        verbose_name_plural = 'Envíos de campañas'
+
+    def __str__(self):
+        return f"{self.email} ({self.get_estado_display()})"
+
+
+# Modelos indexados en administracion.busqueda.INDICES
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Huesped)
+@receiver(post_save, sender=Plan)
+@receiver(post_save, sender=Promocion)
+@receiver(post_save, sender=Servicio)
+def indexar_para_busqueda(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Mantiene el índice de búsqueda al guardar un objeto de un modelo indexado."""
+    from . import busqueda
+
+    indice = busqueda.indice_de(sender)
+    if raw or indice is None:
+        return
+    # p. ej. el login sólo guarda last_login: no hace falta reindexar
+    if update_fields is None or set(update_fields) & set(busqueda.INDICES[indice][1]):
+        busqueda.indexar(instance, indice)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Huesped)
+@receiver(post_delete, sender=Plan)
+@receiver(post_delete, sender=Promocion)
+@receiver(post_delete, sender=Servicio)
+def desindexar_para_busqueda(sender, instance, **kwargs):
+    from . import busqueda
+
+    indice = busqueda.indice_de(sender)
+    if indice:
+        busqueda.desindexar(indice, instance.pk)
+
+
+# Activo mientras matriz_roles.guardar escribe RolPermiso en bloque
+_edicion_en_bloque = ContextVar('edicion_en_bloque', default=False)
+
+
+@contextmanager
+def edicion_en_bloque():
+    """
+    Dentro del bloque, las señales por fila de RolPermiso no recalculan la
+    máscara del rol ni invalidan la caché: quien lo usa lo hace una vez al final.
+    Es por hilo/tarea, así que no afecta a otros pedidos en curso.
+    """
+    token = _edicion_en_bloque.set(True)
+    try:
+        yield
+    finally:
+        _edicion_en_bloque.reset(token)
+
+
+@receiver([post_save, post_delete], sender=RolPermiso)
+def recalcular_mascara_rol(sender, instance, raw=False, **kwargs):
+    """Mantiene Rol.mascara_permisos al asignar o quitar un permiso."""
+    if raw or _edicion_en_bloque.get():
+        return
+    rol = Rol.objects.filter(pk=instance.rol_id).first()
+    if rol is not None:
+        rol.recalcular_mascara()
+
+
+@receiver([post_save, post_delete], sender=Rol)
+@receiver([post_save, post_delete], sender=Permiso)
+@receiver([post_save, post_delete], sender=RolPermiso)
+@receiver([post_save, post_delete], sender=UsuarioRol)
+def invalidar_permisos_resueltos(sender, **kwargs):
+    """Un cambio de roles o permisos descarta los permisos resueltos en caché."""
+    if sender is RolPermiso and _edicion_en_bloque.get():
+        return
+    from .permissions import invalidar_permisos
+
+    invalidar_permisos()
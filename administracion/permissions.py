@@ -1,10 +1,128 @@
-from functools import wraps
+import uuid
+from collections import namedtuple
+from functools import lru_cache, wraps
 from django.contrib.auth.decorators import user_passes_test
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
 from django.core.exceptions import PermissionDenied
+from django.db import transaction
 from django.shortcuts import redirect
 from django.contrib import messages
 from django.urls import reverse
-from .models import UsuarioRol, RolPermiso
+from django.utils.functional import SimpleLazyObject
+from .models import BIT_PERMISO, MASCARA_TODOS, Rol, UsuarioRol, mascara_de, pares_de
+
+
+# ===== Resolución de permisos =====
+# Cada rol guarda sus permisos compilados en una máscara de bits
+# (Rol.mascara_permisos, ver BITS_PERMISOS); la de un usuario es el OR de las
+# de sus roles activos, y un chequeo es un AND con el bit del permiso.
+# Las máscaras resueltas se guardan en la caché de Django bajo una versión
+# que cambia con Rol, RolPermiso, UsuarioRol y Permiso (señales de
+# administracion.models). Dentro de un pedido quedan además memorizadas en el
+# objeto usuario: con la caché caliente, un chequeo no hace consultas.
+# La versión sólo se comparte entre procesos si la caché también (Redis): con
+# LocMemCache cada worker tiene la suya y un permiso quitado seguiría vigente
+# en los demás, así que ahí las entradas duran apenas TTL_PERMISOS_LOCAL.
+
+CLAVE_VERSION_PERMISOS = 'permisos:version'
+TTL_PERMISOS = 60 * 60
+TTL_PERMISOS_LOCAL = 5
+
+# roles: UsuarioRol activos (con su rol); mascara: OR de las máscaras de sus roles
+PermisosUsuario = namedtuple('PermisosUsuario', ['roles', 'super_admin', 'mascara'])
+PermisosRol = namedtuple('PermisosRol', ['rol', 'super_admin', 'mascara'])
+
+_SIN_PERMISOS = PermisosUsuario((), False, 0)
+
+
+def _ttl_permisos():
+    """TTL de los permisos cacheados: largo sólo si la caché es compartida entre procesos."""
+    if isinstance(caches['default'], (LocMemCache, DummyCache)):
+        return TTL_PERMISOS_LOCAL
+    return TTL_PERMISOS
+
+
+def version_permisos():
+    valor = cache.get(CLAVE_VERSION_PERMISOS)
+    if valor is None:
+        valor = uuid.uuid4().hex
+        if not cache.add(CLAVE_VERSION_PERMISOS, valor, None):
+            valor = cache.get(CLAVE_VERSION_PERMISOS, valor)
+    return valor
+
+
+def invalidar_permisos():
+    """Descarta los permisos resueltos cuando se confirma la transacción en curso."""
+    transaction.on_commit(lambda: cache.set(CLAVE_VERSION_PERMISOS, uuid.uuid4().hex, None))
+
+
+def roles_activos():
+    """
+    {rol_id: PermisosRol} de todos los roles activos, en orden de nombre.
+    Una consulta con la caché fría; ninguna con la caché caliente.
+    """
+    clave = f'permisos:{version_permisos()}:roles'
+    roles = cache.get(clave)
+    if roles is None:
+        roles = {
+            # Super admin tiene todos los permisos
+            rol.pk: PermisosRol(rol, rol.nombre == 'super_admin', rol.mascara_permisos)
+            for rol in Rol.objects.filter(activo=True)
+        }
+        cache.set(clave, roles, _ttl_permisos())
+    return roles
+
+
+def permisos_resueltos(usuario):
+    """PermisosUsuario de `usuario`: memorizado en el pedido y cacheado entre pedidos."""
+    if not usuario.is_authenticated:
+        return _SIN_PERMISOS
+
+    version = version_permisos()
+    memo = getattr(usuario, '_permisos_resueltos', None)
+    if memo is not None and memo[0] == version:
+        return memo[1]
+
+    clave = f'permisos:{version}:usuario:{usuario.pk}:{int(usuario.is_superuser)}'
+    resueltos = cache.get(clave)
+    if resueltos is None:
+        por_rol = roles_activos()
+        asignaciones = tuple(
+            ur for ur in UsuarioRol.objects.filter(usuario=usuario, activo=True, rol__activo=True).select_related('rol')
+            if ur.rol_id in por_rol
+        )
+        super_admin = usuario.is_superuser or any(por_rol[ur.rol_id].super_admin for ur in asignaciones)
+        mascara = 0
+        for ur in asignaciones:
+            mascara |= por_rol[ur.rol_id].mascara
+        if super_admin:
+            # Super usuarios y super admins tienen todos los permisos
+            mascara = MASCARA_TODOS
+        resueltos = PermisosUsuario(asignaciones, super_admin, mascara)
+        cache.set(clave, resueltos, _ttl_permisos())
+    usuario._permisos_resueltos = (version, resueltos)
+    return resueltos
+
+
+def _dict_permisos(mascara):
+    """{modulo: [acciones]} a partir de una máscara de permisos."""
+    permisos_dict = {}
+    for modulo, accion in pares_de(mascara):
+        permisos_dict.setdefault(modulo, []).append(accion)
+    return permisos_dict
+
+
+def mascara_usuario(usuario):
+    """Máscara efectiva de `usuario` para templates (incluye el dashboard para staff)."""
+    if not usuario.is_authenticated:
+        return 0
+    mascara = permisos_resueltos(usuario).mascara
+    # Asegurar acceso de staff al dashboard
+    if usuario.is_staff:
+        mascara |= BIT_PERMISO[('dashboard', 'ver')]
+    return mascara
 
 
 def usuario_tiene_permiso(usuario, modulo, accion):
@@ -22,67 +140,39 @@ def usuario_tiene_permiso(usuario, modulo, accion):
     if modulo == 'dashboard' and accion == 'ver' and usuario.is_staff:
         return True
     
-    # Verificar si el usuario tiene roles activos
-    roles_usuario = UsuarioRol.objects.filter(
-        usuario=usuario, 
-        activo=True,
-        rol__activo=True
-    ).select_related('rol')
-    
-    if not roles_usuario.exists():
-        return False
-    
-    # Verificar si alguno de los roles tiene el permiso requerido
-    for usuario_rol in roles_usuario:
-        rol = usuario_rol.rol
-        
-        # Super admin tiene todos los permisos
-        if rol.nombre == 'super_admin':
-            return True
-        
-        # Verificar permisos específicos del rol
-        tiene_permiso = RolPermiso.objects.filter(
-            rol=rol,
-            permiso__modulo=modulo,
-            permiso__accion=accion
-        ).exists()
-        
-        if tiene_permiso:
-            return True
-    
-    return False
+    # Super admin tiene todos los permisos
+    resueltos = permisos_resueltos(usuario)
+    return resueltos.super_admin or bool(resueltos.mascara & BIT_PERMISO.get((modulo, accion), 0))
 
 
 def obtener_roles_usuario(usuario):
     """
     Obtiene todos los roles activos de un usuario
     """
-    if not usuario.is_authenticated:
-        return []
-    
-    return UsuarioRol.objects.filter(
-        usuario=usuario,
-        activo=True,
-        rol__activo=True
-    ).select_related('rol')
+    return list(permisos_resueltos(usuario).roles)
 
 
 def es_super_admin(usuario):
     """
     Verifica si el usuario es super administrador
     """
-    if not usuario.is_authenticated:
-        return False
-    
-    if usuario.is_superuser:
-        return True
-    
-    return UsuarioRol.objects.filter(
-        usuario=usuario,
-        rol__nombre='super_admin',
-        activo=True,
-        rol__activo=True
-    ).exists()
+    return permisos_resueltos(usuario).super_admin
+
+
+def _permiso_en_vista_previa(request, modulo, accion):
+    """
+    Vista como rol: si está activa y el usuario es Super Admin, valida contra
+    el rol simulado. Si el rol ya no existe, desactiva la vista previa.
+    """
+    preview_role_id = request.session.get('role_preview_id')
+    if preview_role_id and es_super_admin(request.user):
+        try:
+            preview_role = roles_activos()[int(preview_role_id)]
+        except (KeyError, TypeError, ValueError):
+            request.session.pop('role_preview_id', None)
+        else:
+            return preview_role.super_admin or bool(preview_role.mascara & BIT_PERMISO.get((modulo, accion), 0))
+    return usuario_tiene_permiso(request.user, modulo, accion)
 
 
 def requiere_permiso(modulo, accion, redirect_url=None):
@@ -93,26 +183,7 @@ def requiere_permiso(modulo, accion, redirect_url=None):
         @wraps(view_func)
         def wrapper(request, *args, **kwargs):
             # Vista como rol: si está activa y el usuario es Super Admin, validar contra el rol simulado
-            preview_role_id = request.session.get('role_preview_id')
-            allow = True
-            if preview_role_id and es_super_admin(request.user):
-                try:
-                    from .models import Rol, RolPermiso
-                    preview_role = Rol.objects.get(id=preview_role_id, activo=True)
-                    if preview_role.nombre == 'super_admin':
-                        allow = True
-                    else:
-                        allow = RolPermiso.objects.filter(
-                            rol=preview_role,
-                            permiso__modulo=modulo,
-                            permiso__accion=accion
-                        ).exists()
-                except Exception:
-                    # Si falla, desactivar vista previa y verificar permisos reales
-                    request.session.pop('role_preview_id', None)
-                    allow = usuario_tiene_permiso(request.user, modulo, accion)
-            else:
-                allow = usuario_tiene_permiso(request.user, modulo, accion)
+            allow = _permiso_en_vista_previa(request, modulo, accion)
 
             if not allow:
                 messages.error(
@@ -145,25 +216,7 @@ def requiere_staff_y_permiso(modulo, accion):
                 return redirect('administracion:admin_login')
             
             # Verificar permisos específicos (soportando vista previa de rol)
-            preview_role_id = request.session.get('role_preview_id')
-            allow = True
-            if preview_role_id and es_super_admin(request.user):
-                try:
-                    from .models import Rol, RolPermiso
-                    preview_role = Rol.objects.get(id=preview_role_id, activo=True)
-                    if preview_role.nombre == 'super_admin':
-                        allow = True
-                    else:
-                        allow = RolPermiso.objects.filter(
-                            rol=preview_role,
-                            permiso__modulo=modulo,
-                            permiso__accion=accion
-                        ).exists()
-                except Exception:
-                    request.session.pop('role_preview_id', None)
-                    allow = usuario_tiene_permiso(request.user, modulo, accion)
-            else:
-                allow = usuario_tiene_permiso(request.user, modulo, accion)
+            allow = _permiso_en_vista_previa(request, modulo, accion)
 
             if not allow:
                 messages.error(
@@ -181,53 +234,7 @@ def obtener_permisos_usuario(usuario):
     """
     Obtiene todos los permisos de un usuario organizados por módulo
     """
-    if not usuario.is_authenticated:
-        return {}
-    
-    if usuario.is_superuser:
-        # Super usuarios tienen todos los permisos
-        from .models import Permiso
-        permisos = Permiso.objects.all()
-        permisos_dict = {}
-        for permiso in permisos:
-            if permiso.modulo not in permisos_dict:
-                permisos_dict[permiso.modulo] = []
-            permisos_dict[permiso.modulo].append(permiso.accion)
-        return permisos_dict
-    
-    roles_usuario = obtener_roles_usuario(usuario)
-    permisos_dict = {}
-    
-    for usuario_rol in roles_usuario:
-        rol = usuario_rol.rol
-        
-        if rol.nombre == 'super_admin':
-            # Super admin tiene todos los permisos
-            from .models import Permiso
-            permisos = Permiso.objects.all()
-            for permiso in permisos:
-                if permiso.modulo not in permisos_dict:
-                    permisos_dict[permiso.modulo] = []
-                if permiso.accion not in permisos_dict[permiso.modulo]:
-                    permisos_dict[permiso.modulo].append(permiso.accion)
-        else:
-            # Obtener permisos específicos del rol
-            rol_permisos = RolPermiso.objects.filter(rol=rol).select_related('permiso')
-            for rol_permiso in rol_permisos:
-                permiso = rol_permiso.permiso
-                if permiso.modulo not in permisos_dict:
-                    permisos_dict[permiso.modulo] = []
-                if permiso.accion not in permisos_dict[permiso.modulo]:
-                    permisos_dict[permiso.modulo].append(permiso.accion)
-    
-    # Asegurar acceso de staff al dashboard en el diccionario para templates
-    if usuario.is_staff:
-        acciones = permisos_dict.get('dashboard', [])
-        if 'ver' not in acciones:
-            acciones.append('ver')
-            permisos_dict['dashboard'] = acciones
-
-    return permisos_dict
+    return _dict_permisos(mascara_usuario(usuario))
 
 
 class PermisosContextProcessor:
@@ -250,87 +257,81 @@ class PermisosContextProcessor:
         return response
 
 
-def convertir_permisos_para_template(permisos_dict):
+def convertir_permisos_para_template(mascara):
     """
-    Convierte el diccionario de permisos al formato esperado por el template
+    Convierte la máscara de permisos al formato esperado por el template
+    (permisos.<modulo>.<accion>). Acepta también el diccionario de
+    obtener_permisos_usuario.
     """
+    if isinstance(mascara, dict):
+        mascara = mascara_de((modulo, accion) for modulo, acciones in mascara.items() for accion in acciones)
+
     class PermisosModulo:
-        def __init__(self, acciones):
-            self.ver = 'ver' in acciones
-            self.crear = 'crear' in acciones
-            self.editar = 'editar' in acciones
-            self.eliminar = 'eliminar' in acciones
-            self.asignar = 'asignar' in acciones
-            self.revocar = 'revocar' in acciones
+        ACCIONES = ('ver', 'crear', 'editar', 'eliminar', 'asignar', 'revocar', 'exportar', 'generar', 'confirmar', 'cancelar')
+
+        def __init__(self, modulo):
+            for accion in self.ACCIONES:
+                setattr(self, accion, bool(mascara & BIT_PERMISO.get((modulo, accion), 0)))
     
     class PermisosTemplate:
-        def __init__(self, permisos_dict):
-            self.dashboard = PermisosModulo(permisos_dict.get('dashboard', []))
-            self.usuarios = PermisosModulo(permisos_dict.get('usuarios', []))
-            self.habitaciones = PermisosModulo(permisos_dict.get('habitaciones', []))
-            self.empleados = PermisosModulo(permisos_dict.get('empleados', []))
-            self.planes = PermisosModulo(permisos_dict.get('planes', []))
-            self.promociones = PermisosModulo(permisos_dict.get('promociones', []))
-            self.servicios = PermisosModulo(permisos_dict.get('servicios', []))
-            self.huespedes = PermisosModulo(permisos_dict.get('huespedes', []))
-            self.reservas = PermisosModulo(permisos_dict.get('reservas', []))
-            self.roles = PermisosModulo(permisos_dict.get('roles', []))
+        def __init__(self):
+            self.dashboard = PermisosModulo('dashboard')
+            self.usuarios = PermisosModulo('usuarios')
+            self.habitaciones = PermisosModulo('habitaciones')
+            self.empleados = PermisosModulo('empleados')
+            self.planes = PermisosModulo('planes')
+            self.promociones = PermisosModulo('promociones')
+            self.servicios = PermisosModulo('servicios')
+            self.huespedes = PermisosModulo('huespedes')
+            self.reservas = PermisosModulo('reservas')
+            self.roles = PermisosModulo('roles')
+            self.reportes = PermisosModulo('reportes')
     
-    return PermisosTemplate(permisos_dict)
+    return PermisosTemplate()
 
 
 def permisos_context(request):
     """
-    Context processor simple para templates
+    Context processor simple para templates.
+    Los valores son perezosos: no se consultan roles ni permisos hasta que un
+    template los lee (las páginas públicas no lo hacen).
     """
-    if request.user.is_authenticated:
+    if not request.user.is_authenticated:
+        return {}
+    usuario = request.user
+
+    @lru_cache(maxsize=None)
+    def vista_previa():
         # Modo vista previa de rol (solo afecta templates/UI)
         preview_role_id = request.session.get('role_preview_id')
-        preview_role = None
-        permisos_raw = {}
-        if preview_role_id:
-            try:
-                from .models import Rol, Permiso, RolPermiso
-                preview_role = Rol.objects.get(id=preview_role_id, activo=True)
-                if preview_role.nombre == 'super_admin':
-                    # Super Admin: todos los permisos
-                    permisos = Permiso.objects.all()
-                    for permiso in permisos:
-                        if permiso.modulo not in permisos_raw:
-                            permisos_raw[permiso.modulo] = []
-                        if permiso.accion not in permisos_raw[permiso.modulo]:
-                            permisos_raw[permiso.modulo].append(permiso.accion)
-                else:
-                    # Permisos del rol específico
-                    rol_permisos = RolPermiso.objects.filter(rol=preview_role).select_related('permiso')
-                    for rp in rol_permisos:
-                        permiso = rp.permiso
-                        if permiso.modulo not in permisos_raw:
-                            permisos_raw[permiso.modulo] = []
-                        if permiso.accion not in permisos_raw[permiso.modulo]:
-                            permisos_raw[permiso.modulo].append(permiso.accion)
-            except Exception:
-                # Si falla, desactivar preview y usar permisos reales
-                request.session.pop('role_preview_id', None)
-                permisos_raw = obtener_permisos_usuario(request.user)
-        else:
-            permisos_raw = obtener_permisos_usuario(request.user)
+        if not preview_role_id:
+            return None
+        try:
+            return roles_activos()[int(preview_role_id)]
+        except (KeyError, TypeError, ValueError):
+            # Si falla, desactivar preview y usar permisos reales
+            request.session.pop('role_preview_id', None)
+            return None
+
+    @lru_cache(maxsize=None)
+    def mascara():
+        preview_role = vista_previa()
+        if preview_role is not None:
+            return MASCARA_TODOS if preview_role.super_admin else preview_role.mascara
+        return mascara_usuario(usuario)
 
+    def roles_vista_previa():
         # Roles disponibles para selección de vista previa (solo Super Admin)
-        preview_roles = []
-        if es_super_admin(request.user):
-            try:
-                from .models import Rol
-                preview_roles = list(Rol.objects.filter(activo=True))
-            except Exception:
-                preview_roles = []
-        return {
-            'user_permissions': permisos_raw,
-            'permisos': convertir_permisos_para_template(permisos_raw),
-            'user_roles': [ur.rol for ur in obtener_roles_usuario(request.user)],
-            'is_super_admin': es_super_admin(request.user),
-            'role_preview_active': preview_role is not None,
-            'role_preview_role': preview_role,
-            'role_preview_roles': preview_roles,
-        }
-    return {}
+        if not es_super_admin(usuario):
+            return []
+        return [r.rol for r in roles_activos().values()]
+
+    return {
+        'user_permissions': SimpleLazyObject(lambda: _dict_permisos(mascara())),
+        'permisos': SimpleLazyObject(lambda: convertir_permisos_para_template(mascara())),
+        'user_roles': SimpleLazyObject(lambda: [ur.rol for ur in obtener_roles_usuario(usuario)]),
+        'is_super_admin': SimpleLazyObject(lambda: es_super_admin(usuario)),
+        'role_preview_active': SimpleLazyObject(lambda: vista_previa() is not None),
+        'role_preview_role': SimpleLazyObject(lambda: vista_previa().rol if vista_previa() is not None else None),
+        'role_preview_roles': SimpleLazyObject(roles_vista_previa),
+    }
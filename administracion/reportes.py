@@ -0,0 +1,229 @@
+"""
+Reportes mensuales en DOCX (python-docx).
+
+Cada tipo de TrabajoReporte.TIPOS tiene una definición en REPORTES: una
+función que arma los datos agregados del mes y otra que los escribe en el
+documento. Las vistas sólo encolan trabajos (`solicitar`); los genera el
+comando `procesar_reportes` (`tomar_pendiente` + `generar`).
+
+Un reporte listo se reutiliza para el mismo (tipo, periodo) hasta que cambia
+una reserva de ese mes: las señales de reservas.models llaman a `invalidar`,
+que marca obsoletos los trabajos de los meses afectados.
+"""
+from collections import namedtuple
+from datetime import timedelta
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import TrabajoReporte
+
+
+# Un trabajo "procesando" más viejo que esto se considera abandonado
+TIEMPO_MAXIMO_PROCESO = timedelta(minutes=30)
+
+ESTADOS_VENDIDOS = ('confirmada', 'activa', 'completada')
+
+Definicion = namedtuple('Definicion', ['datos', 'escribir'])
+
+
+def mes(fecha):
+    return fecha.replace(day=1)
+
+
+def mes_siguiente(periodo):
+    return (periodo.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def meses_afectados(check_in, check_out):
+    """Primer día de cada mes con noches de la estadía (o el del check-in)."""
+    if not check_in:
+        return set()
+    ultima_noche = max(check_out - timedelta(days=1), check_in) if check_out else check_in
+    meses, actual = set(), mes(check_in)
+    while actual <= ultima_noche:
+        meses.add(actual)
+        actual = mes_siguiente(actual)
+    return meses
+
+
+def invalidar(meses):
+    """Marca obsoletos los reportes de `meses`; el próximo pedido los vuelve a generar."""
+    if meses:
+        TrabajoReporte.objects.filter(periodo__in=meses, obsoleto=False).update(obsoleto=True)
+
+
+def solicitar(tipo, periodo, usuario=None):
+    """
+    Trabajo vigente para (tipo, mes de `periodo`): el listo, pendiente o en
+    proceso si existe, o uno nuevo en cola. Devuelve (trabajo, creado).
+    """
+    periodo = mes(periodo)
+    vigente = TrabajoReporte.objects.filter(
+        tipo=tipo, periodo=periodo, obsoleto=False,
+        estado__in=['pendiente', 'procesando', 'listo'],
+    ).first()
+    if vigente:
+        return vigente, False
+    return TrabajoReporte.objects.create(tipo=tipo, periodo=periodo, solicitado_por=usuario), True
+
+
+def tomar_pendiente():
+    """Reserva para este proceso el trabajo más antiguo en cola (compare-and-swap), o None."""
+    while True:
+        limite = timezone.now() - TIEMPO_MAXIMO_PROCESO
+        candidato = (
+            TrabajoReporte.objects
+            .filter(Q(estado='pendiente') | Q(estado='procesando', fecha_inicio__lt=limite))
+            .order_by('fecha_solicitud')
+            .values_list('pk', 'estado', 'fecha_inicio')
+            .first()
+        )
+        if candidato is None:
+            return None
+        pk, estado, fecha_inicio = candidato
+        if TrabajoReporte.objects.filter(pk=pk, estado=estado, fecha_inicio=fecha_inicio).update(
+            estado='procesando', fecha_inicio=timezone.now()
+        ):
+            return TrabajoReporte.objects.get(pk=pk)
+
+
+def generar(trabajo):
+    """Arma el DOCX de un trabajo y lo deja listo (o en error). Devuelve el trabajo."""
+    from docx import Document
+
+    try:
+        definicion = REPORTES[trabajo.tipo]
+        datos = definicion.datos(trabajo.periodo)
+        documento = Document()
+        documento.add_heading(f"{trabajo.get_tipo_display()} — {trabajo.periodo:%m/%Y}", level=0)
+        documento.add_paragraph(f"Generado el {timezone.localtime():%d/%m/%Y %H:%M}")
+        definicion.escribir(documento, datos)
+
+        contenido = BytesIO()
+        documento.save(contenido)
+        trabajo.archivo.save(f"{trabajo.tipo}-{trabajo.periodo:%Y-%m}.docx", ContentFile(contenido.getvalue()), save=False)
+        trabajo.estado = 'listo'
+        trabajo.error = ''
+    except Exception as e:
+        trabajo.estado = 'error'
+        trabajo.error = str(e)
+    trabajo.fecha_fin = timezone.now()
+    trabajo.save(update_fields=['archivo', 'estado', 'error', 'fecha_fin'])
+    return trabajo
+
+
+def _tabla(documento, encabezados, filas):
+    tabla = documento.add_table(rows=1, cols=len(encabezados))
+    tabla.style = 'Table Grid'
+    for celda, titulo in zip(tabla.rows[0].cells, encabezados):
+        celda.text = titulo
+    for fila in filas:
+        for celda, valor in zip(tabla.add_row().cells, fila):
+            celda.text = str(valor)
+    return tabla
+
+
+def _porcentaje(parte, total):
+    return f"{(parte / total * 100) if total else 0:.1f}%"
+
+
+# ===== Ocupación =====
+
+def datos_ocupacion(periodo):
+    from habitaciones.models import InventarioNoche, TipoHabitacion
+
+    desde, hasta = periodo, mes_siguiente(periodo)
+    dias = (hasta - desde).days
+    noches = InventarioNoche.objects.filter(fecha__gte=desde, fecha__lt=hasta)
+    por_tipo = {
+        fila['tipo_habitacion_id']: fila
+        for fila in noches.values('tipo_habitacion_id').annotate(vendidas=Sum('vendidas'), bloqueadas=Sum('bloqueadas'))
+    }
+    tipos = []
+    for tipo in TipoHabitacion.objects.order_by('nombre').values('id', 'nombre', 'stock_total'):
+        fila = por_tipo.get(tipo['id'], {})
+        tipos.append({
+            'nombre': tipo['nombre'],
+            'capacidad': tipo['stock_total'] * dias,
+            'vendidas': fila.get('vendidas') or 0,
+            'bloqueadas': fila.get('bloqueadas') or 0,
+        })
+    capacidad_diaria = sum(t['stock_total'] for t in TipoHabitacion.objects.values('stock_total'))
+    return {
+        'tipos': tipos,
+        'por_dia': list(noches.values('fecha').annotate(vendidas=Sum('vendidas')).order_by('fecha')),
+        'capacidad_diaria': capacidad_diaria,
+    }
+
+
+def escribir_ocupacion(documento, datos):
+    capacidad = sum(t['capacidad'] for t in datos['tipos'])
+    vendidas = sum(t['vendidas'] for t in datos['tipos'])
+    documento.add_paragraph(f"Noches vendidas: {vendidas} de {capacidad} ({_porcentaje(vendidas, capacidad)})")
+
+    documento.add_heading('Por tipo de habitación', level=1)
+    _tabla(documento, ['Tipo', 'Noches disponibles', 'Vendidas', 'Bloqueadas', 'Ocupación'], [
+        (t['nombre'], t['capacidad'], t['vendidas'], t['bloqueadas'], _porcentaje(t['vendidas'], t['capacidad']))
+        for t in datos['tipos']
+    ])
+
+    documento.add_heading('Por noche', level=1)
+    _tabla(documento, ['Fecha', 'Habitaciones vendidas', 'Ocupación'], [
+        (f"{d['fecha']:%d/%m/%Y}", d['vendidas'], _porcentaje(d['vendidas'], datos['capacidad_diaria']))
+        for d in datos['por_dia']
+    ])
+
+
+# ===== Ingresos =====
+
+def datos_ingresos(periodo):
+    from reservas.models import Reserva
+
+    reservas = Reserva.objects.filter(check_in__gte=periodo, check_in__lt=mes_siguiente(periodo))
+    vendidas = reservas.filter(estado__in=ESTADOS_VENDIDOS)
+    return {
+        'total': vendidas.aggregate(total=Sum('monto'))['total'] or 0,
+        'por_tipo': list(
+            vendidas.values('tipo_habitacion__nombre')
+            .annotate(reservas=Count('id'), habitaciones=Sum('cantidad_habitaciones'), ingresos=Sum('monto'))
+            .order_by('-ingresos')
+        ),
+        'por_metodo': list(
+            vendidas.values('metodo_pago').annotate(reservas=Count('id'), ingresos=Sum('monto')).order_by('-ingresos')
+        ),
+        'por_estado': list(reservas.values('estado').annotate(reservas=Count('id')).order_by('estado')),
+    }
+
+
+def escribir_ingresos(documento, datos):
+    from reservas.models import Reserva
+
+    metodos = dict(Reserva.METODOS_PAGO)
+    estados = dict(Reserva.ESTADOS_RESERVA)
+    documento.add_paragraph(f"Ingresos de reservas con check-in en el mes: ${datos['total']}")
+
+    documento.add_heading('Por tipo de habitación', level=1)
+    _tabla(documento, ['Tipo', 'Reservas', 'Habitaciones', 'Ingresos'], [
+        (f['tipo_habitacion__nombre'], f['reservas'], f['habitaciones'], f"${f['ingresos']}")
+        for f in datos['por_tipo']
+    ])
+
+    documento.add_heading('Por método de pago', level=1)
+    _tabla(documento, ['Método', 'Reservas', 'Ingresos'], [
+        (metodos.get(f['metodo_pago'], 'Sin especificar'), f['reservas'], f"${f['ingresos']}")
+        for f in datos['por_metodo']
+    ])
+
+    documento.add_heading('Reservas por estado', level=1)
+    _tabla(documento, ['Estado', 'Reservas'], [
+        (estados.get(f['estado'], f['estado']), f['reservas']) for f in datos['por_estado']
+    ])
+
+
+REPORTES = {
+    'ocupacion': Definicion(datos_ocupacion, escribir_ocupacion),
+    'ingresos': Definicion(datos_ingresos, escribir_ingresos),
+}
@@ -0,0 +1,77 @@
+"""
+Caché del contexto del dashboard de administración.
+
+Los números del dashboard son del hotel entero: todo el personal con el mismo
+rol principal y los mismos permisos ve lo mismo. Se calculan una vez por
+(rol, permisos) y se guardan en la caché de Django.
+
+- Invalidación: las señales de reservas.models llaman a `invalidar`, que
+  cambia la versión incluida en todas las claves. El TTL es una red de
+  seguridad para lo que no dispara señales.
+- Estampida: sólo quien consigue el candado (cache.add) recalcula; los demás
+  pedidos esperan a que aparezca el valor en lugar de recalcularlo también.
+"""
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+TTL = 60
+CLAVE_VERSION = 'dashboard:version'
+
+# El candado vence solo si quien calculaba murió sin liberarlo
+TIEMPO_CANDADO = 30
+# Espera máxima por el cálculo de otro pedido; después se calcula igual
+ESPERA_MAXIMA = 5
+INTERVALO_ESPERA = 0.05
+
+
+def version():
+    valor = cache.get(CLAVE_VERSION)
+    if valor is None:
+        valor = uuid.uuid4().hex
+        if not cache.add(CLAVE_VERSION, valor, None):
+            valor = cache.get(CLAVE_VERSION, valor)
+    return valor
+
+
+def invalidar():
+    """Descarta los dashboards calculados cuando se confirma la transacción en curso."""
+    transaction.on_commit(lambda: cache.set(CLAVE_VERSION, uuid.uuid4().hex, None))
+
+
+def clave(rol, permisos):
+    return f"dashboard:{version()}:{rol}:{','.join(sorted(f'{modulo}.{accion}' for modulo, accion in permisos))}"
+
+
+def obtener(rol, permisos, calcular):
+    """
+    Contexto del dashboard para (rol, permisos) desde la caché, o el resultado
+    de `calcular(permisos)`. `permisos` es el conjunto de (modulo, accion) del
+    que depende el cálculo; el resultado tiene que poder guardarse en la caché.
+    """
+    clave_datos = clave(rol, permisos)
+    datos = cache.get(clave_datos)
+    if datos is not None:
+        return datos
+
+    candado = f'{clave_datos}:calculando'
+    propio = cache.add(candado, 1, TIEMPO_CANDADO)
+    limite = time.monotonic() + ESPERA_MAXIMA
+    while not propio and time.monotonic() < limite:
+        time.sleep(INTERVALO_ESPERA)
+        datos = cache.get(clave_datos)
+        if datos is not None:
+            return datos
+        # Si el otro pedido falló y liberó el candado, calcular aquí
+        propio = cache.add(candado, 1, TIEMPO_CANDADO)
+
+    try:
+        datos = calcular(permisos)
+        cache.set(clave_datos, datos, TTL)
+    finally:
+        if propio:
+            cache.delete(candado)
+    return datos
@@ -1,3 +1,432 @@
-from django.test import TestCase
+import csv
+import io
+import zipfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from habitaciones import inventario
+from habitaciones.models import InventarioNoche, TipoHabitacion
+from reservas import transiciones
+from reservas.models import Reserva
+from . import exportar, matriz_roles, tablero
+from .models import (
+    BIT_PERMISO, MASCARA_TODOS, Campana, CorreoSaliente, EnvioCampana, Permiso, Rol, RolPermiso, UsuarioRol,
+)
+
+
+TABLAS_PERMISOS = tuple(
+    modelo._meta.db_table for modelo in (Permiso, Rol, RolPermiso, UsuarioRol)
+)
+
+
+class PermisosContextTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.huesped = User.objects.create_user('huesped', 'huesped@example.com', 'clave-segura-123')
+        self.client.force_login(self.huesped)
+
+    def consultas_de_permisos(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(url, secure=True)
+        self.assertEqual(respuesta.status_code, 200)
+        return [
+            consulta['sql'] for consulta in consultas.captured_queries
+            if any(tabla in consulta['sql'] for tabla in TABLAS_PERMISOS)
+        ]
+
+    def test_pagina_publica_no_consulta_permisos(self):
+        self.assertEqual(self.consultas_de_permisos(reverse('index')), [])
+
+    def test_permisos_se_resuelven_al_leerlos(self):
+        from .permissions import permisos_context
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rol = Rol.objects.create(nombre='recepcionista')
+            permiso = Permiso.objects.create(modulo='reservas', accion='ver')
+            RolPermiso.objects.create(rol=rol, permiso=permiso)
+            UsuarioRol.objects.create(usuario=self.huesped, rol=rol)
+
+        request = self.client.get(reverse('index'), secure=True).wsgi_request
+        contexto = permisos_context(request)
+        self.assertTrue(contexto['permisos'].reservas.ver)
+        self.assertFalse(contexto['permisos'].reservas.crear)
+        self.assertFalse(contexto['is_super_admin'])
+        self.assertEqual(list(contexto['user_roles']), [rol])
+
+    def test_sin_cache_compartida_los_permisos_vencen_enseguida(self):
+        from . import permissions
+
+        # LocMemCache es por proceso: la invalidación no llegaría a los otros workers
+        self.assertEqual(permissions._ttl_permisos(), permissions.TTL_PERMISOS_LOCAL)
+        compartida = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost'}}
+        with override_settings(CACHES=compartida):
+            self.assertEqual(permissions._ttl_permisos(), permissions.TTL_PERMISOS)
+
+
+class BitsPermisosTests(TestCase):
+    def test_cada_permiso_elegible_tiene_su_bit(self):
+        for modulo, _ in Permiso.MODULOS_CHOICES:
+            for accion, _ in Permiso.ACCIONES_CHOICES:
+                self.assertIn((modulo, accion), BIT_PERMISO)
+
+    def test_permisos_de_init_roles_tienen_su_bit(self):
+        call_command('init_roles', stdout=io.StringIO())
+        for par in Permiso.objects.values_list('modulo', 'accion'):
+            self.assertIn(par, BIT_PERMISO)
+        self.assertEqual(Rol.objects.get(nombre='super_admin').mascara_permisos, MASCARA_TODOS)
+        self.assertLess(MASCARA_TODOS, 1 << 63)
+
+
+class BackendCaido(BaseEmailBackend):
+    """Backend de email que no logra conectarse (servidor SMTP caído)."""
+
+    def open(self):
+        raise ConnectionRefusedError('SMTP no disponible')
+
+    def send_messages(self, email_messages):
+        raise ConnectionRefusedError('SMTP no disponible')
+
+
+class BandejaSalidaTests(TestCase):
+    def test_send_outbox_entrega_los_pendientes(self):
+        from . import correo
+
+        correo.encolar('Hola', 'Cuerpo', ['a@example.com'])
+        correo.encolar('Chau', 'Cuerpo', ['b@example.com'], cuerpo_html='<p>Cuerpo</p>')
+        self.assertEqual(len(mail.outbox), 0)
+
+        call_command('send_outbox', stdout=io.StringIO())
+
+        self.assertEqual(sorted(m.subject for m in mail.outbox), ['Chau', 'Hola'])
+        self.assertFalse(CorreoSaliente.objects.exclude(estado='enviado').exists())
+
+    @override_settings(EMAIL_BACKEND='administracion.tests.BackendCaido')
+    def test_reintentos_con_espera_y_fallido(self):
+        from . import correo
+
+        pendiente = correo.encolar('Hola', 'Cuerpo', ['a@example.com'])
+        for intento in range(1, correo.MAX_INTENTOS + 1):
+            CorreoSaliente.objects.filter(pk=pendiente.pk).update(proximo_intento=timezone.now())
+            call_command('send_outbox', stdout=io.StringIO())
+            pendiente.refresh_from_db()
+            self.assertEqual(pendiente.intentos, intento)
+
+            if intento < correo.MAX_INTENTOS:
+                self.assertEqual(pendiente.estado, 'pendiente')
+                self.assertGreater(pendiente.proximo_intento, timezone.now() + correo.espera(intento) / 2)
+        self.assertEqual(pendiente.estado, 'fallido')
+        self.assertIn('SMTP no disponible', pendiente.ultimo_error)
+
+    def test_espera_exponencial_con_tope(self):
+        from . import correo
+
+        minuto = timedelta(minutes=1)
+        self.assertEqual([correo.espera(i) for i in range(0, 9)], [
+            minuto, minuto, 2 * minuto, 4 * minuto, 8 * minuto, 16 * minuto, 32 * minuto, 64 * minuto,
+            correo.ESPERA_MAXIMA,
+        ])
+        self.assertEqual(correo.espera(50), correo.ESPERA_MAXIMA)
+
+    def test_tomar_lote_no_repite_ni_adelanta(self):
+        from . import correo
+
+        listo = correo.encolar('Listo', 'Cuerpo', ['a@example.com'])
+        correo.encolar('Después', 'Cuerpo', ['b@example.com'])
+        CorreoSaliente.objects.exclude(pk=listo.pk).update(proximo_intento=timezone.now() + timedelta(minutes=5))
+        abandonado = correo.encolar('Abandonado', 'Cuerpo', ['c@example.com'])
+        CorreoSaliente.objects.filter(pk=abandonado.pk).update(
+            estado='enviando', fecha_inicio=timezone.now() - correo.TIEMPO_MAXIMO_ENVIO - timedelta(minutes=1),
+        )
+
+        self.assertEqual({c.asunto for c in correo.tomar_lote()}, {'Listo', 'Abandonado'})
+        # Otro proceso no vuelve a tomar los que están enviándose
+        self.assertEqual(correo.tomar_lote(), [])
+
+
+class CampanasTests(TestCase):
+    def setUp(self):
+        for i in range(5):
+            User.objects.create_user(f'cliente{i}', f'cliente{i}@example.com', 'clave-segura-123')
+
+    def test_campana_se_retoma_sin_repetir_envios(self):
+        from . import campanas
+
+        campana = campanas.crear('promociones', 'Promo', '<p>Promo</p>')
+        self.assertEqual(campana.total, 5)
+        # Un envío anterior llegó al primer destinatario antes de cortarse
+        primero = campana.envios.order_by('pk').first()
+        EnvioCampana.objects.filter(pk=primero.pk).update(estado='enviado')
+
+        with override_settings(EMAIL_BACKEND='administracion.tests.BackendCaido'):
+            call_command('enviar_campanas', stdout=io.StringIO())
+        campana.refresh_from_db()
+        self.assertEqual(campana.estado, 'error')
+        self.assertEqual(campanas.progreso(campana)['pendientes'], 4)
+
+        campanas.reanudar(campana)
+        call_command('enviar_campanas', '--lote', '2', '--por-minuto', '0', stdout=io.StringIO())
+
+        campana.refresh_from_db()
+        self.assertEqual(campana.estado, 'completada')
+        self.assertEqual(len(mail.outbox), 4)
+        self.assertNotIn(primero.email, [m.to[0] for m in mail.outbox])
+        self.assertEqual(campanas.progreso(campana)['enviados'], 5)
+
+    def test_destinatarios_solo_suscriptos_activos_con_email(self):
+        from usuarios.models import Profile
+        from . import campanas
+
+        Profile.objects.filter(user__username='cliente0').update(notifications_enabled=False)
+        User.objects.filter(username='cliente1').update(is_active=False)
+        User.objects.filter(username='cliente2').update(email='')
+        # Sin perfil (usuarios anteriores a los perfiles): siguen suscriptos
+        Profile.objects.filter(user__username='cliente3').delete()
+
+        self.assertEqual(
+            [email for _, email in campanas.destinatarios()],
+            ['cliente3@example.com', 'cliente4@example.com'],
+        )
+        self.assertEqual(campanas.excluidos(), 1)
+
+    def test_campana_retomada_no_repite_destinatarios(self):
+        from . import campanas
+
+        campana = campanas.crear('promociones', 'Promo', '<p>Promo</p>')
+        primero = campanas.tomar_pendiente()
+        # El primer proceso tomó un destinatario y dejó de dar señales
+        tomado = campana.envios.order_by('pk').first()
+        EnvioCampana.objects.filter(pk=tomado.pk).update(estado='enviando')
+        Campana.objects.filter(pk=campana.pk).update(
+            fecha_actualizacion=timezone.now() - campanas.TIEMPO_MAXIMO_LOTE - timedelta(seconds=1)
+        )
+        segundo = campanas.tomar_pendiente()
+        self.assertEqual(segundo.pk, campana.pk)
+
+        # El primero seguía vivo: nota que lo retomaron y no envía nada
+        campanas.enviar(primero, por_minuto=0)
+        self.assertEqual(len(mail.outbox), 0)
+        campanas.enviar(segundo, por_minuto=0)
+
+        self.assertEqual(segundo.estado, 'completada')
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), sorted(
+            campana.envios.exclude(pk=tomado.pk).values_list('email', flat=True)
+        ))
+        self.assertEqual(EnvioCampana.objects.get(pk=tomado.pk).estado, 'error')
+
+
+class BusquedaTests(TestCase):
+    def test_registro_masivo_de_huespedes_queda_indexado(self):
+        from habitaciones.models import TipoHabitacion
+        from reservas.huespedes import registrar_huespedes
+        from reservas.models import Reserva
+        from . import busqueda
+
+        usuario = User.objects.create_user('titular', 'titular@example.com', 'clave-segura-123')
+        tipo = TipoHabitacion.objects.create(nombre='Simple', precio=100, stock_total=2, stock_disponible=2)
+        reserva = Reserva.objects.create(usuario=usuario, tipo_habitacion=tipo)
+        registrar_huespedes(reserva, [
+            {'nombre': 'Rosa', 'apellido': 'Quintanilla', 'edad': 40, 'genero': 'F', 'dni': '30.111.222'},
+        ])
+        self.assertEqual(len(busqueda.search('huespedes', 'quintanilla')), 1)
+
+    def test_filtrar_recorta_sin_perder_resultados_al_exportar(self):
+        from . import busqueda
+        from .models import Huesped
+
+        for i in range(3):
+            Huesped.objects.create(nombre='Ana', apellido=f'Gómez {i}', dni=f'2000000{i}', telefono='', email='')
+        self.assertEqual(busqueda.filtrar(Huesped.objects.all(), 'huespedes', 'gomez', limite=2).count(), 2)
+        self.assertEqual(busqueda.filtrar(Huesped.objects.all(), 'huespedes', 'gomez', limite=None).count(), 3)
+
+
+class ExportarTests(TestCase):
+    FILAS = [('=HYPERLINK("http://x")', '+54 11', '@SUM(A1)', '\tx', 'Pérez', Decimal('-5.50'), -3)]
+
+    def test_csv_neutraliza_formulas(self):
+        texto = ''.join(exportar.filas_csv(['a', 'b', 'c', 'd', 'e', 'f', 'g'], self.FILAS))
+        fila = list(csv.reader(io.StringIO(texto.lstrip('\ufeff'))))[1]
+        self.assertEqual(fila, ["'=HYPERLINK(\"http://x\")", "'+54 11", "'@SUM(A1)", "'\tx", 'Pérez', '-5.50', '-3'])
+
+    def test_xlsx_neutraliza_formulas(self):
+        datos = b''.join(exportar.filas_xlsx(['a', 'b', 'c', 'd', 'e', 'f', 'g'], self.FILAS))
+        hoja = zipfile.ZipFile(io.BytesIO(datos)).read('xl/worksheets/sheet1.xml').decode()
+        self.assertIn('<t xml:space="preserve">\'=HYPERLINK("http://x")</t>', hoja)
+        self.assertIn('<t xml:space="preserve">\'@SUM(A1)</t>', hoja)
+        self.assertIn('<c r="F2"><v>-5.50</v></c>', hoja)
+
+
+class AccionMasivaReservasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('gerente', 'gerente@example.com', 'clave-segura-123')
+        self.client.force_login(self.admin)
+        self.tipo = TipoHabitacion.objects.create(nombre='Doble', precio=100, stock_total=3, stock_disponible=3)
+        hoy = timezone.localdate()
+        self.reservas = [
+            Reserva.objects.create(
+                usuario=self.admin, tipo_habitacion=self.tipo,
+                check_in=hoy + timedelta(days=1 + i), check_out=hoy + timedelta(days=3 + i),
+            )
+            for i in range(4)
+        ]
+        self.reservas[0].confirmar()
+
+    def ledger(self):
+        return list(InventarioNoche.objects.filter(tipo_habitacion=self.tipo).order_by('fecha').values_list(
+            'fecha', 'retenidas', 'vendidas'))
+
+    def test_seleccion_mixta_cambia_solo_las_validas(self):
+        ids = [r.pk for r in self.reservas] + [99999]
+        respuesta = self.client.post(reverse('administracion:reservas_accion_masiva'), {
+            'accion': 'confirmar', 'ids': ','.join(map(str, ids)), 'formato': 'json',
+        }, secure=True)
+        datos = respuesta.json()
+        resultados = datos['resultados']
+
+        # Stock 3: la ya confirmada ocupa uno, entran dos de las tres pendientes
+        self.assertEqual(datos['exitosas'], 2)
+        self.assertEqual(resultados[str(self.reservas[0].pk)], 'confirmada')
+        self.assertEqual(resultados['99999'], transiciones.NO_ENCONTRADA)
+        self.assertEqual(list(resultados.values()).count(transiciones.SIN_STOCK), 1)
+
+        self.tipo.refresh_from_db()
+        self.assertEqual(self.tipo.stock_disponible, 0)
+        self.assertEqual(Reserva.objects.filter(estado='confirmada').count(), 3)
+        ledger = self.ledger()
+        inventario.reconstruir()
+        self.assertEqual(self.ledger(), ledger)
+
+    def test_informa_las_rechazadas(self):
+        respuesta = self.client.post(reverse('administracion:reservas_accion_masiva'), {
+            'accion': 'completar', 'ids': [self.reservas[0].pk, self.reservas[1].pk],
+        }, secure=True, follow=True)
+        avisos = [str(m) for m in respuesta.context['messages']]
+        self.assertIn(f'2 reservas sin cambios (#{self.reservas[0].pk}: confirmada, #{self.reservas[1].pk}: pendiente).', avisos)
+        self.tipo.refresh_from_db()
+        self.assertEqual(self.tipo.stock_disponible, 2)
+
+
+class ListadoReservasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('gerente', 'gerente@example.com', 'clave-segura-123')
+        self.client.force_login(self.admin)
+        tipo = TipoHabitacion.objects.create(nombre='Doble', precio=100, stock_total=9, stock_disponible=9)
+        hoy = timezone.localdate()
+        self.reservas = [
+            Reserva.objects.create(usuario=self.admin, tipo_habitacion=tipo,
+                                   check_in=hoy + timedelta(days=1), check_out=hoy + timedelta(days=2))
+            for _ in range(5)
+        ]
+        # Empates en fecha_reserva: el cursor desempata por id
+        Reserva.objects.update(fecha_reserva=timezone.now())
+        self.reservas[1].confirmar()
+
+    def pagina(self, **parametros):
+        respuesta = self.client.get(reverse('administracion:ver_reservas'), dict(parametros, formato='json'), secure=True)
+        return respuesta.status_code, respuesta.json()
+
+    def test_recorrer_paginas_sin_saltos_ni_repetidos(self):
+        vistos, parametros = [], {'por_pagina': 2}
+        while True:
+            _, datos = self.pagina(**parametros)
+            vistos += [r['id'] for r in datos['reservas']]
+            if not datos['siguiente']:
+                break
+            parametros['despues'] = datos['siguiente']
+        self.assertEqual(sorted(vistos), sorted(r.pk for r in self.reservas))
+        self.assertEqual(len(vistos), len(set(vistos)))
+
+        _, primera = self.pagina(por_pagina=2)
+        _, segunda = self.pagina(por_pagina=2, despues=primera['siguiente'])
+        _, de_vuelta = self.pagina(por_pagina=2, antes=segunda['anterior'])
+        self.assertEqual(de_vuelta['reservas'], primera['reservas'])
+
+    def test_filtro_y_cursor_invalido(self):
+        _, datos = self.pagina(estado='confirmada')
+        self.assertEqual([r['id'] for r in datos['reservas']], [self.reservas[1].pk])
+        estado, datos = self.pagina(despues='no-es-un-cursor')
+        self.assertEqual(estado, 400)
+        self.assertIn('Cursor de paginación inválido.', datos['errores'])
+
+
+class TableroTests(TestCase):
+    PERMISOS = {('reservas', 'ver'), ('dashboard', 'ver')}
+
+    def setUp(self):
+        cache.clear()
+        self.calculos = []
+
+    def calcular(self, permisos):
+        self.calculos.append(permisos)
+        return {'reservas': len(self.calculos)}
+
+    def test_se_calcula_una_vez_por_rol_y_permisos(self):
+        self.assertEqual(tablero.obtener('recepcionista', self.PERMISOS, self.calcular), {'reservas': 1})
+        self.assertEqual(tablero.obtener('recepcionista', set(self.PERMISOS), self.calcular), {'reservas': 1})
+        tablero.obtener('recepcionista', {('dashboard', 'ver')}, self.calcular)
+        self.assertEqual(len(self.calculos), 2)
+
+    def test_una_reserva_nueva_invalida_al_confirmar(self):
+        tablero.obtener('admin_general', self.PERMISOS, self.calcular)
+        usuario = User.objects.create_user('titular', 'titular@example.com', 'clave-segura-123')
+        tipo = TipoHabitacion.objects.create(nombre='Doble', precio=100, stock_total=2, stock_disponible=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            Reserva.objects.create(usuario=usuario, tipo_habitacion=tipo)
+            # Antes del commit se sigue sirviendo lo calculado
+            self.assertEqual(tablero.obtener('admin_general', self.PERMISOS, self.calcular), {'reservas': 1})
+        self.assertEqual(tablero.obtener('admin_general', self.PERMISOS, self.calcular), {'reservas': 2})
+
+    def test_sin_candado_espera_el_calculo_del_otro_pedido(self):
+        clave = tablero.clave('admin_general', self.PERMISOS)
+        cache.add(f'{clave}:calculando', 1, tablero.TIEMPO_CANDADO)
+        # Mientras este pedido espera, el que tiene el candado guarda el resultado
+        with mock.patch.object(tablero.time, 'sleep', lambda segundos: cache.set(clave, {'reservas': 7})):
+            self.assertEqual(tablero.obtener('admin_general', self.PERMISOS, self.calcular), {'reservas': 7})
+        self.assertEqual(self.calculos, [])
+
+
+class MatrizRolesTests(TestCase):
+    def setUp(self):
+        self.recepcion = Rol.objects.create(nombre='recepcionista')
+        self.lectura = Rol.objects.create(nombre='solo_lectura')
+        self.ver, self.crear, self.editar = (
+            Permiso.objects.create(modulo='reservas', accion=accion) for accion in ('ver', 'crear', 'editar')
+        )
+        self.conservado = RolPermiso.objects.create(rol=self.recepcion, permiso=self.ver)
+        RolPermiso.objects.create(rol=self.recepcion, permiso=self.crear)
+        self.ajeno = RolPermiso.objects.create(rol=self.lectura, permiso=self.ver)
+
+    def test_guarda_solo_la_diferencia(self):
+        cambios = matriz_roles.guardar({str(self.recepcion.pk): [str(self.ver.pk), str(self.editar.pk), '999']})
+        self.assertEqual(cambios, matriz_roles.Cambios(agregados=1, quitados=1))
+
+        # La fila que no cambia es la misma (no se borra y se vuelve a crear)
+        self.assertEqual(
+            set(RolPermiso.objects.filter(rol=self.recepcion).values_list('pk', 'permiso')) - {(self.conservado.pk, self.ver.pk)},
+            {(RolPermiso.objects.get(rol=self.recepcion, permiso=self.editar).pk, self.editar.pk)},
+        )
+        self.assertTrue(RolPermiso.objects.filter(pk=self.ajeno.pk).exists())
+        self.recepcion.refresh_from_db()
+        self.assertEqual(
+            self.recepcion.mascara_permisos,
+            BIT_PERMISO[('reservas', 'ver')] | BIT_PERMISO[('reservas', 'editar')],
+        )
+
+    def test_sin_cambios_no_escribe(self):
+        matriz = matriz_roles.leer([self.recepcion])
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(matriz_roles.guardar(matriz), matriz_roles.Cambios(0, 0))
+        self.assertFalse([c for c in consultas.captured_queries if c['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))])
@@ -14,6 +14,7 @@ urlpatterns = [
     # Usuarios
     path("usuarios/", views.usuarios_list, name="usuarios_list"),
     path("usuarios/<int:user_id>/", views.usuario_detail, name="usuario_detail"),
+    path("usuarios/exportar/", views.exportar_usuarios, name="exportar_usuarios"),
     path("usuarios/<int:user_id>/bloquear/", views.block_user, name="block_user"),
     path("usuarios/<int:user_id>/desbloquear/", views.unblock_user, name="unblock_user"),
     path('reservas/activar/<int:reserva_id>/', views.activar_reserva, name='activar_reserva'),
@@ -33,6 +34,11 @@ urlpatterns = [
     path("promociones/editar/<int:pk>/", views.promociones_edit, name="promociones_edit"),
     path("promociones/eliminar/<int:pk>/", views.promociones_delete, name="promociones_delete"),
     path("promociones/enviar/<int:pk>/", views.promociones_send_email, name="promociones_send_email"),
+
+    # Campañas de email (planes y promociones)
+    path("campanas/<int:pk>/", views.campana_detalle, name="campana_detalle"),
+    path("campanas/<int:pk>/progreso/", views.campana_progreso, name="campana_progreso"),
+    path("campanas/<int:pk>/reanudar/", views.campana_reanudar, name="campana_reanudar"),
     path("promociones/previsualizar/<int:pk>/", views.promociones_preview_email, name="promociones_preview_email"),
 
     # Servicios
@@ -44,6 +50,7 @@ urlpatterns = [
     # Huéspedes
     path("huespedes/", views.huespedes_list, name="huespedes_list"),
     path("huespedes/detalle/<int:pk>/", views.huesped_detail, name="huesped_detail"),
+    path("huespedes/exportar/", views.exportar_huespedes, name="exportar_huespedes"),
     path("huespedes/nuevo/", views.huespedes_create, name="huespedes_create"),
     path("huespedes/editar/<int:pk>/", views.huespedes_edit, name="huespedes_edit"),
     path("huespedes/eliminar/<int:pk>/", views.huespedes_delete, name="huespedes_delete"),
@@ -53,6 +60,14 @@ urlpatterns = [
         # acciones sobre reservas (confirmar / rechazar)
     path('reservas/confirmar/<int:reserva_id>/', views.confirmar_reserva_admin, name='confirmar_reserva_admin'),
     path('reservas/rechazar/<int:reserva_id>/', views.rechazar_reserva_admin, name='rechazar_reserva_admin'),
+    path('reservas/accion-masiva/', views.reservas_accion_masiva, name='reservas_accion_masiva'),
+    path('reservas/exportar/', views.exportar_reservas, name='exportar_reservas'),
+
+    # Reportes DOCX
+    path('reportes/', views.reportes_list, name='reportes_list'),
+    path('reportes/solicitar/', views.reportes_solicitar, name='reportes_solicitar'),
+    path('reportes/<int:pk>/descargar/', views.reporte_descargar, name='reporte_descargar'),
+    path('reportes/ocupacion.json', views.ocupacion_json, name='ocupacion_json'),
     path('reservas/finalizar/<int:reserva_id>/', views.finalizar_reserva_admin, name='finalizar_reserva_admin'),
 
     # listado y control de huéspedes activos
@@ -64,6 +79,7 @@ urlpatterns = [
     path('roles/nuevo/', views.roles_create, name='roles_create'),
     path('roles/editar/<int:pk>/', views.roles_edit, name='roles_edit'),
     path('roles/eliminar/<int:pk>/', views.roles_delete, name='roles_delete'),
+    path('roles/matriz/', views.roles_matriz, name='roles_matriz'),
     path('roles/asignar/', views.asignar_rol, name='asignar_rol'),
     path('roles/cambiar/', views.cambiar_rol, name='cambiar_rol'),
     path('roles/revocar/<int:asignacion_id>/', views.revocar_rol, name='revocar_rol'),
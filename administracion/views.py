@@ -1,6 +1,7 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.core.paginator import Paginator
 from django.contrib import messages
+from django.core.exceptions import ValidationError
 from django.db.models import Q, Sum
 from django.utils import timezone
 from django.contrib.auth import login, logout
@@ -8,9 +9,15 @@ from django.contrib.auth.decorators import login_required
 from django.views.decorators.cache import never_cache
 from django.views.decorators.csrf import csrf_protect
 from django.urls import reverse
+import base64
 import uuid
-from reservas.models import Reserva, Huesped as ReservaHuesped
-from .models import Empleado, Plan, Promocion, Servicio, Huesped, Rol, UsuarioRol, Permiso, RolPermiso
+from reservas.models import DailyStats, Reserva, Huesped as ReservaHuesped
+from reservas import transiciones
+from reservas.huespedes import registrar_huespedes
+from . import busqueda, campanas, exportar, matriz_roles, reportes, tablero
+from .models import (
+    Campana, Empleado, Plan, Promocion, Servicio, Huesped, Rol, UsuarioRol, Permiso, TrabajoReporte, normalizar_dni,
+)
 from .forms import EmpleadoForm, PlanForm, PromocionForm, ServicioForm, HuespedForm, AdminLoginForm, ReservaRapidaForm
 
 # imports para gestión de usuarios
@@ -27,15 +34,11 @@ from .permissions import (
     requiere_permiso, 
     usuario_tiene_permiso,
     obtener_permisos_usuario,
-    es_super_admin
+    es_super_admin,
+    invalidar_permisos,
 )
 
-# imports para envío de emails
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
-from django.core.mail import EmailMultiAlternatives
-from django.conf import settings
-from django.http import HttpResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 
 # ===== VISTAS DE AUTENTICACIÓN PARA ADMINISTRACIÓN =====
 
@@ -81,26 +84,6 @@ def admin_logout(request):
     return redirect('administracion:admin_login')
 
 
-@login_required
-@requiere_staff_y_permiso('dashboard', 'ver')
-def dashboard(request):
-    """Dashboard principal de administración"""
-    # Estadísticas básicas
-    total_usuarios = User.objects.count()
-    total_empleados = Empleado.objects.count()
-    total_reservas = Reserva.objects.count()
-    reservas_activas = Reserva.objects.filter(estado='activa').count()
-    
-    context = {
-        'total_usuarios': total_usuarios,
-        'total_empleados': total_empleados,
-        'total_reservas': total_reservas,
-        'reservas_activas': reservas_activas,
-        'user_permissions': obtener_permisos_usuario(request.user),
-    }
-    
-    return render(request, 'administracion/dashboard.html', context)
-
 # ===== VISTAS DE GESTIÓN DE USUARIOS =====
 
 @requiere_staff_y_permiso('usuarios', 'ver')
@@ -111,12 +94,7 @@ def usuarios_list(request):
     # Búsqueda de usuarios
     query = request.GET.get('q')
     if query:
-        usuarios = usuarios.filter(
-            Q(username__icontains=query) | 
-            Q(email__icontains=query) | 
-            Q(first_name__icontains=query) | 
-            Q(last_name__icontains=query)
-        )
+        usuarios = busqueda.filtrar(usuarios, 'usuarios', query, request)
     
     # Filtros de estado
     status_filter = request.GET.get('status')
@@ -222,18 +200,22 @@ def activar_reserva(request, reserva_id):
     messages.success(request, f"Reserva activada. Huéspedes activos creados: {creados}.")
     return redirect('administracion:ver_reservas')
 
-@requiere_staff_y_permiso('dashboard', 'ver')
-def dashboard(request):
-    from datetime import datetime, timedelta
+
+# Módulos cuyo permiso 'ver' cambia lo que muestra el dashboard
+MODULOS_DASHBOARD = ('reservas', 'huespedes', 'empleados', 'habitaciones')
+
+
+def _calcular_dashboard(permisos):
+    """Estadísticas del dashboard para un conjunto de permisos (cacheado en administracion/tablero.py)."""
+    from datetime import timedelta
     from django.db.models import Count, Q
     from habitaciones.models import Habitacion
     from reservas.models import HuespedActivo
     
-    # Verificar permisos específicos para mostrar información
     context = {}
     
-    # Fechas para filtros
-    hoy = timezone.now().date()
+    # Fechas para filtros (locales, como las de DailyStats)
+    hoy = timezone.localdate()
     hace_30_dias = hoy - timedelta(days=30)
     hace_7_dias = hoy - timedelta(days=7)
     
@@ -241,50 +223,61 @@ def dashboard(request):
     total_usuarios = User.objects.count()
     context['total_usuarios'] = total_usuarios
     
-    if usuario_tiene_permiso(request.user, 'reservas', 'ver'):
-        # Estadísticas básicas de reservas
-        context["total_reservas"] = Reserva.objects.count()
-        context["total_ingresos"] = Reserva.objects.aggregate(total=Sum("monto"))["total"] or 0
-        context["reservas"] = Reserva.objects.order_by("-fecha_reserva")[:5]
-        
+    if ('reservas', 'ver') in permisos:
+        # Totales desde el resumen diario (DailyStats), no desde las reservas
+        estadisticas = DailyStats.objects.aggregate(
+            total=Sum('creadas'),
+            total_ingresos=Sum('ingresos'),
+            total_pendientes=Sum('pendientes'),
+            total_confirmadas=Sum('confirmadas'),
+            total_activas=Sum('activas'),
+            ingresos_mes=Sum('ingresos', filter=Q(fecha__gte=hace_30_dias)),
+        )
+        context["total_reservas"] = estadisticas['total'] or 0
+        context["total_ingresos"] = estadisticas['total_ingresos'] or 0
+        context["reservas"] = list(Reserva.objects.select_related('usuario', 'tipo_habitacion').order_by("-fecha_reserva")[:5])
+
         # Reservas por estado
-        context["reservas_pendientes"] = Reserva.objects.filter(estado='pendiente').count()
-        context["reservas_confirmadas"] = Reserva.objects.filter(estado='confirmada').count()
-        context["reservas_activas"] = Reserva.objects.filter(estado='activa').count()
-        
+        context["reservas_pendientes"] = estadisticas['total_pendientes'] or 0
+        context["reservas_confirmadas"] = estadisticas['total_confirmadas'] or 0
+        context["reservas_activas"] = estadisticas['total_activas'] or 0
+
         # Ingresos del mes
-        context["ingresos_mes"] = Reserva.objects.filter(
-            fecha_reserva__gte=hace_30_dias
-        ).aggregate(total=Sum("monto"))["total"] or 0
-        
+        context["ingresos_mes"] = estadisticas['ingresos_mes'] or 0
+
         # Datos para gráficos - Reservas por día (últimos 7 días)
-        reservas_por_dia = []
-        labels_dias = []
-        for i in range(7):
-            dia = hoy - timedelta(days=i)
-            count = Reserva.objects.filter(fecha_reserva__date=dia).count()
-            reservas_por_dia.insert(0, count)
-            labels_dias.insert(0, dia.strftime('%d/%m'))
-        
-        context["chart_reservas_labels"] = labels_dias
-        context["chart_reservas_data"] = reservas_por_dia
-        
+        por_dia = dict(
+            DailyStats.objects.filter(fecha__gt=hace_7_dias, fecha__lte=hoy)
+            .values('fecha').annotate(total=Sum('creadas')).values_list('fecha', 'total')
+        )
+        dias = [hoy - timedelta(days=i) for i in range(6, -1, -1)]
+        context["chart_reservas_labels"] = [dia.strftime('%d/%m') for dia in dias]
+        context["chart_reservas_data"] = [por_dia.get(dia, 0) for dia in dias]
+
         # Reservas por tipo de habitación
-        reservas_por_tipo = Reserva.objects.values('tipo_habitacion__nombre').annotate(
-            count=Count('id')
-        ).order_by('-count')
-        
+        reservas_por_tipo = (
+            DailyStats.objects.values('tipo_habitacion__nombre')
+            .annotate(count=Sum('creadas')).filter(count__gt=0).order_by('-count')
+        )
+
         context["chart_tipos_labels"] = [item['tipo_habitacion__nombre'] for item in reservas_por_tipo]
         context["chart_tipos_data"] = [item['count'] for item in reservas_por_tipo]
+
+        # Ocupación, ADR y RevPAR de las últimas 30 noches (hoy incluido)
+        from reservas import analitica
+        noches = analitica.resumen(analitica.cargar(hace_30_dias + timedelta(days=1), hoy + timedelta(days=1)))['total']
+        context["ocupacion_30_dias"] = noches['ocupacion']
+        context["adr_30_dias"] = noches['adr']
+        context["revpar_30_dias"] = noches['revpar']
     
-    if usuario_tiene_permiso(request.user, 'huespedes', 'ver'):
+    if ('huespedes', 'ver') in permisos:
         context['total_huespedes'] = Huesped.objects.count()
         context['huespedes_activos'] = HuespedActivo.objects.filter(activo=True).count()
     
-    if usuario_tiene_permiso(request.user, 'empleados', 'ver'):
+    if ('empleados', 'ver') in permisos:
         context["total_empleados"] = Empleado.objects.count()
     
-    if usuario_tiene_permiso(request.user, 'habitaciones', 'ver'):
+    if ('habitaciones', 'ver') in permisos:
         # Estadísticas de habitaciones
         total_habitaciones = Habitacion.objects.count()
         habitaciones_disponibles = Habitacion.objects.filter(disponible=True).count()
@@ -296,32 +289,44 @@ def dashboard(request):
         context["ocupacion_porcentaje"] = round((habitaciones_ocupadas / total_habitaciones * 100) if total_habitaciones > 0 else 0, 1)
         
         # Habitaciones por tipo
-        habitaciones_por_tipo = Habitacion.objects.values('tipo_habitacion__nombre').annotate(
+        habitaciones_por_tipo = list(Habitacion.objects.values('tipo_habitacion__nombre').annotate(
             total=Count('id'),
             disponibles=Count('id', filter=Q(disponible=True))
-        )
+        ))
         context["habitaciones_por_tipo"] = habitaciones_por_tipo
+
+    return context
+
+
+def _rol_principal(user):
+    # Prioridad de roles
+    priority = ['super_admin', 'admin_general', 'recepcionista', 'marketing', 'solo_lectura']
+    # Superuser se considera super_admin
+    if user.is_superuser:
+        return 'super_admin'
+    # Obtener roles activos del usuario
+    roles = list(UsuarioRol.objects.filter(usuario=user, activo=True, rol__activo=True).values_list('rol__nombre', flat=True))
+    for r in priority:
+        if r in roles:
+            return r
+    return 'solo_lectura'
+
+
+@requiere_staff_y_permiso('dashboard', 'ver')
+def dashboard(request):
+    # Seleccionar plantilla según rol principal del usuario
+    role = _rol_principal(request.user)
+
+    # Las estadísticas son las mismas para todos con el mismo rol y permisos
+    permisos = frozenset(
+        (modulo, 'ver') for modulo in MODULOS_DASHBOARD if usuario_tiene_permiso(request.user, modulo, 'ver')
+    )
+    context = dict(tablero.obtener(role, permisos, _calcular_dashboard))
     
     # Agregar permisos del usuario al contexto
-    from .permissions import convertir_permisos_para_template
-    permisos_raw = obtener_permisos_usuario(request.user)
-    context['permisos'] = convertir_permisos_para_template(permisos_raw)
+    from .permissions import convertir_permisos_para_template, mascara_usuario
+    context['permisos'] = convertir_permisos_para_template(mascara_usuario(request.user))
     
-    # Seleccionar plantilla según rol principal del usuario
-    def get_primary_role(user):
-        # Prioridad de roles
-        priority = ['super_admin', 'admin_general', 'recepcionista', 'marketing', 'solo_lectura']
-        # Superuser se considera super_admin
-        if user.is_superuser:
-            return 'super_admin'
-        # Obtener roles activos del usuario
-        roles = list(UsuarioRol.objects.filter(usuario=user, activo=True, rol__activo=True).values_list('rol__nombre', flat=True))
-        for r in priority:
-            if r in roles:
-                return r
-        return 'solo_lectura'
-
-    role = get_primary_role(request.user)
     template_map = {
         'super_admin': 'administracion/dashboard_super_admin.html',
         'admin_general': 'administracion/dashboard_admin_general.html',
@@ -347,7 +352,7 @@ def planes_list(request):
     q = request.GET.get("q", "")
     qs = Plan.objects.all()
     if q:
-        qs = qs.filter(Q(nombre__icontains=q) | Q(descripcion__icontains=q))
+        qs = busqueda.filtrar(qs, 'planes', q, request)
     page_obj = _paginate(request, qs, 10)
     return render(request, "administracion/planes_list.html", {"page_obj": page_obj, "q": q})
 
@@ -366,55 +371,19 @@ def planes_create(request):
 @requiere_staff_y_permiso('planes', 'editar')
 @require_POST
 def planes_send_email(request, pk):
-    """Envía el plan por email a usuarios con notificaciones activadas en el admin personalizado (HTML + CTA)."""
+    """Crea una campaña con el plan para usuarios con notificaciones activadas (la envía `enviar_campanas`)."""
     plan = get_object_or_404(Plan, pk=pk)
-
-    users = User.objects.filter(is_active=True).exclude(email="").select_related('profile')
-    recipients = []
-    excluidos = 0
-    for u in users:
-        try:
-            prefs = getattr(u.profile, 'preferences', {}) or {}
-            if prefs.get('notifications_enabled', True):
-                recipients.append(u.email)
-            else:
-                excluidos += 1
-        except Exception:
-            recipients.append(u.email)
-    recipients = list(dict.fromkeys(recipients))
-
-    if not recipients:
+    asunto, html_body = campanas.contenido_plan(plan, request.build_absolute_uri)
+    campana = campanas.crear('planes', asunto, html_body, request.user)
+    if campana is None:
         messages.warning(request, 'No hay usuarios con notificaciones activadas o emails válidos.')
         return redirect('administracion:planes_list')
 
-    today = timezone.now().date()
-    plan_url = request.build_absolute_uri(reverse('detalle_plan', args=[plan.id]))
-    imagen_url = request.build_absolute_uri(plan.imagen.url) if getattr(plan, 'imagen', None) else None
-
-    subject = f"Plan: {plan.nombre}"
-
-    html_body = render_to_string('emails/plan_email.html', {
-        'plan': plan,
-        'plan_url': plan_url,
-        'imagen_url': imagen_url,
-        'year': today.year,
-    })
-    text_body = strip_tags(html_body)
-
-    try:
-        email = EmailMultiAlternatives(
-            subject=subject,
-            body=text_body,
-            from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', None),
-            bcc=recipients,
-        )
-        email.attach_alternative(html_body, "text/html")
-        email.send(fail_silently=False)
-        messages.success(request, f'Plan "{plan.nombre}" enviado por email a {len(recipients)} usuarios. Excluidos por preferencia: {excluidos}.')
-    except Exception as e:
-        messages.error(request, f'Error al enviar "{plan.nombre}": {e}')
-
-    return redirect('administracion:planes_list')
+    messages.success(
+        request,
+        f'Plan "{plan.nombre}" en cola para {campana.total} usuarios. Excluidos por preferencia: {campana.excluidos}.'
+    )
+    return redirect('administracion:campana_detalle', pk=campana.pk)
 
 @requiere_staff_y_permiso('planes', 'editar')
 def planes_edit(request, pk):
@@ -444,7 +413,7 @@ def promociones_list(request):
     q = request.GET.get("q", "")
     qs = Promocion.objects.all()
     if q:
-        qs = qs.filter(Q(nombre__icontains=q) | Q(descripcion__icontains=q))
+        qs = busqueda.filtrar(qs, 'promociones', q, request)
     page_obj = _paginate(request, qs, 10)
     return render(request, "administracion/promociones_list.html", {"page_obj": page_obj, "q": q})
 
@@ -485,70 +454,65 @@ def promociones_delete(request, pk):
 @requiere_staff_y_permiso('promociones', 'editar')
 @require_POST
 def promociones_send_email(request, pk):
-    """Envía la promoción por email a usuarios con notificaciones activadas en el admin personalizado (HTML + CTA)."""
+    """Crea una campaña con la promoción para usuarios con notificaciones activadas (la envía `enviar_campanas`)."""
     promo = get_object_or_404(Promocion, pk=pk)
-
-    users = User.objects.filter(is_active=True).exclude(email="").select_related('profile')
-    recipients = []
-    excluidos = 0
-    for u in users:
-        try:
-            prefs = getattr(u.profile, 'preferences', {}) or {}
-            if prefs.get('notifications_enabled', True):
-                recipients.append(u.email)
-            else:
-                excluidos += 1
-        except Exception:
-            recipients.append(u.email)
-    recipients = list(dict.fromkeys(recipients))
-
-    if not recipients:
+    asunto, html_body = campanas.contenido_promocion(promo, request.build_absolute_uri)
+    campana = campanas.crear('promociones', asunto, html_body, request.user)
+    if campana is None:
         messages.warning(request, 'No hay usuarios con notificaciones activadas o emails válidos.')
         return redirect('administracion:promociones_list')
 
-    today = timezone.now().date()
-    is_active = promo.fecha_inicio <= today <= promo.fecha_fin
-    estado = 'activa' if is_active else ('proxima' if today < promo.fecha_inicio else 'finalizada')
-    dias_restantes = (promo.fecha_fin - today).days if is_active else 0
-    dias_para_inicio = (promo.fecha_inicio - today).days if today < promo.fecha_inicio else 0
-
-    promo_url = request.build_absolute_uri(reverse('promocion_detalle', args=[promo.id]))
-    imagen_url = request.build_absolute_uri(promo.imagen.url) if getattr(promo, 'imagen', None) else None
-
-    subject = f"Promoción: {promo.nombre} ({promo.descuento}%)"
-
-    html_body = render_to_string('emails/promocion_email.html', {
-        'promocion': promo,
-        'estado': estado,
-        'dias_restantes': dias_restantes,
-        'dias_para_inicio': dias_para_inicio,
-        'promo_url': promo_url,
-        'imagen_url': imagen_url,
-        'year': today.year,
+    messages.success(
+        request,
+        f'Promoción "{promo.nombre}" en cola para {campana.total} usuarios. Excluidos por preferencia: {campana.excluidos}.'
+    )
+    return redirect('administracion:campana_detalle', pk=campana.pk)
+
+
+def _campana_visible(request, pk):
+    """Campana `pk` si el usuario puede ver su módulo (planes o promociones); si no, PermissionDenied."""
+    from django.core.exceptions import PermissionDenied
+
+    campana = get_object_or_404(Campana.objects.select_related('creada_por'), pk=pk)
+    if not usuario_tiene_permiso(request.user, campana.tipo, 'ver'):
+        raise PermissionDenied
+    return campana
+
+
+@requiere_staff_y_permiso('dashboard', 'ver')
+def campana_detalle(request, pk):
+    """Avance de una campaña; la página consulta campana_progreso mientras se envía."""
+    campana = _campana_visible(request, pk)
+    return render(request, 'administracion/campana_detalle.html', {
+        'campana': campana,
+        'progreso': campanas.progreso(campana),
     })
-    text_body = strip_tags(html_body)
 
-    try:
-        email = EmailMultiAlternatives(
-            subject=subject,
-            body=text_body,
-            from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', None),
-            bcc=recipients,
-        )
-        email.attach_alternative(html_body, "text/html")
-        email.send(fail_silently=False)
-        messages.success(request, f'Promoción "{promo.nombre}" enviada por email a {len(recipients)} usuarios. Excluidos por preferencia: {excluidos}.')
-    except Exception as e:
-        messages.error(request, f'Error al enviar "{promo.nombre}": {e}')
 
-    return redirect('administracion:promociones_list')
+@requiere_staff_y_permiso('dashboard', 'ver')
+def campana_progreso(request, pk):
+    return JsonResponse(campanas.progreso(_campana_visible(request, pk)))
+
+
+@requiere_staff_y_permiso('dashboard', 'ver')
+@require_POST
+def campana_reanudar(request, pk):
+    """Vuelve a poner en cola una campaña que quedó en error (sigue con los pendientes)."""
+    campana = _campana_visible(request, pk)
+    if not usuario_tiene_permiso(request.user, campana.tipo, 'editar'):
+        messages.error(request, f'No tienes permisos para editar en el módulo {campana.tipo}.')
+    elif campanas.reanudar(campana):
+        messages.success(request, 'Campaña nuevamente en cola.')
+    else:
+        messages.info(request, 'La campaña no estaba en error.')
+    return redirect('administracion:campana_detalle', pk=campana.pk)
 
 @requiere_staff_y_permiso('servicios', 'ver')
 def servicios_list(request):
     q = request.GET.get("q", "")
     qs = Servicio.objects.all()
     if q:
-        qs = qs.filter(Q(nombre__icontains=q) | Q(descripcion__icontains=q))
+        qs = busqueda.filtrar(qs, 'servicios', q, request)
     page_obj = _paginate(request, qs, 10)
     return render(request, "administracion/servicios_list.html", {"page_obj": page_obj, "q": q})
 
@@ -591,20 +555,17 @@ def huespedes_list(request):
     q = request.GET.get("q", "")
     qs = Huesped.objects.all()
     if q:
-        qs = qs.filter(
-            Q(nombre__icontains=q) | Q(apellido__icontains=q) | Q(dni__icontains=q) |
-            Q(email__icontains=q) | Q(telefono__icontains=q)
-        )
+        qs = busqueda.filtrar(qs, 'huespedes', q, request)
     page_obj = _paginate(request, qs, 10)
     return render(request, "administracion/huespedes_list.html", {"page_obj": page_obj, "q": q})
 
 @requiere_staff_y_permiso('huespedes', 'ver')
 def huesped_detail(request, pk):
-    """Detalle de huésped del módulo administración, con reservas asociadas por DNI."""
+    """Detalle de huésped del módulo administración, con sus estadías vinculadas por DNI."""
     obj = get_object_or_404(Huesped, pk=pk)
     reservas_del_huesped = []
     if obj.dni:
-        reservas_del_huesped = ReservaHuesped.objects.filter(dni=obj.dni).select_related('reserva')
+        reservas_del_huesped = obj.estadias.select_related('reserva', 'reserva__tipo_habitacion')
     # también buscar por nombre+apellido si no hay DNI
     elif obj.nombre and obj.apellido:
         reservas_del_huesped = ReservaHuesped.objects.filter(nombre=obj.nombre, apellido=obj.apellido).select_related('reserva')
@@ -647,29 +608,327 @@ def huespedes_delete(request, pk):
         return redirect("huespedes_list")
     return render(request, "administracion/huespedes_confirm_delete.html", {"huesped": obj})
 
-@requiere_staff_y_permiso('reservas', 'ver')
-def ver_reservas(request):
-    reservas_qs = Reserva.objects.select_related('usuario', 'tipo_habitacion', 'habitacion_asignada', 'plan', 'promocion') \
-                                 .prefetch_related('servicios') \
-                                 .order_by('-fecha_reserva')
+# Reservas por página de ver_reservas (máximo con `por_pagina`)
+RESERVAS_POR_PAGINA = 25
+MAX_RESERVAS_POR_PAGINA = 100
+
+
+def _codificar_cursor(reserva):
+    valor = f"{reserva.fecha_reserva.isoformat()}|{reserva.pk}"
+    return base64.urlsafe_b64encode(valor.encode()).decode()
+
+
+def _decodificar_cursor(cursor):
+    """(fecha_reserva, id) de un cursor de ver_reservas, o None si no es válido."""
+    from datetime import datetime
+
+    try:
+        fecha, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(fecha), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
 
-    # Buscar por ID de reserva (GET param 'id' o 'q')
+
+def _filtrar_reservas(request, reservas_qs):
+    """
+    Aplica a `reservas_qs` los filtros de ver_reservas (id/q, estado, desde y
+    hasta sobre el check-in, tipo y huesped). Devuelve (queryset, errores).
+    """
+    from datetime import datetime
+
+    errores = []
     query_id = (request.GET.get('id') or request.GET.get('q') or '').strip()
     if query_id:
-        try:
-            id_num = int(query_id)
-            reservas_qs = reservas_qs.filter(id=id_num)
-        except ValueError:
-            messages.error(request, 'El ID debe ser un número entero.')
+        if query_id.isdigit():
+            reservas_qs = reservas_qs.filter(id=int(query_id))
+        else:
+            errores.append('El ID debe ser un número entero.')
+
+    estado = request.GET.get('estado')
+    if estado:
+        reservas_qs = reservas_qs.filter(estado=estado)
+
+    for parametro, lookup in (('desde', 'check_in__gte'), ('hasta', 'check_in__lte')):
+        valor = request.GET.get(parametro)
+        if valor:
+            try:
+                reservas_qs = reservas_qs.filter(**{lookup: datetime.strptime(valor, '%Y-%m-%d').date()})
+            except ValueError:
+                errores.append(f'Fecha "{parametro}" inválida (YYYY-MM-DD).')
+
+    tipo = request.GET.get('tipo')
+    if tipo:
+        if tipo.isdigit():
+            reservas_qs = reservas_qs.filter(tipo_habitacion_id=int(tipo))
+        else:
+            errores.append('Tipo de habitación inválido.')
+
+    # Huésped: titular (índice de búsqueda de usuarios) o huésped registrado con ese DNI
+    huesped = (request.GET.get('huesped') or '').strip()
+    if huesped:
+        condicion = Q(usuario_id__in=busqueda.coincidencias('usuarios', huesped))
+        dni = normalizar_dni(huesped)
+        if dni:
+            condicion |= Q(pk__in=ReservaHuesped.objects.filter(dni_normalizado=dni).values('reserva_id'))
+        reservas_qs = reservas_qs.filter(condicion)
+
+    return reservas_qs, errores
+
+
+def _paginar_por_cursor(reservas_qs, despues=None, antes=None, por_pagina=RESERVAS_POR_PAGINA):
+    """
+    Página de reservas de la más nueva a la más vieja por (fecha_reserva, id),
+    a partir de un cursor: `despues` avanza y `antes` retrocede. Lee sólo
+    por_pagina + 1 filas, sin COUNT ni OFFSET, así que cuesta lo mismo en
+    cualquier página. Devuelve (reservas, cursor_siguiente, cursor_anterior).
+    """
+    retrocede = antes is not None
+    cursor = antes if retrocede else despues
+    if cursor:
+        fecha, pk = cursor
+        if retrocede:
+            reservas_qs = reservas_qs.filter(Q(fecha_reserva__gt=fecha) | Q(fecha_reserva=fecha, id__gt=pk))
+        else:
+            reservas_qs = reservas_qs.filter(Q(fecha_reserva__lt=fecha) | Q(fecha_reserva=fecha, id__lt=pk))
+    orden = ('fecha_reserva', 'id') if retrocede else ('-fecha_reserva', '-id')
+    reservas = list(reservas_qs.order_by(*orden)[:por_pagina + 1])
+
+    hay_mas = len(reservas) > por_pagina
+    reservas = reservas[:por_pagina]
+    if retrocede:
+        reservas.reverse()
+    if not reservas:
+        return reservas, None, None
+
+    # Hacia el lado por el que se vino siempre hay una página (si había cursor)
+    hay_siguiente = hay_mas if not retrocede else True
+    hay_anterior = hay_mas if retrocede else bool(cursor)
+    return (
+        reservas,
+        _codificar_cursor(reservas[-1]) if hay_siguiente else None,
+        _codificar_cursor(reservas[0]) if hay_anterior else None,
+    )
+
+
+@requiere_staff_y_permiso('reservas', 'ver')
+def ver_reservas(request):
+    """
+    Listado de reservas con filtros y paginación por cursor. Con `formato=json`
+    devuelve la misma página en JSON (para la carga incremental de recepción).
+    """
+    from habitaciones.models import TipoHabitacion
+
+    reservas_qs = Reserva.objects.select_related('usuario', 'tipo_habitacion')
+    reservas_qs, errores = _filtrar_reservas(request, reservas_qs)
+
+    cursores = {}
+    for parametro in ('despues', 'antes'):
+        if request.GET.get(parametro):
+            cursores[parametro] = _decodificar_cursor(request.GET[parametro])
+            if cursores[parametro] is None:
+                errores.append('Cursor de paginación inválido.')
+    try:
+        por_pagina = min(max(int(request.GET.get('por_pagina', RESERVAS_POR_PAGINA)), 1), MAX_RESERVAS_POR_PAGINA)
+    except ValueError:
+        por_pagina = RESERVAS_POR_PAGINA
+
+    reservas, siguiente, anterior = _paginar_por_cursor(
+        reservas_qs, cursores.get('despues'), cursores.get('antes'), por_pagina
+    )
+
+    if request.GET.get('formato') == 'json':
+        if errores:
+            return JsonResponse({'errores': errores}, status=400)
+        return JsonResponse({
+            'reservas': [
+                {
+                    'id': r.id,
+                    'cliente': r.usuario.get_full_name() or r.usuario.username,
+                    'tipo_habitacion': r.tipo_habitacion.nombre,
+                    'cantidad_habitaciones': r.cantidad_habitaciones,
+                    'check_in': r.check_in.isoformat() if r.check_in else None,
+                    'check_out': r.check_out.isoformat() if r.check_out else None,
+                    'estado': r.estado,
+                    'fecha_reserva': r.fecha_reserva.isoformat(),
+                }
+                for r in reservas
+            ],
+            'siguiente': siguiente,
+            'anterior': anterior,
+        })
+
+    for error in errores:
+        messages.error(request, error)
+    filtros = request.GET.copy()
+    for parametro in ('despues', 'antes', 'formato'):
+        filtros.pop(parametro, None)
 
     hoy = timezone.now().date()
     return render(request, 'administracion/ver_reservas.html', {
-        'reservas': reservas_qs,
+        'reservas': reservas,
         'hoy': hoy,
-        'query_id': query_id,
+        'query_id': (request.GET.get('id') or request.GET.get('q') or '').strip(),
+        'filtros': filtros,
+        'filtros_url': filtros.urlencode(),
+        'estados': Reserva.ESTADOS_RESERVA,
+        'tipos': TipoHabitacion.objects.order_by('nombre').values_list('id', 'nombre'),
+        'siguiente': siguiente,
+        'anterior': anterior,
     })
 
 
+# Filas que lee cada consulta de las exportaciones
+EXPORTACION_CHUNK = 2000
+
+
+@requiere_staff_y_permiso('reservas', 'exportar')
+def exportar_reservas(request):
+    """Exporta a CSV o XLSX (`formato`) las reservas con los mismos filtros que ver_reservas."""
+    reservas_qs, errores = _filtrar_reservas(request, Reserva.objects.all())
+    if errores:
+        for error in errores:
+            messages.error(request, error)
+        return redirect('administracion:ver_reservas')
+
+    columnas = [
+        ('ID', 'id'),
+        ('Fecha de reserva', 'fecha_reserva'),
+        ('Usuario', 'usuario__username'),
+        ('Email', 'usuario__email'),
+        ('Tipo de habitación', 'tipo_habitacion__nombre'),
+        ('Habitaciones', 'cantidad_habitaciones'),
+        ('Huéspedes', 'cantidad_huespedes'),
+        ('Check-in', 'check_in'),
+        ('Check-out', 'check_out'),
+        ('Estado', 'estado'),
+        ('Método de pago', 'metodo_pago'),
+        ('Monto', 'monto'),
+    ]
+    filas = reservas_qs.order_by('-fecha_reserva', '-id').values_list(*[campo for _, campo in columnas])
+    return exportar.respuesta_exportacion(
+        'reservas',
+        [titulo for titulo, _ in columnas],
+        filas.iterator(chunk_size=EXPORTACION_CHUNK),
+        request.GET.get('formato', 'csv'),
+    )
+
+
+@requiere_staff_y_permiso('huespedes', 'exportar')
+def exportar_huespedes(request):
+    """Exporta el padrón de huéspedes (filtrado por `q`, como el listado) a CSV o XLSX."""
+    qs = Huesped.objects.order_by('apellido', 'nombre', 'id')
+    q = request.GET.get('q', '')
+    if q:
+        qs = busqueda.filtrar(qs, 'huespedes', q, limite=None)
+    filas = qs.values_list('id', 'apellido', 'nombre', 'dni', 'telefono', 'email')
+    return exportar.respuesta_exportacion(
+        'huespedes',
+        ['ID', 'Apellido', 'Nombre', 'DNI', 'Teléfono', 'Email'],
+        filas.iterator(chunk_size=EXPORTACION_CHUNK),
+        request.GET.get('formato', 'csv'),
+    )
+
+
+@requiere_staff_y_permiso('usuarios', 'exportar')
+def exportar_usuarios(request):
+    """Exporta los usuarios registrados (filtrados por `q`, como el listado) a CSV o XLSX."""
+    qs = User.objects.order_by('-date_joined', '-id')
+    q = request.GET.get('q', '')
+    if q:
+        qs = busqueda.filtrar(qs, 'usuarios', q, limite=None)
+    filas = qs.values_list(
+        'id', 'username', 'first_name', 'last_name', 'email',
+        'is_active', 'is_staff', 'profile__is_blocked', 'date_joined', 'last_login',
+    )
+    return exportar.respuesta_exportacion(
+        'usuarios',
+        ['ID', 'Usuario', 'Nombre', 'Apellido', 'Email', 'Activo', 'Staff', 'Bloqueado', 'Alta', 'Último acceso'],
+        filas.iterator(chunk_size=EXPORTACION_CHUNK),
+        request.GET.get('formato', 'csv'),
+    )
+
+
+# ===================== REPORTES =====================
+@requiere_staff_y_permiso('reportes', 'ver')
+def reportes_list(request):
+    """Reportes DOCX pedidos recientemente y formulario para pedir uno nuevo."""
+    trabajos = TrabajoReporte.objects.select_related('solicitado_por')[:50]
+    return render(request, 'administracion/reportes_list.html', {
+        'trabajos': trabajos,
+        'tipos': TrabajoReporte.TIPOS,
+        'mes_actual': timezone.localdate().strftime('%Y-%m'),
+        'en_proceso': any(t.estado in ('pendiente', 'procesando') for t in trabajos),
+    })
+
+
+@requiere_staff_y_permiso('reportes', 'generar')
+@require_POST
+def reportes_solicitar(request):
+    """Encola un reporte para (tipo, mes), o reutiliza el vigente si las reservas de ese mes no cambiaron."""
+    from datetime import datetime
+
+    tipo = request.POST.get('tipo')
+    if tipo not in dict(TrabajoReporte.TIPOS):
+        messages.error(request, 'Tipo de reporte no válido.')
+        return redirect('administracion:reportes_list')
+    try:
+        periodo = datetime.strptime(request.POST.get('periodo', ''), '%Y-%m').date()
+    except ValueError:
+        messages.error(request, 'Período inválido (AAAA-MM).')
+        return redirect('administracion:reportes_list')
+
+    trabajo, creado = reportes.solicitar(tipo, periodo, request.user)
+    if creado:
+        messages.success(request, f'Reporte en cola: {trabajo}. Se generará en segundo plano.')
+    elif trabajo.estado == 'listo':
+        messages.info(request, f'El reporte ya estaba generado y sigue vigente: {trabajo}.')
+    else:
+        messages.info(request, f'El reporte ya está en cola: {trabajo}.')
+    return redirect('administracion:reportes_list')
+
+
+@requiere_staff_y_permiso('reportes', 'ver')
+def reporte_descargar(request, pk):
+    trabajo = get_object_or_404(TrabajoReporte, pk=pk, estado='listo')
+    if not trabajo.archivo:
+        raise Http404('El reporte no tiene archivo')
+    return FileResponse(trabajo.archivo.open('rb'), as_attachment=True, filename=trabajo.archivo.name.rsplit('/', 1)[-1])
+
+
+@requiere_staff_y_permiso('reportes', 'ver')
+def ocupacion_json(request):
+    """
+    Ocupación, ADR y RevPAR por noche y por tipo de habitación (reservas/analitica.py).
+    Noches [desde, hasta) en YYYY-MM-DD; sin fechas, las últimas `dias` (30) hasta hoy incluido.
+    """
+    from datetime import datetime, timedelta
+    from habitaciones.models import TipoHabitacion
+    from reservas import analitica
+
+    try:
+        dias = int(request.GET.get('dias') or 30)
+        hasta = request.GET.get('hasta')
+        hasta = datetime.strptime(hasta, '%Y-%m-%d').date() if hasta else timezone.localdate() + timedelta(days=1)
+        desde = request.GET.get('desde')
+        desde = datetime.strptime(desde, '%Y-%m-%d').date() if desde else hasta - timedelta(days=dias)
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros inválidos: fechas YYYY-MM-DD y días entero.'}, status=400)
+    if not desde < hasta:
+        return JsonResponse({'error': '"hasta" debe ser posterior a "desde".'}, status=400)
+    if (hasta - desde).days > analitica.MAX_NOCHES:
+        return JsonResponse({'error': f'El período no puede superar {analitica.MAX_NOCHES} noches.'}, status=400)
+
+    tipos = TipoHabitacion.objects.order_by('nombre')
+    tipo = request.GET.get('tipo')
+    if tipo:
+        if not tipo.isdigit():
+            return JsonResponse({'error': 'El tipo debe ser un número entero.'}, status=400)
+        tipos = tipos.filter(pk=int(tipo))
+    tipos = list(tipos)
+    ocupacion = analitica.cargar(desde, hasta, tipos)
+    return JsonResponse(analitica.resumen(ocupacion, {t.pk: t.nombre for t in tipos}))
+
+
 @requiere_staff_y_permiso('reservas', 'crear')
 def reserva_rapida_create(request):
     """Crear una reserva rápida (walk-in) desde administración para recepcionistas."""
@@ -685,30 +944,22 @@ def reserva_rapida_create(request):
             reserva.usuario = request.user  # la reserva la registra el recepcionista
             reserva.estado = 'pendiente'
             reserva.codigo_checkin = uuid.uuid4().hex[:6].upper()
-            reserva.save()
-
-            # Crear huésped principal asociado a la reserva
-            huesped = ReservaHuesped(
-                nombre=huesped_form.cleaned_data['nombre'],
-                apellido=huesped_form.cleaned_data['apellido'],
-                edad=huesped_form.cleaned_data['edad'],
-                genero=huesped_form.cleaned_data['genero'],
-                dni=huesped_form.cleaned_data['dni'],
-                reserva=reserva,
-            )
-            huesped.save()
+            try:
+                reserva.save()
+            except ValidationError:
+                # Las noches ya no tienen lugar en el inventario: no se creó nada
+                messages.error(request, "No hay stock disponible para el tipo de habitación seleccionado.")
+                return redirect('administracion:ver_reservas')
 
-            # Crear huéspedes adicionales si se especificó cantidad > 1
+            # Huésped principal (también en el padrón por DNI) y, si la
+            # cantidad es mayor a 1, invitados con el mismo apellido
+            principal = dict(huesped_form.cleaned_data)
+            registrar_huespedes(reserva, [principal])
             total_huespedes = reserva.cantidad_huespedes or 1
-            for i in range(1, total_huespedes):
-                ReservaHuesped.objects.create(
-                    nombre=f"Invitado {i}",
-                    apellido=huesped.apellido,
-                    edad=huesped.edad,
-                    genero=huesped.genero,
-                    dni=f"{huesped.dni}-{i}",
-                    reserva=reserva,
-                )
+            registrar_huespedes(reserva, [
+                dict(principal, nombre=f"Invitado {i}", dni=f"{principal['dni']}-{i}")
+                for i in range(1, total_huespedes)
+            ], registrar_en_padron=False)
 
             # Confirmar la reserva (reserva stock)
             if reserva.confirmar():
@@ -742,12 +993,14 @@ def confirmar_reserva_admin(request, reserva_id):
         messages.info(request, "La reserva ya está confirmada.")
         return redirect('administracion:ver_reservas')
 
-    reserva.estado = 'confirmada'
-    reserva.save()
+    if reserva.estado != 'pendiente':
+        messages.error(request, "Sólo se puede confirmar una reserva pendiente.")
+        return redirect('administracion:ver_reservas')
 
-    # Reservar las habitaciones del tipo solicitado
-    tipo_habitacion = reserva.tipo_habitacion
-    tipo_habitacion.reservar_stock(reserva.cantidad_habitaciones)
+    # Confirmar reserva el stock y pasa las noches de retenidas a vendidas
+    if not reserva.confirmar():
+        messages.error(request, "No hay stock disponible para confirmar la reserva.")
+        return redirect('administracion:ver_reservas')
 
     messages.success(request, f"Reserva confirmada.")
     return redirect('administracion:ver_reservas')
@@ -862,6 +1115,91 @@ def rechazar_reserva_admin(request, reserva_id):
     return redirect('administracion:ver_reservas')
 
 
+ACCIONES_MASIVAS = {
+    'confirmar': 'confirmadas',
+    'cancelar': 'canceladas',
+    'completar': 'completadas',
+}
+
+
+@requiere_staff_y_permiso('reservas', 'confirmar')
+@require_POST
+def reservas_accion_masiva(request):
+    """
+    Confirma, cancela o completa varias reservas a la vez (grupos, lotes de OTAs).
+    Recibe `accion` y una lista de `ids` (repetidos o separados por comas) o,
+    si no hay IDs, un filtro por `estado`, `tipo` y/o `check_in` (YYYY-MM-DD).
+    Responde con el resultado por ID (JSON si se pide `formato=json`).
+    """
+    from datetime import datetime
+
+    accion = request.POST.get('accion', '')
+    responder_json = request.POST.get('formato') == 'json'
+
+    def error(mensaje):
+        if responder_json:
+            return JsonResponse({'error': mensaje}, status=400)
+        messages.error(request, mensaje)
+        return redirect('administracion:ver_reservas')
+
+    if accion not in ACCIONES_MASIVAS:
+        return error('Acción no válida.')
+    if accion == 'cancelar' and not usuario_tiene_permiso(request.user, 'reservas', 'cancelar'):
+        return error('No tenés permiso para cancelar reservas.')
+
+    ids = []
+    for valor in request.POST.getlist('ids'):
+        for parte in valor.split(','):
+            parte = parte.strip()
+            if not parte:
+                continue
+            if not parte.isdigit():
+                return error(f'ID de reserva inválido: {parte}')
+            ids.append(int(parte))
+
+    if ids:
+        seleccion = ids
+    else:
+        seleccion = Reserva.objects.all()
+        estado = request.POST.get('estado')
+        tipo = request.POST.get('tipo')
+        check_in = request.POST.get('check_in')
+        if not (estado or tipo or check_in):
+            return error('Seleccioná al menos una reserva o un filtro.')
+        if estado:
+            seleccion = seleccion.filter(estado=estado)
+        if tipo:
+            seleccion = seleccion.filter(tipo_habitacion_id=tipo) if tipo.isdigit() else seleccion.filter(tipo_habitacion__nombre__iexact=tipo)
+        if check_in:
+            try:
+                seleccion = seleccion.filter(check_in=datetime.strptime(check_in, '%Y-%m-%d').date())
+            except ValueError:
+                return error('Fecha de check-in inválida (YYYY-MM-DD).')
+
+    resultado = transiciones.transicionar_lote(seleccion, accion)
+    exitosas = [reserva_id for reserva_id, r in resultado.items() if r == transiciones.OK]
+    fallidas = {reserva_id: r for reserva_id, r in resultado.items() if r != transiciones.OK}
+
+    if responder_json:
+        return JsonResponse({
+            'accion': accion,
+            'total': len(resultado),
+            'exitosas': len(exitosas),
+            'resultados': {str(reserva_id): r for reserva_id, r in resultado.items()},
+        })
+
+    if exitosas:
+        messages.success(request, f'{len(exitosas)} reservas {ACCIONES_MASIVAS[accion]}.')
+    if fallidas:
+        detalle = ', '.join(f'#{reserva_id}: {r}' for reserva_id, r in list(fallidas.items())[:20])
+        if len(fallidas) > 20:
+            detalle += f' y {len(fallidas) - 20} más'
+        messages.warning(request, f'{len(fallidas)} reservas sin cambios ({detalle}).')
+    if not resultado:
+        messages.info(request, 'No se encontraron reservas para procesar.')
+    return redirect('administracion:ver_reservas')
+
+
 @requiere_staff_y_permiso('huespedes', 'ver')
 def huespedes_activos(request):
     from reservas.models import HuespedActivo
@@ -921,34 +1259,16 @@ def roles_list(request):
     
     asignaciones = UsuarioRol.objects.select_related('usuario', 'rol').order_by('usuario__username')
     
-    # Crear matriz de permisos
-    permisos_matriz = {}
+    # Matriz de permisos: todos los pares rol x permiso en una consulta
     permisos_todos = Permiso.objects.all().order_by('modulo', 'accion')
-    
-    for permiso in permisos_todos:
-        if permiso.modulo not in permisos_matriz:
-            permisos_matriz[permiso.modulo] = []
-        if permiso.accion not in permisos_matriz[permiso.modulo]:
-            permisos_matriz[permiso.modulo].append(permiso.accion)
-    
-    # Obtener permisos por rol
-    permisos_por_rol = {}
-    for rol in roles:
-        permisos_por_rol[rol.id] = {}
-        rol_permisos = RolPermiso.objects.filter(rol=rol).select_related('permiso')
-        for rp in rol_permisos:
-            modulo = rp.permiso.modulo
-            accion = rp.permiso.accion
-            if modulo not in permisos_por_rol[rol.id]:
-                permisos_por_rol[rol.id][modulo] = []
-            permisos_por_rol[rol.id][modulo].append(accion)
+    roles_matriz = [rol for rol in roles if rol.activo]
     
     context = {
         'roles': roles,
         'usuarios': usuarios,
         'asignaciones': asignaciones,
-        'permisos_matriz': permisos_matriz,
-        'permisos_por_rol': permisos_por_rol,
+        'roles_matriz': roles_matriz,
+        'filas_matriz': matriz_roles.filas(roles_matriz, permisos_todos, matriz_roles.leer(roles_matriz)),
     }
     
     return render(request, 'administracion/roles_list.html', context)
@@ -1020,6 +1340,7 @@ def cambiar_rol(request):
         
         # Desactivar roles anteriores del usuario
         UsuarioRol.objects.filter(usuario=usuario).update(activo=False)
+        invalidar_permisos()
         
         # Activar o crear la asignación del rol seleccionado
         asignacion, created = UsuarioRol.objects.get_or_create(
@@ -1042,6 +1363,27 @@ def cambiar_rol(request):
     return redirect('administracion:roles_list')
 
 
+@requiere_staff_y_permiso('roles', 'editar')
+@require_POST
+def roles_matriz(request):
+    """Guarda la matriz de permisos de varios roles en un solo envío"""
+    roles_ids = request.POST.getlist('roles')
+    matriz = matriz_roles.leer_formulario(request.POST.getlist('matriz'))
+    
+    # Sólo roles activos (igual que en roles_edit); los que no se envían no cambian
+    roles = Rol.objects.filter(pk__in=[r for r in roles_ids if r.isdigit()], activo=True)
+    cambios = matriz_roles.guardar({rol.pk: matriz.get(rol.pk, set()) for rol in roles})
+    
+    if cambios.agregados or cambios.quitados:
+        messages.success(
+            request,
+            f"Matriz de permisos actualizada: {cambios.agregados} permiso(s) asignado(s), {cambios.quitados} quitado(s)."
+        )
+    else:
+        messages.info(request, "No hubo cambios en la matriz de permisos.")
+    return redirect('administracion:roles_list')
+
+
 @requiere_staff_y_permiso('roles', 'crear')
 def roles_create(request):
     """Crear un nuevo rol"""
@@ -1067,12 +1409,7 @@ def roles_create(request):
             )
             
             # Asignar permisos
-            for permiso_id in permisos_ids:
-                try:
-                    permiso = Permiso.objects.get(id=permiso_id)
-                    RolPermiso.objects.create(rol=rol, permiso=permiso)
-                except Permiso.DoesNotExist:
-                    continue
+            matriz_roles.guardar({rol.pk: permisos_ids})
             
             messages.success(request, f"Rol '{nombre}' creado exitosamente.")
             return redirect('administracion:roles_list')
@@ -1130,14 +1467,8 @@ def roles_edit(request, pk):
             rol.descripcion = descripcion
             rol.save()
             
-            # Eliminar permisos actuales y asignar los nuevos
-            RolPermiso.objects.filter(rol=rol).delete()
-            for permiso_id in permisos_ids:
-                try:
-                    permiso = Permiso.objects.get(id=permiso_id)
-                    RolPermiso.objects.create(rol=rol, permiso=permiso)
-                except Permiso.DoesNotExist:
-                    continue
+            # Aplicar sólo los permisos que cambiaron
+            matriz_roles.guardar({rol.pk: permisos_ids})
             
             messages.success(request, f"Rol '{nombre}' actualizado exitosamente.")
             return redirect('administracion:roles_list')
@@ -1148,7 +1479,7 @@ def roles_edit(request, pk):
     # GET request - mostrar formulario con datos actuales
     permisos = Permiso.objects.all().order_by('modulo', 'accion')
     permisos_por_modulo = {}
-    permisos_asignados = set(rol.permisos.values_list('id', flat=True))
+    permisos_asignados = matriz_roles.leer([rol])[rol.pk]
     
     for permiso in permisos:
         if permiso.modulo not in permisos_por_modulo:
@@ -1319,41 +1650,14 @@ def unblock_user(request, user_id):
 def promociones_preview_email(request, pk):
     """Previsualiza el email HTML de una promoción en el navegador."""
     promo = get_object_or_404(Promocion, pk=pk)
-    today = timezone.now().date()
-    is_active = promo.fecha_inicio <= today <= promo.fecha_fin
-    estado = 'activa' if is_active else ('proxima' if today < promo.fecha_inicio else 'finalizada')
-    dias_restantes = (promo.fecha_fin - today).days if is_active else 0
-    dias_para_inicio = (promo.fecha_inicio - today).days if today < promo.fecha_inicio else 0
-
-    promo_url = request.build_absolute_uri(reverse('promocion_detalle', args=[promo.id]))
-    imagen_url = request.build_absolute_uri(promo.imagen.url) if getattr(promo, 'imagen', None) else None
-
-    html = render_to_string('emails/promocion_email.html', {
-        'promocion': promo,
-        'estado': estado,
-        'dias_restantes': dias_restantes,
-        'dias_para_inicio': dias_para_inicio,
-        'promo_url': promo_url,
-        'imagen_url': imagen_url,
-        'year': today.year,
-    })
+    _, html = campanas.contenido_promocion(promo, request.build_absolute_uri)
     return HttpResponse(html)
 
 @requiere_staff_y_permiso('planes', 'ver')
 def planes_preview_email(request, pk):
     """Previsualiza el email HTML de un plan en el navegador."""
     plan = get_object_or_404(Plan, pk=pk)
-    today = timezone.now().date()
-
-    plan_url = request.build_absolute_uri(reverse('detalle_plan', args=[plan.id]))
-    imagen_url = request.build_absolute_uri(plan.imagen.url) if getattr(plan, 'imagen', None) else None
-
-    html = render_to_string('emails/plan_email.html', {
-        'plan': plan,
-        'plan_url': plan_url,
-        'imagen_url': imagen_url,
-        'year': today.year,
-    })
+    _, html = campanas.contenido_plan(plan, request.build_absolute_uri)
     return HttpResponse(html)
 
 
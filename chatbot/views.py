@@ -5,10 +5,12 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.utils.dateparse import parse_date
 from django.db.models import Q
 from habitaciones.models import Habitacion, TipoHabitacion
 from reservas.models import Reserva
+from reservas import availability
 from administracion.models import Servicio, Plan, Promocion
 
 # OpenAI SDK v1.x (import seguro)
@@ -213,6 +215,12 @@ Responde SOLO el JSON sin texto extra.
 # Acepta múltiples tipos
 
 def find_available_rooms_by_dates(tipos=None, capacidad_min=1, check_in=None, check_out=None, limit=3):
+    if check_in and check_out:
+        # Motor compartido: sólo habitaciones libres de tipos con unidades en todas las noches
+        return availability.consultar(
+            check_in, check_out, capacidad_min=capacidad_min, tipos=tipos, limite=limit
+        ).habitaciones
+
     qs = Habitacion.objects.filter(
         disponible=True,
         en_mantenimiento=False,
@@ -231,17 +239,6 @@ def find_available_rooms_by_dates(tipos=None, capacidad_min=1, check_in=None, ch
                 normalized.append(t)
         qs = qs.filter(tipo_habitacion__nombre__in=normalized)
 
-    if check_in and check_out:
-        overlapping_ids = list(
-            Reserva.objects.filter(
-                habitacion_asignada__in=qs.values_list('id', flat=True),
-                check_in__lt=check_out,
-                check_out__gt=check_in,
-                estado__in=['confirmada', 'activa']
-            ).values_list('habitacion_asignada_id', flat=True)
-        )
-        qs = qs.exclude(id__in=overlapping_ids)
-
     rooms = qs.order_by('tipo_habitacion__precio', 'numero')[:limit]
     return list(rooms)
 
@@ -566,15 +563,28 @@ def chat(request):
                         "message": "Esa opción ya no está disponible. Volvamos a intentar con otros criterios.",
                     })
 
-                reserva = Reserva.objects.create(
-                    usuario=user,
-                    tipo_habitacion=room.tipo_habitacion,
-                    habitacion_asignada=room,
-                    check_in=check_in,
-                    check_out=check_out,
-                    cantidad_huespedes=int(data['cantidad_huespedes']),
-                    estado='confirmada',
-                )
+                try:
+                    reserva = Reserva.objects.create(
+                        usuario=user,
+                        tipo_habitacion=room.tipo_habitacion,
+                        habitacion_asignada=room,
+                        check_in=check_in,
+                        check_out=check_out,
+                        cantidad_huespedes=int(data['cantidad_huespedes']),
+                        estado='confirmada',
+                    )
+                except ValidationError:
+                    # Otra reserva ocupó esas noches mientras se elegía
+                    state['stage'] = 'collecting'
+                    data['opciones'] = []
+                    data['eleccion'] = None
+                    save_state(request, state)
+                    return JsonResponse({
+                        "success": True,
+                        "stage": "collecting",
+                        "message": "No hay disponibilidad con esos criterios. Puedes ampliar los tipos (simple, doble, suite, presidencial) o cambiar fechas/huéspedes. ¿Qué deseas ajustar?",
+                        "data": data,
+                    })
 
                 # Resetear estado tras crear
                 reset_state(request)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import TipoHabitacion, Habitacion
+from .models import TipoHabitacion, Habitacion, InventarioNoche, ReglaTarifa, TarifaNoche
 
 @admin.register(TipoHabitacion)
 class TipoHabitacionAdmin(admin.ModelAdmin):
@@ -49,3 +49,26 @@ class HabitacionAdmin(admin.ModelAdmin):
     def capacidad(self, obj):
         return obj.capacidad
     capacidad.short_description = 'Capacidad'
+
+
+@admin.register(InventarioNoche)
+class InventarioNocheAdmin(admin.ModelAdmin):
+    list_display = ['tipo_habitacion', 'fecha', 'vendidas', 'retenidas', 'bloqueadas']
+    list_filter = ['tipo_habitacion']
+    date_hierarchy = 'fecha'
+    ordering = ['fecha', 'tipo_habitacion']
+
+
+@admin.register(ReglaTarifa)
+class ReglaTarifaAdmin(admin.ModelAdmin):
+    list_display = ['nombre', 'tipo_habitacion', 'clase', 'fecha_inicio', 'fecha_fin', 'dias_semana', 'precio', 'porcentaje', 'prioridad', 'activo']
+    list_filter = ['tipo_habitacion', 'clase', 'activo']
+    search_fields = ['nombre']
+
+
+@admin.register(TarifaNoche)
+class TarifaNocheAdmin(admin.ModelAdmin):
+    list_display = ['tipo_habitacion', 'fecha', 'precio', 'acumulado']
+    list_filter = ['tipo_habitacion']
+    date_hierarchy = 'fecha'
+    ordering = ['fecha', 'tipo_habitacion']
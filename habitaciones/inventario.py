@@ -0,0 +1,284 @@
+"""
+Libro de inventario por noche (InventarioNoche).
+
+Cada reserva deja una "huella" sobre las noches de su estadía: las pendientes
+retienen habitaciones y las confirmadas/activas/completadas las venden. Las
+transiciones de Reserva llaman a este módulo para mover esa huella y
+`reconstruir` la recalcula desde cero a partir de las reservas existentes.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Max, Value, When
+from django.db.models.functions import Greatest
+
+from .models import InventarioNoche
+
+
+# Noches por UPDATE en aplicar_deltas (cada una agrega parámetros a los CASE)
+NOCHES_POR_UPDATE = 200
+
+# Columna del inventario que ocupa una reserva según su estado
+CAMPO_POR_ESTADO = {
+    'pendiente': 'retenidas',
+    'confirmada': 'vendidas',
+    'activa': 'vendidas',
+    'completada': 'vendidas',
+}
+
+
+def noches(check_in, check_out):
+    """Fechas de las noches de una estadía [check_in, check_out)."""
+    if not check_in or not check_out or check_out <= check_in:
+        return []
+    return [check_in + timedelta(days=i) for i in range((check_out - check_in).days)]
+
+
+def huella(reserva, estado=None):
+    """
+    Devuelve (campo, desde, hasta) con lo que una reserva ocupa en el inventario
+    para el estado indicado, o None si no ocupa nada.
+    Las completadas sólo conservan las noches hasta su salida real
+    (Reserva.fecha_salida, que guarda la transición a completada): la huella
+    no depende del día en que se calcula.
+    """
+    estado = estado or reserva.estado
+    campo = CAMPO_POR_ESTADO.get(estado)
+    desde, hasta = reserva.check_in, reserva.check_out
+    if campo is None or not desde or not hasta:
+        return None
+    if estado == 'completada' and reserva.fecha_salida:
+        hasta = min(hasta, reserva.fecha_salida)
+    if hasta <= desde:
+        return None
+    return campo, desde, hasta
+
+
+def _asegurar_filas(tipo_id, desde, hasta):
+    InventarioNoche.objects.bulk_create(
+        [InventarioNoche(tipo_habitacion_id=tipo_id, fecha=f) for f in noches(desde, hasta)],
+        ignore_conflicts=True,
+    )
+
+
+def _filas(tipo_id, desde, hasta):
+    return InventarioNoche.objects.filter(tipo_habitacion_id=tipo_id, fecha__gte=desde, fecha__lt=hasta)
+
+
+def sumar(tipo_id, desde, hasta, campo, cantidad):
+    """Suma `cantidad` a la columna `campo` en cada noche del rango."""
+    if not cantidad or not noches(desde, hasta):
+        return
+    _asegurar_filas(tipo_id, desde, hasta)
+    _filas(tipo_id, desde, hasta).update(**{campo: F(campo) + cantidad})
+
+
+def restar(tipo_id, desde, hasta, campo, cantidad):
+    """Resta `cantidad` a la columna `campo` en cada noche del rango (sin bajar de 0)."""
+    if not cantidad or not noches(desde, hasta):
+        return
+    _filas(tipo_id, desde, hasta).update(**{campo: Greatest(F(campo) - cantidad, Value(0))})
+
+
+def mover(tipo_id, desde, hasta, origen, destino, cantidad):
+    """Pasa `cantidad` de la columna `origen` a `destino` en un único UPDATE."""
+    if not cantidad or not noches(desde, hasta):
+        return
+    _asegurar_filas(tipo_id, desde, hasta)
+    _filas(tipo_id, desde, hasta).update(**{
+        origen: Greatest(F(origen) - cantidad, Value(0)),
+        destino: F(destino) + cantidad,
+    })
+
+
+@transaction.atomic
+def ocupar(tipo, desde, hasta, campo, cantidad):
+    """
+    Como `sumar`, pero sólo si queda lugar en todas las noches del rango.
+    El control va en el WHERE del UPDATE, así dos reservas simultáneas no
+    pueden quedarse con la misma habitación; si alguna noche no alcanza se
+    revierte todo y se lanza ValidationError.
+    """
+    fechas = noches(desde, hasta)
+    if not cantidad or not fechas:
+        return
+    _asegurar_filas(tipo.pk, desde, hasta)
+    limite = tipo.stock_total - cantidad
+    actualizadas = _filas(tipo.pk, desde, hasta).filter(
+        vendidas__lte=limite - F('retenidas') - F('bloqueadas'),
+    ).update(**{campo: F(campo) + cantidad})
+    if actualizadas != len(fechas):
+        raise ValidationError(f"No hay suficiente disponibilidad para {tipo.nombre} en las fechas solicitadas")
+
+
+def registrar(reserva):
+    """Agrega la huella de una reserva recién creada (ValidationError si no hay lugar)."""
+    actual = huella(reserva)
+    if actual:
+        campo, desde, hasta = actual
+        ocupar(reserva.tipo_habitacion, desde, hasta, campo, reserva.cantidad_habitaciones)
+
+
+@transaction.atomic
+def reubicar(reserva, tipo_id, check_in, check_out, cantidad):
+    """
+    Mueve la huella de una reserva editada: quita la que ocupaba con el tipo,
+    las fechas y la cantidad anteriores (los argumentos) y ocupa la actual.
+    ValidationError si las noches nuevas no tienen lugar.
+    """
+    previa = huella(type(reserva)(
+        estado=reserva.estado, check_in=check_in, check_out=check_out, fecha_salida=reserva.fecha_salida,
+    ))
+    if previa:
+        campo, desde, hasta = previa
+        restar(tipo_id, desde, hasta, campo, cantidad)
+    registrar(reserva)
+
+
+def liberar(reserva):
+    """Quita la huella de una reserva (por ejemplo, al eliminarla)."""
+    actual = huella(reserva)
+    if actual:
+        campo, desde, hasta = actual
+        restar(reserva.tipo_habitacion_id, desde, hasta, campo, reserva.cantidad_habitaciones)
+
+
+@transaction.atomic
+def aplicar_transicion(reserva, estado_anterior, estado_nuevo):
+    """Actualiza el inventario cuando una reserva cambia de estado."""
+    anterior = huella(reserva, estado_anterior)
+    nueva = huella(reserva, estado_nuevo)
+    if anterior == nueva:
+        return
+
+    tipo_id = reserva.tipo_habitacion_id
+    cantidad = reserva.cantidad_habitaciones
+    if anterior and nueva and anterior[1:] == nueva[1:]:
+        # Mismas noches, cambia la columna (p. ej. pendiente -> confirmada)
+        mover(tipo_id, anterior[1], anterior[2], anterior[0], nueva[0], cantidad)
+    elif anterior and nueva and anterior[0] == nueva[0] and anterior[1] == nueva[1]:
+        # Misma columna, la estadía se acorta (check-out anticipado)
+        restar(tipo_id, nueva[2], anterior[2], anterior[0], cantidad)
+    else:
+        if anterior:
+            restar(tipo_id, anterior[1], anterior[2], anterior[0], cantidad)
+        if nueva:
+            ocupar(reserva.tipo_habitacion, nueva[1], nueva[2], nueva[0], cantidad)
+
+
+def acumular(deltas, tipo_id, huella_reserva, cantidad):
+    """Suma `cantidad` (negativa para quitar) en cada noche de una huella a `deltas` ({(tipo_id, fecha): {campo: delta}})."""
+    if huella_reserva:
+        campo, desde, hasta = huella_reserva
+        for fecha in noches(desde, hasta):
+            deltas[(tipo_id, fecha)][campo] += cantidad
+
+
+@transaction.atomic
+def aplicar_deltas(deltas):
+    """
+    Aplica deltas por noche acumulados con `acumular` (p. ej. de todo un lote
+    de transiciones): un UPDATE por tipo con un CASE por fecha, de a
+    NOCHES_POR_UPDATE noches. Las columnas no bajan de 0, como en `restar`.
+    """
+    por_tipo = defaultdict(dict)
+    for (tipo_id, fecha), cambios in deltas.items():
+        cambios = {campo: delta for campo, delta in cambios.items() if delta}
+        if cambios:
+            por_tipo[tipo_id][fecha] = cambios
+    InventarioNoche.objects.bulk_create(
+        [
+            InventarioNoche(tipo_habitacion_id=tipo_id, fecha=fecha)
+            for tipo_id, fechas in por_tipo.items()
+            for fecha, cambios in fechas.items()
+            if any(delta > 0 for delta in cambios.values())
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    for tipo_id, fechas in por_tipo.items():
+        orden = sorted(fechas)
+        for inicio in range(0, len(orden), NOCHES_POR_UPDATE):
+            parte = orden[inicio:inicio + NOCHES_POR_UPDATE]
+            columnas = {campo for fecha in parte for campo in fechas[fecha]}
+            valores = {
+                campo: Greatest(F(campo) + Case(
+                    *[When(fecha=fecha, then=Value(fechas[fecha][campo])) for fecha in parte if campo in fechas[fecha]],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                ), Value(0))
+                for campo in columnas
+            }
+            InventarioNoche.objects.filter(tipo_habitacion_id=tipo_id, fecha__in=parte).update(**valores)
+
+
+def ocupacion_maxima(tipo_ids, check_in, check_out):
+    """
+    Para cada tipo, el máximo de habitaciones ocupadas en alguna noche del rango.
+    Una sola consulta agrupada sobre el índice (tipo_habitacion, fecha).
+    """
+    filas = (
+        InventarioNoche.objects
+        .filter(tipo_habitacion_id__in=list(tipo_ids), fecha__gte=check_in, fecha__lt=check_out)
+        .values('tipo_habitacion_id')
+        .annotate(pico=Max(F('vendidas') + F('retenidas') + F('bloqueadas')))
+    )
+    return {f['tipo_habitacion_id']: f['pico'] or 0 for f in filas}
+
+
+def disponibilidad(tipos, check_in, check_out):
+    """Habitaciones libres por tipo ({tipo_id: libres}) para la estadía indicada."""
+    tipos = list(tipos)
+    picos = ocupacion_maxima([t.id for t in tipos], check_in, check_out)
+    return {t.id: max(0, t.stock_total - picos.get(t.id, 0)) for t in tipos}
+
+
+@transaction.atomic
+def reconstruir(desde=None, hasta=None):
+    """
+    Recalcula las columnas vendidas/retenidas a partir de las reservas.
+    Las habitaciones bloqueadas no se derivan de reservas y se conservan.
+    Devuelve la cantidad de noches con ocupación escritas.
+    """
+    from reservas.models import Reserva
+
+    filas = InventarioNoche.objects.all()
+    reservas = Reserva.objects.filter(
+        estado__in=list(CAMPO_POR_ESTADO),
+        check_in__isnull=False,
+        check_out__isnull=False,
+    )
+    if desde:
+        filas = filas.filter(fecha__gte=desde)
+        reservas = reservas.filter(check_out__gt=desde)
+    if hasta:
+        filas = filas.filter(fecha__lt=hasta)
+        reservas = reservas.filter(check_in__lt=hasta)
+    filas.update(vendidas=0, retenidas=0)
+
+    conteo = {}
+    campos = reservas.values_list(
+        'tipo_habitacion_id', 'check_in', 'check_out', 'fecha_salida', 'cantidad_habitaciones', 'estado',
+    )
+    for tipo_id, check_in, check_out, fecha_salida, cantidad, estado in campos.iterator(chunk_size=2000):
+        reserva = Reserva(check_in=check_in, check_out=check_out, fecha_salida=fecha_salida)
+        campo, inicio, fin = huella(reserva, estado) or (None, None, None)
+        if campo is None:
+            continue
+        for fecha in noches(max(inicio, desde) if desde else inicio, min(fin, hasta) if hasta else fin):
+            valores = conteo.setdefault((tipo_id, fecha), {'vendidas': 0, 'retenidas': 0})
+            valores[campo] += cantidad
+
+    InventarioNoche.objects.bulk_create(
+        [
+            InventarioNoche(tipo_habitacion_id=tipo_id, fecha=fecha, **valores)
+            for (tipo_id, fecha), valores in conteo.items()
+        ],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['tipo_habitacion', 'fecha'],
+        update_fields=['vendidas', 'retenidas'],
+    )
+    return len(conteo)
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habitaciones', '0003_alter_habitacion_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventarioNoche',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(help_text='Noche a la que corresponde el registro')),
+                ('vendidas', models.PositiveIntegerField(default=0, help_text='Habitaciones de reservas confirmadas, activas o completadas')),
+                ('retenidas', models.PositiveIntegerField(default=0, help_text='Habitaciones retenidas por reservas pendientes')),
+                ('bloqueadas', models.PositiveIntegerField(default=0, help_text='Habitaciones fuera de venta (mantenimiento, eventos)')),
+                ('tipo_habitacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventario', to='habitaciones.tipohabitacion')),
+            ],
+            options={
+                'verbose_name': 'Inventario por noche',
+                'verbose_name_plural': 'Inventario por noche',
+                'ordering': ['tipo_habitacion', 'fecha'],
+                'unique_together': {('tipo_habitacion', 'fecha')},
+            },
+        ),
+    ]
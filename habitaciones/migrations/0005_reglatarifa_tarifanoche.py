@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habitaciones', '0004_inventarionoche'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReglaTarifa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100)),
+                ('clase', models.CharField(choices=[('temporada', 'Temporada'), ('dia_semana', 'Día de la semana'), ('especial', 'Fecha especial')], default='temporada', max_length=20)),
+                ('fecha_inicio', models.DateField(blank=True, help_text='Vacío: sin límite inferior', null=True)),
+                ('fecha_fin', models.DateField(blank=True, help_text='Incluida. Vacío: sin límite superior', null=True)),
+                ('dias_semana', models.CharField(blank=True, help_text='Días separados por coma (0=lunes ... 6=domingo). Vacío: todos', max_length=20)),
+                ('precio', models.DecimalField(blank=True, decimal_places=2, help_text='Precio fijo por noche', max_digits=10, null=True)),
+                ('porcentaje', models.DecimalField(blank=True, decimal_places=2, help_text='Ajuste porcentual sobre el precio (p. ej. 20 o -15)', max_digits=6, null=True)),
+                ('prioridad', models.PositiveIntegerField(default=0, help_text='Dentro de la misma clase, mayor prioridad se aplica después')),
+                ('activo', models.BooleanField(default=True)),
+                ('tipo_habitacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reglas_tarifa', to='habitaciones.tipohabitacion')),
+            ],
+            options={
+                'verbose_name': 'Regla de tarifa',
+                'verbose_name_plural': 'Reglas de tarifa',
+                'ordering': ['tipo_habitacion', 'clase', 'prioridad'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TarifaNoche',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('precio', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('acumulado', models.DecimalField(decimal_places=2, help_text='Suma de precios desde el inicio de la grilla hasta esta fecha, incluida', max_digits=14)),
+                ('tipo_habitacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tarifas', to='habitaciones.tipohabitacion')),
+            ],
+            options={
+                'verbose_name': 'Tarifa por noche',
+                'verbose_name_plural': 'Tarifas por noche',
+                'ordering': ['tipo_habitacion', 'fecha'],
+                'unique_together': {('tipo_habitacion', 'fecha')},
+            },
+        ),
+    ]
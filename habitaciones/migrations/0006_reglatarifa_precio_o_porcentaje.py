@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:19
+
+from django.db import migrations, models
+
+
+def normalizar_reglas(apps, schema_editor):
+    # Reglas que clean() habría rechazado: con ambos valores aplicar() usaba el
+    # precio fijo; sin ninguno fallaba, así que quedan como ajuste neutro del 0 %
+    ReglaTarifa = apps.get_model('habitaciones', 'ReglaTarifa')
+    ReglaTarifa.objects.filter(precio__isnull=False, porcentaje__isnull=False).update(porcentaje=None)
+    ReglaTarifa.objects.filter(precio__isnull=True, porcentaje__isnull=True).update(porcentaje=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habitaciones', '0005_reglatarifa_tarifanoche'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalizar_reglas, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='reglatarifa',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('porcentaje__isnull', True), ('precio__isnull', False)), models.Q(('porcentaje__isnull', False), ('precio__isnull', True)), _connector='OR'), name='reglatarifa_precio_o_porcentaje'),
+        ),
+    ]
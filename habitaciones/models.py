@@ -1,6 +1,12 @@
 # app habitaciones/models.py
 
-from django.db import models
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
 class TipoHabitacion(models.Model):
     nombre = models.CharField(max_length=100, unique=True)
@@ -19,23 +25,38 @@ class TipoHabitacion(models.Model):
     def __str__(self):
         return f"{self.nombre} (capacidad {self.capacidad}) - Stock: {self.stock_disponible}/{self.stock_total}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Precio leído de la base, para regenerar la grilla de tarifas sólo si cambia
+        instancia._precio_original = instancia.__dict__.get('precio')
+        return instancia
+
     def tiene_disponibilidad(self, cantidad=1):
         """Verifica si hay suficiente stock disponible"""
         return self.stock_disponible >= cantidad and self.activo
 
     def reservar_stock(self, cantidad=1):
-        """Reduce el stock disponible al hacer una reserva"""
-        if self.tiene_disponibilidad(cantidad):
+        """
+        Reduce el stock disponible al hacer una reserva.
+        UPDATE condicional (WHERE stock_disponible >= cantidad): dos procesos
+        que compiten por la última habitación no pueden descontarla ambos.
+        """
+        actualizados = TipoHabitacion.objects.filter(
+            pk=self.pk, activo=True, stock_disponible__gte=cantidad
+        ).update(stock_disponible=F('stock_disponible') - cantidad)
+        if actualizados:
             self.stock_disponible -= cantidad
-            self.save()
             return True
         return False
 
     def liberar_stock(self, cantidad=1):
-        """Aumenta el stock disponible al cancelar una reserva"""
-        if self.stock_disponible + cantidad <= self.stock_total:
+        """Aumenta el stock disponible al cancelar una reserva (UPDATE condicional)"""
+        actualizados = TipoHabitacion.objects.filter(
+            pk=self.pk, stock_disponible__lte=F('stock_total') - cantidad
+        ).update(stock_disponible=F('stock_disponible') + cantidad)
+        if actualizados:
             self.stock_disponible += cantidad
-            self.save()
             return True
         return False
 
@@ -79,3 +100,191 @@ class Habitacion(models.Model):
     def esta_disponible(self):
         """Verifica si la habitación está disponible para reservar"""
         return self.disponible and not self.en_mantenimiento and self.tipo_habitacion.activo
+
+
+class InventarioNoche(models.Model):
+    """
+    Libro de inventario por noche: una fila por (tipo de habitación, fecha).
+    Lo mantienen las transiciones de Reserva, de modo que la disponibilidad
+    de una estadía de N noches se obtiene leyendo N filas por tipo.
+    """
+    tipo_habitacion = models.ForeignKey(TipoHabitacion, on_delete=models.CASCADE, related_name='inventario')
+    fecha = models.DateField(help_text="Noche a la que corresponde el registro")
+    vendidas = models.PositiveIntegerField(default=0, help_text="Habitaciones de reservas confirmadas, activas o completadas")
+    retenidas = models.PositiveIntegerField(default=0, help_text="Habitaciones retenidas por reservas pendientes")
+    bloqueadas = models.PositiveIntegerField(default=0, help_text="Habitaciones fuera de venta (mantenimiento, eventos)")
+
+    class Meta:
+        unique_together = ['tipo_habitacion', 'fecha']
+        ordering = ['tipo_habitacion', 'fecha']
+        verbose_name = "Inventario por noche"
+        verbose_name_plural = "Inventario por noche"
+
+    def __str__(self):
+        return f"{self.tipo_habitacion.nombre} {self.fecha}: {self.ocupadas}/{self.tipo_habitacion.stock_total}"
+
+    @property
+    def ocupadas(self):
+        """Habitaciones no disponibles para la venta en esta noche"""
+        return self.vendidas + self.retenidas + self.bloqueadas
+
+
+class ReglaTarifa(models.Model):
+    """
+    Regla de precio por noche para un tipo de habitación. Para cada fecha se
+    parte de TipoHabitacion.precio y se aplican, en orden de clase y
+    prioridad, las reglas que correspondan: un precio fijo reemplaza el
+    precio y un porcentaje lo ajusta. La grilla TarifaNoche guarda el resultado.
+    """
+    CLASES = [
+        ('temporada', 'Temporada'),
+        ('dia_semana', 'Día de la semana'),
+        ('especial', 'Fecha especial'),
+    ]
+    ORDEN_CLASES = {'temporada': 0, 'dia_semana': 1, 'especial': 2}
+
+    tipo_habitacion = models.ForeignKey(TipoHabitacion, on_delete=models.CASCADE, related_name='reglas_tarifa')
+    nombre = models.CharField(max_length=100)
+    clase = models.CharField(max_length=20, choices=CLASES, default='temporada')
+    fecha_inicio = models.DateField(null=True, blank=True, help_text="Vacío: sin límite inferior")
+    fecha_fin = models.DateField(null=True, blank=True, help_text="Incluida. Vacío: sin límite superior")
+    dias_semana = models.CharField(max_length=20, blank=True,
+                                   help_text="Días separados por coma (0=lunes ... 6=domingo). Vacío: todos")
+    precio = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True,
+                                 help_text="Precio fijo por noche")
+    porcentaje = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True,
+                                     help_text="Ajuste porcentual sobre el precio (p. ej. 20 o -15)")
+    prioridad = models.PositiveIntegerField(default=0, help_text="Dentro de la misma clase, mayor prioridad se aplica después")
+    activo = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ['tipo_habitacion', 'clase', 'prioridad']
+        constraints = [
+            # clean() sólo corre en formularios; aplicar() necesita exactamente uno de los dos
+            models.CheckConstraint(
+                condition=Q(precio__isnull=False, porcentaje__isnull=True) | Q(precio__isnull=True, porcentaje__isnull=False),
+                name='reglatarifa_precio_o_porcentaje',
+            ),
+        ]
+        verbose_name = "Regla de tarifa"
+        verbose_name_plural = "Reglas de tarifa"
+
+    def __str__(self):
+        return f"{self.tipo_habitacion.nombre} - {self.nombre}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Rango y tipo guardados, para regenerar también las fechas (y el tipo)
+        # que la regla deja de cubrir
+        instancia._fechas_originales = (instancia.__dict__.get('fecha_inicio'), instancia.__dict__.get('fecha_fin'))
+        instancia._tipo_original = instancia.__dict__.get('tipo_habitacion_id')
+        return instancia
+
+    def clean(self):
+        if (self.precio is None) == (self.porcentaje is None):
+            raise ValidationError("Indicá un precio fijo o un porcentaje (sólo uno de los dos).")
+        if self.fecha_inicio and self.fecha_fin and self.fecha_fin < self.fecha_inicio:
+            raise ValidationError("La fecha de fin no puede ser anterior a la de inicio.")
+        try:
+            self.dias()
+        except ValueError:
+            raise ValidationError("Días de la semana inválidos: usá números del 0 al 6 separados por coma.")
+
+    def dias(self):
+        """Conjunto de días de la semana (0=lunes) o None si aplica a todos."""
+        if not self.dias_semana.strip():
+            return None
+        dias = {int(d) for d in self.dias_semana.split(',') if d.strip()}
+        if any(d < 0 or d > 6 for d in dias):
+            raise ValueError(self.dias_semana)
+        return dias
+
+    def aplica(self, fecha):
+        if self.fecha_inicio and fecha < self.fecha_inicio:
+            return False
+        if self.fecha_fin and fecha > self.fecha_fin:
+            return False
+        dias = self.dias()
+        return dias is None or fecha.weekday() in dias
+
+    def aplicar(self, precio):
+        if self.precio is not None:
+            return self.precio
+        return precio * (1 + self.porcentaje / 100)
+
+    @staticmethod
+    def precio_noche(tipo_habitacion, reglas, fecha):
+        """Precio de una noche según las reglas (ya filtradas por tipo y activas)."""
+        precio = tipo_habitacion.precio
+        for regla in sorted(reglas, key=lambda r: (ReglaTarifa.ORDEN_CLASES.get(r.clase, 0), r.prioridad)):
+            if regla.aplica(fecha):
+                precio = regla.aplicar(precio)
+        return Decimal(precio).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+class TarifaNoche(models.Model):
+    """
+    Grilla de tarifas: precio por (tipo de habitación, fecha) generado a partir
+    de las reglas, con la suma acumulada para obtener el total de una estadía
+    restando dos filas.
+    """
+    tipo_habitacion = models.ForeignKey(TipoHabitacion, on_delete=models.CASCADE, related_name='tarifas')
+    fecha = models.DateField()
+    precio = models.DecimalField(max_digits=10, decimal_places=2)
+    acumulado = models.DecimalField(max_digits=14, decimal_places=2,
+                                    help_text="Suma de precios desde el inicio de la grilla hasta esta fecha, incluida")
+
+    class Meta:
+        unique_together = ['tipo_habitacion', 'fecha']
+        ordering = ['tipo_habitacion', 'fecha']
+        verbose_name = "Tarifa por noche"
+        verbose_name_plural = "Tarifas por noche"
+
+    def __str__(self):
+        return f"{self.tipo_habitacion.nombre} {self.fecha}: ${self.precio}"
+
+
+@receiver(post_save, sender=TipoHabitacion)
+def regenerar_tarifas_tipo(sender, instance, created, **kwargs):
+    """Un tipo nuevo o con otro precio base necesita su grilla de tarifas."""
+    if created or instance.precio != getattr(instance, '_precio_original', instance.precio):
+        from . import tarifas
+        tarifas.regenerar(instance)
+    instance._precio_original = instance.precio
+
+
+@receiver(post_save, sender=ReglaTarifa)
+@receiver(post_delete, sender=ReglaTarifa)
+def regenerar_tarifas_regla(sender, instance, signal, **kwargs):
+    """
+    Regenera la grilla desde la primera fecha que la regla cubre o cubría, en
+    su tipo y, si la regla cambió de tipo, también en el anterior.
+    """
+    from django.utils import timezone
+    from . import tarifas
+
+    hoy = timezone.localdate()
+    inicios = [instance.fecha_inicio, getattr(instance, '_fechas_originales', (instance.fecha_inicio, None))[0]]
+    desde = hoy if None in inicios else max(min(inicios), hoy)
+    tipo_original = getattr(instance, '_tipo_original', None) or instance.tipo_habitacion_id
+    instance._fechas_originales = (instance.fecha_inicio, instance.fecha_fin)
+    instance._tipo_original = instance.tipo_habitacion_id
+    if signal is post_save:
+        tarifas.regenerar(instance.tipo_habitacion, desde=desde)
+        if tipo_original != instance.tipo_habitacion_id:
+            anterior = TipoHabitacion.objects.filter(pk=tipo_original).first()
+            if anterior is not None:
+                tarifas.regenerar(anterior, desde=desde)
+        return
+
+    # Al borrar un tipo sus reglas caen en cascada: se espera al commit y sólo
+    # se regenera si el tipo sigue existiendo
+    tipo_id = tipo_original
+
+    def regenerar():
+        tipo = TipoHabitacion.objects.filter(pk=tipo_id).first()
+        if tipo is not None:
+            tarifas.regenerar(tipo, desde=desde)
+
+    transaction.on_commit(regenerar)
@@ -0,0 +1,124 @@
+"""
+Grilla de tarifas por noche (TarifaNoche).
+
+`regenerar` calcula el precio de cada fecha a partir de las ReglaTarifa del
+tipo y guarda también la suma acumulada, de modo que el total de una estadía
+sale de leer dos filas:
+
+    acumulado(última noche) - acumulado(primera noche) + precio(primera noche)
+
+Las reglas y el precio base disparan la regeneración desde la primera fecha
+afectada (ver señales en habitaciones.models); `generar_tarifas` extiende la
+grilla cada noche hasta el horizonte configurado. Cada regeneración envía
+`tarifas_regeneradas` (argumento: tipo_habitacion), que descarta los totales
+memorizados por reservas.pricing.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .inventario import noches
+from .models import ReglaTarifa, TarifaNoche
+
+
+# Días hacia adelante que cubre la grilla
+HORIZONTE_DIAS = getattr(settings, 'TARIFAS_HORIZONTE_DIAS', 365)
+
+# Argumento: tipo_habitacion
+tarifas_regeneradas = Signal()
+
+
+def rango_cobrado(check_in, check_out):
+    """Noches cobradas [desde, hasta): una estadía sin noches cobra la de entrada."""
+    if check_out <= check_in:
+        return check_in, check_in + timedelta(days=1)
+    return check_in, check_out
+
+
+@transaction.atomic
+def regenerar(tipo_habitacion, desde=None, hasta=None):
+    """
+    Recalcula precio y acumulado de un tipo desde `desde` (por defecto hoy)
+    hasta el horizonte o el final actual de la grilla, lo que sea mayor.
+    Devuelve la cantidad de noches escritas.
+    """
+    hoy = timezone.localdate()
+    inicio = desde or hoy
+    fin = hasta or hoy + timedelta(days=HORIZONTE_DIAS)
+
+    filas = TarifaNoche.objects.filter(tipo_habitacion=tipo_habitacion)
+    # El acumulado continúa desde la fila anterior; si hay un hueco, se rellena
+    anterior = filas.filter(fecha__lt=inicio).order_by('-fecha').values_list('fecha', 'acumulado').first()
+    acumulado = 0
+    if anterior:
+        inicio, acumulado = anterior[0] + timedelta(days=1), anterior[1]
+    # Las filas posteriores dependen de este acumulado: se reescriben hasta el final
+    ultima = filas.aggregate(ultima=Max('fecha'))['ultima']
+    if ultima and ultima >= fin:
+        fin = ultima + timedelta(days=1)
+
+    reglas = list(ReglaTarifa.objects.filter(tipo_habitacion=tipo_habitacion, activo=True))
+    nuevas = []
+    for fecha in noches(inicio, fin):
+        precio = ReglaTarifa.precio_noche(tipo_habitacion, reglas, fecha)
+        acumulado += precio
+        nuevas.append(TarifaNoche(tipo_habitacion=tipo_habitacion, fecha=fecha, precio=precio, acumulado=acumulado))
+
+    TarifaNoche.objects.bulk_create(
+        nuevas,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['tipo_habitacion', 'fecha'],
+        update_fields=['precio', 'acumulado'],
+    )
+    tarifas_regeneradas.send(sender=TarifaNoche, tipo_habitacion=tipo_habitacion)
+    return len(nuevas)
+
+
+def precios_por_noche(tipos, desde, hasta):
+    """
+    {tipo_id: [precio de cada noche de [desde, hasta)]} para varios tipos.
+    Una consulta a la grilla; las noches fuera de ella se calculan con las
+    reglas (una consulta más, sólo si hace falta).
+    """
+    tipos = list(tipos)
+    fechas = noches(desde, hasta)
+    posicion = {fecha: i for i, fecha in enumerate(fechas)}
+    precios = {t.pk: [None] * len(fechas) for t in tipos}
+    grilla = TarifaNoche.objects.filter(
+        tipo_habitacion_id__in=list(precios), fecha__gte=desde, fecha__lt=hasta,
+    ).values_list('tipo_habitacion_id', 'fecha', 'precio')
+    for tipo_id, fecha, precio in grilla:
+        precios[tipo_id][posicion[fecha]] = precio
+
+    incompletos = [t for t in tipos if None in precios[t.pk]]
+    if incompletos:
+        reglas = {t.pk: [] for t in incompletos}
+        for regla in ReglaTarifa.objects.filter(tipo_habitacion__in=incompletos, activo=True):
+            reglas[regla.tipo_habitacion_id].append(regla)
+        for tipo in incompletos:
+            fila = precios[tipo.pk]
+            for i, fecha in enumerate(fechas):
+                if fila[i] is None:
+                    fila[i] = ReglaTarifa.precio_noche(tipo, reglas[tipo.pk], fecha)
+    return precios
+
+
+def total_estadia(tipo_habitacion, check_in, check_out):
+    """Precio de las noches de una estadía (una habitación), leyendo dos filas de la grilla."""
+    desde, hasta = rango_cobrado(check_in, check_out)
+    ultima_noche = hasta - timedelta(days=1)
+    filas = {
+        fecha: (precio, acumulado)
+        for fecha, precio, acumulado in TarifaNoche.objects.filter(
+            tipo_habitacion_id=tipo_habitacion.pk, fecha__in=[desde, ultima_noche],
+        ).values_list('fecha', 'precio', 'acumulado')
+    }
+    if desde in filas and ultima_noche in filas:
+        precio_desde, acumulado_desde = filas[desde]
+        return filas[ultima_noche][1] - acumulado_desde + precio_desde
+    return sum(precios_por_noche([tipo_habitacion], desde, hasta)[tipo_habitacion.pk])
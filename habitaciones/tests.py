@@ -1,3 +1,75 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
 from django.test import TestCase
+from django.utils import timezone
+
+from . import inventario
+from .models import InventarioNoche, ReglaTarifa, TarifaNoche, TipoHabitacion
+
+
+class ReglasTarifaTests(TestCase):
+    def setUp(self):
+        self.tipo = TipoHabitacion.objects.create(nombre='Doble', precio=Decimal('100.00'), stock_total=5, stock_disponible=5)
+        self.manana = timezone.localdate() + timedelta(days=1)
+
+    def test_borrar_tipo_con_reglas(self):
+        ReglaTarifa.objects.create(tipo_habitacion=self.tipo, nombre='Temporada alta', porcentaje=Decimal('20'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tipo.delete()
+        self.assertFalse(TarifaNoche.objects.exists())
+
+    def test_borrar_regla_regenera_la_grilla(self):
+        regla = ReglaTarifa.objects.create(tipo_habitacion=self.tipo, nombre='Fijo', precio=Decimal('150.00'))
+        self.assertEqual(TarifaNoche.objects.get(tipo_habitacion=self.tipo, fecha=self.manana).precio, Decimal('150.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            regla.delete()
+        self.assertEqual(TarifaNoche.objects.get(tipo_habitacion=self.tipo, fecha=self.manana).precio, Decimal('100.00'))
+
+    def test_regla_sin_precio_ni_porcentaje(self):
+        with self.assertRaises(IntegrityError):
+            ReglaTarifa.objects.create(tipo_habitacion=self.tipo, nombre='Vacía')
+
+    def test_cambiar_regla_de_tipo_regenera_ambos(self):
+        suite = TipoHabitacion.objects.create(nombre='Suite', precio=Decimal('300.00'), stock_total=2, stock_disponible=2)
+        ReglaTarifa.objects.create(tipo_habitacion=self.tipo, nombre='Fijo', precio=Decimal('150.00'))
+        regla = ReglaTarifa.objects.get(nombre='Fijo')
+        regla.tipo_habitacion = suite
+        regla.save()
+        self.assertEqual(TarifaNoche.objects.get(tipo_habitacion=self.tipo, fecha=self.manana).precio, Decimal('100.00'))
+        self.assertEqual(TarifaNoche.objects.get(tipo_habitacion=suite, fecha=self.manana).precio, Decimal('150.00'))
+
+
+class StockTests(TestCase):
+    def setUp(self):
+        self.tipo = TipoHabitacion.objects.create(nombre='Doble', precio=Decimal('100.00'), stock_total=2, stock_disponible=1)
+
+    def test_dos_instancias_no_toman_la_misma_habitacion(self):
+        # Ambas leyeron stock_disponible=1 antes de que la otra reservara
+        primera = TipoHabitacion.objects.get(pk=self.tipo.pk)
+        segunda = TipoHabitacion.objects.get(pk=self.tipo.pk)
+        self.assertTrue(primera.reservar_stock())
+        self.assertFalse(segunda.reservar_stock())
+        self.assertEqual(TipoHabitacion.objects.get(pk=self.tipo.pk).stock_disponible, 0)
+
+    def test_liberar_no_supera_el_total(self):
+        self.assertTrue(self.tipo.liberar_stock())
+        self.assertFalse(self.tipo.liberar_stock())
+        self.assertEqual(TipoHabitacion.objects.get(pk=self.tipo.pk).stock_disponible, 2)
+
+    def test_tipo_inactivo_no_descuenta(self):
+        TipoHabitacion.objects.filter(pk=self.tipo.pk).update(activo=False)
+        self.assertFalse(self.tipo.reservar_stock())
 
-# Create your tests here.
+    def test_ocupar_no_sobrevende_ninguna_noche(self):
+        desde = timezone.localdate() + timedelta(days=1)
+        inventario.ocupar(self.tipo, desde + timedelta(days=1), desde + timedelta(days=2), 'vendidas', 2)
+        with self.assertRaises(ValidationError):
+            inventario.ocupar(self.tipo, desde, desde + timedelta(days=3), 'retenidas', 1)
+        # Se revierte todo el rango, también las noches que tenían lugar
+        self.assertEqual(
+            list(InventarioNoche.objects.filter(tipo_habitacion=self.tipo).values_list('fecha', 'vendidas', 'retenidas')),
+            [(desde + timedelta(days=1), 2, 0)],
+        )
@@ -6,6 +6,7 @@ from django.shortcuts import render, get_object_or_404
 from administracion.models import Plan, Promocion
 from django.contrib.auth.decorators import login_required
 from reservas.models import Reserva
+from reservas import availability, pricing
 from habitaciones.models import Habitacion, TipoHabitacion
 from django.contrib import messages
 from usuarios.decorators import require_login_and_not_blocked
@@ -201,30 +202,21 @@ def check_availability(request):
                 'message': 'La fecha de salida debe ser posterior a la fecha de entrada'
             }, status=400)
         
-        # Simular búsqueda de disponibilidad
-        # En una aplicación real, aquí consultarías la base de datos
+        # Tipos con unidades libres en todas las noches, desde el motor de disponibilidad
+        tipos = availability.tipos_disponibles(checkin_date, checkout_date, capacidad_min=int(guests or 1))
+        # Total de la estadía (una habitación, impuestos incluidos) para todos los tipos a la vez
+        totales = pricing.quote_batch(tipos, [checkin_date] * len(tipos), [checkout_date] * len(tipos), [1] * len(tipos))
         available_rooms = [
             {
-                'id': 1,
-                'name': 'Habitación Deluxe',
-                'price': 299,
+                'id': tipo.id,
+                'name': tipo.nombre,
+                'price': float(tipo.precio),
+                'total': int(total) / 100,
                 'available': True,
-                'image': '/static/images/room-deluxe.jpg'
-            },
-            {
-                'id': 2,
-                'name': 'Suite Premium',
-                'price': 499,
-                'available': True,
-                'image': '/static/images/room-suite.jpg'
-            },
-            {
-                'id': 3,
-                'name': 'Suite Presidencial',
-                'price': 899,
-                'available': True,
-                'image': '/static/images/room-presidential.jpg'
+                'units': tipo.stock_disponible_fechas,
+                'image': tipo.imagen.url if tipo.imagen else None,
             }
+            for tipo, total in zip(tipos, totales)
         ]
         
         return JsonResponse({
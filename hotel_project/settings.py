@@ -74,12 +74,15 @@ LOGIN_REDIRECT_URL = '/'
 
 import os
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Los emails se encolan (administracion.CorreoSaliente) y los envía `manage.py send_outbox`.
+# En desarrollo: EMAIL_BACKEND=django.core.mail.backends.console.EmailBackend (los tests usan locmem)
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.environ.get('EMAIL_USER')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_PASSWORD')
+EMAIL_TIMEOUT = 30
 
 ROOT_URLCONF = 'hotel_project.urls'
 
@@ -124,6 +127,14 @@ DATABASES = {
     }
 }
 
+# Caché (dashboard de administración). Con REDIS_URL se comparte entre procesos
+# y la invalidación llega a todos; sin ella cada proceso tiene su caché en memoria.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
 # Configuración MySQL comentada para referencia
 # DATABASES = {
 #     'default': {
@@ -1,5 +1,6 @@
-from django.contrib import admin
-from .models import Reserva, Huesped
+from django.contrib import admin, messages
+from .models import Reserva, Huesped, GrupoReserva, DailyStats
+from . import transiciones
 
 @admin.register(Reserva)
 class ReservaAdmin(admin.ModelAdmin):
@@ -33,31 +34,47 @@ class ReservaAdmin(admin.ModelAdmin):
     filter_horizontal = ['servicios']
     
     def precio_total(self, obj):
-        return obj.precio_total()
+        return obj.precio_total
     precio_total.short_description = 'Precio Total'
     
-    actions = ['confirmar_reservas', 'cancelar_reservas']
-    
+    actions = ['confirmar_reservas', 'cancelar_reservas', 'completar_reservas']
+
+    def _transicionar(self, request, queryset, accion, verbo):
+        resultado = transiciones.transicionar_lote(queryset, accion)
+        exitosas = sum(1 for r in resultado.values() if r == transiciones.OK)
+        self.message_user(request, f'{exitosas} reservas {verbo}.')
+        fallidas = [f'#{pk}: {r}' for pk, r in resultado.items() if r != transiciones.OK]
+        if fallidas:
+            self.message_user(request, f'Sin cambios: {", ".join(fallidas)}', level=messages.WARNING)
+
     def confirmar_reservas(self, request, queryset):
-        count = 0
-        for reserva in queryset:
-            if reserva.estado == 'pendiente':
-                reserva.confirmar()
-                count += 1
-        self.message_user(request, f'{count} reservas confirmadas.')
+        self._transicionar(request, queryset, 'confirmar', 'confirmadas')
     confirmar_reservas.short_description = 'Confirmar reservas seleccionadas'
-    
+
     def cancelar_reservas(self, request, queryset):
-        count = 0
-        for reserva in queryset:
-            if reserva.estado in ['pendiente', 'confirmada']:
-                reserva.cancelar()
-                count += 1
-        self.message_user(request, f'{count} reservas canceladas.')
+        self._transicionar(request, queryset, 'cancelar', 'canceladas')
     cancelar_reservas.short_description = 'Cancelar reservas seleccionadas'
 
+    def completar_reservas(self, request, queryset):
+        self._transicionar(request, queryset, 'completar', 'completadas')
+    completar_reservas.short_description = 'Completar reservas seleccionadas'
+
 @admin.register(Huesped)
 class HuespedAdmin(admin.ModelAdmin):
     list_display = ['nombre', 'apellido', 'documento', 'reserva', 'fecha_nacimiento']
     list_filter = ['reserva__tipo_habitacion', 'reserva__check_in']
     search_fields = ['nombre', 'apellido', 'documento', 'email']
+
+
+@admin.register(GrupoReserva)
+class GrupoReservaAdmin(admin.ModelAdmin):
+    list_display = ['id', 'usuario', 'check_in', 'check_out', 'cantidad_huespedes', 'fecha_creacion']
+    search_fields = ['usuario__username', 'usuario__email']
+    readonly_fields = ['fecha_creacion']
+
+
+@admin.register(DailyStats)
+class DailyStatsAdmin(admin.ModelAdmin):
+    list_display = ['fecha', 'tipo_habitacion', 'creadas', 'pendientes', 'confirmadas', 'activas', 'completadas', 'canceladas', 'ingresos', 'noches']
+    list_filter = ['tipo_habitacion', 'fecha']
+    readonly_fields = ['fecha', 'tipo_habitacion', 'creadas', 'pendientes', 'confirmadas', 'activas', 'completadas', 'canceladas', 'ingresos', 'noches']
@@ -0,0 +1,215 @@
+"""
+Analítica de ocupación por noche con NumPy: ocupación, ADR y RevPAR.
+
+`cargar()` trae las estadías vendidas que tocan el período en una sola
+consulta (tipo, check-in, check-out, cantidad, monto). `calcular()` las
+expande a una matriz tipo x noche sin recorrer noches: cada estadía suma su
+cantidad (y su ingreso por noche) en la noche de entrada y la resta en la de
+salida de un arreglo de diferencias, y la suma acumulada por fila da las
+habitaciones vendidas (y el ingreso) de cada noche.
+
+- ocupación = habitaciones vendidas / stock_total
+- ADR       = ingreso / habitaciones vendidas (tarifa media por noche vendida)
+- RevPAR    = ingreso / stock_total (ingreso por habitación disponible)
+
+El ingreso de una estadía se reparte en partes iguales entre sus noches y
+habitaciones; las noches fuera del período no cuentan.
+"""
+from collections import namedtuple
+from datetime import date, timedelta
+
+from django.core.exceptions import ImproperlyConfigured
+
+from administracion.reportes import ESTADOS_VENDIDOS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+_ORDINAL_EPOCH = date(1970, 1, 1).toordinal()
+
+# Máximo de noches por consulta (endpoint y dashboards)
+MAX_NOCHES = 3 * 366
+
+Ocupacion = namedtuple('Ocupacion', [
+    'desde', 'hasta', 'tipos', 'stock', 'vendidas', 'ingresos',
+])
+
+
+def cargar(desde, hasta, tipos=None):
+    """
+    Ocupacion de las noches [desde, hasta) para `tipos` (TipoHabitacion; por
+    defecto todos), con una consulta para las reservas y otra para los tipos.
+    """
+    from habitaciones.models import TipoHabitacion
+    from .models import Reserva
+
+    if tipos is None:
+        tipos = TipoHabitacion.objects.order_by('nombre')
+    tipos = list(tipos)
+    reservas = (
+        Reserva.objects
+        .filter(
+            tipo_habitacion__in=[t.pk for t in tipos], estado__in=ESTADOS_VENDIDOS,
+            check_in__lt=hasta, check_out__gt=desde,
+        )
+        .values_list('tipo_habitacion_id', 'check_in', 'check_out', 'cantidad_habitaciones', 'monto')
+    )
+    filas = list(reservas.iterator(chunk_size=5000))
+    columnas = list(zip(*filas)) if filas else [[], [], [], [], []]
+    tipo_ids, check_ins, check_outs, cantidades, montos = columnas
+    return calcular(
+        desde, hasta,
+        [t.pk for t in tipos], [t.stock_total for t in tipos],
+        tipo_ids, check_ins, check_outs, cantidades, [float(m) for m in montos],
+    )
+
+
+def calcular(desde, hasta, tipos, stock, tipo_ids, check_ins, check_outs, cantidades, montos):
+    """
+    Matriz de ocupación de las noches [desde, hasta) a partir de columnas
+    paralelas de estadías (tipos por ID, fechas date o datetime64). `tipos` y
+    `stock` son los IDs de las filas de la matriz y su stock_total; las
+    estadías de otros tipos se ignoran.
+    """
+    if np is None:
+        raise ImproperlyConfigured('La analítica de ocupación requiere numpy (ver requirements.txt)')
+
+    noches = (hasta - desde).days
+    tipos = np.asarray(tipos, dtype=np.int64)
+    vendidas = np.zeros((len(tipos), noches), dtype=np.int64)
+    ingresos = np.zeros((len(tipos), noches), dtype=np.float64)
+    ocupacion = Ocupacion(desde, hasta, tipos, np.asarray(stock, dtype=np.int64), vendidas, ingresos)
+    if noches <= 0 or len(tipos) == 0 or len(tipo_ids) == 0:
+        return ocupacion
+
+    tipo_ids = np.asarray(tipo_ids, dtype=np.int64)
+    entradas = _dias(check_ins)
+    salidas = _dias(check_outs)
+    cantidades = np.asarray(cantidades, dtype=np.int64)
+    montos = np.asarray(montos, dtype=np.float64)
+
+    # Fila de cada estadía en la matriz (las de tipos que no se piden quedan fuera)
+    orden = np.argsort(tipos)
+    posicion = np.searchsorted(tipos, tipo_ids, sorter=orden)
+    posicion = np.minimum(posicion, len(tipos) - 1)
+    filas = orden[posicion]
+    validas = (tipos[filas] == tipo_ids) & (salidas > entradas)
+
+    primera = desde.toordinal()
+    inicio = np.clip(entradas - primera, 0, noches)
+    fin = np.clip(salidas - primera, 0, noches)
+    validas &= fin > inicio
+    filas, inicio, fin = filas[validas], inicio[validas], fin[validas]
+    cantidades = cantidades[validas]
+    por_noche = montos[validas] / (salidas[validas] - entradas[validas])
+
+    # Arreglos de diferencias (una columna extra para las salidas al final del
+    # período), llenados con bincount sobre el índice plano fila * ancho + noche
+    ancho = noches + 1
+    tamano = len(tipos) * ancho
+    entra, sale = filas * ancho + inicio, filas * ancho + fin
+    delta_vendidas = (
+        np.bincount(entra, weights=cantidades, minlength=tamano)
+        - np.bincount(sale, weights=cantidades, minlength=tamano)
+    )
+    delta_ingresos = (
+        np.bincount(entra, weights=por_noche, minlength=tamano)
+        - np.bincount(sale, weights=por_noche, minlength=tamano)
+    )
+    vendidas[:] = np.rint(np.cumsum(delta_vendidas.reshape(len(tipos), ancho)[:, :noches], axis=1))
+    np.cumsum(delta_ingresos.reshape(len(tipos), ancho)[:, :noches], axis=1, out=ingresos)
+    return ocupacion
+
+
+def _dias(fechas):
+    """Fechas (date o datetime64) como ordinal de día (date.toordinal())."""
+    if isinstance(fechas, np.ndarray):
+        return fechas.astype('datetime64[D]').astype(np.int64) + _ORDINAL_EPOCH
+    fechas = list(fechas)
+    return np.fromiter((f.toordinal() for f in fechas), dtype=np.int64, count=len(fechas))
+
+
+def _dividir(parte, total):
+    """parte / total elemento a elemento, 0 donde total es 0."""
+    parte = np.asarray(parte, dtype=np.float64)
+    total = np.broadcast_to(np.asarray(total, dtype=np.float64), parte.shape)
+    resultado = np.zeros(parte.shape, dtype=np.float64)
+    np.divide(parte, total, out=resultado, where=total > 0)
+    return resultado
+
+
+def indicadores(vendidas, ingresos, capacidad):
+    """(ocupación %, ADR, RevPAR) para arreglos de noches vendidas, ingresos y capacidad."""
+    return (
+        _dividir(vendidas, capacidad) * 100,
+        _dividir(ingresos, vendidas),
+        _dividir(ingresos, capacidad),
+    )
+
+
+def resumen(ocupacion, nombres=None):
+    """
+    Indicadores de una Ocupacion como dict serializable a JSON:
+    por noche (hotel entero), por tipo (todo el período) y por noche y tipo.
+    `nombres` = {tipo_id: nombre} para rotular los tipos.
+    """
+    nombres = nombres or {}
+    noches = ocupacion.vendidas.shape[1]
+    fechas = [(ocupacion.desde + timedelta(days=i)).isoformat() for i in range(noches)]
+    stock = ocupacion.stock
+
+    vendidas_noche = ocupacion.vendidas.sum(axis=0)
+    ingresos_noche = ocupacion.ingresos.sum(axis=0)
+    capacidad_noche = int(stock.sum())
+    occ, adr, revpar = indicadores(vendidas_noche, ingresos_noche, capacidad_noche)
+
+    vendidas_tipo = ocupacion.vendidas.sum(axis=1)
+    ingresos_tipo = ocupacion.ingresos.sum(axis=1)
+    capacidad_tipo = stock * noches
+    occ_tipo, adr_tipo, revpar_tipo = indicadores(vendidas_tipo, ingresos_tipo, capacidad_tipo)
+    occ_matriz, adr_matriz, revpar_matriz = indicadores(ocupacion.vendidas, ocupacion.ingresos, stock[:, None])
+
+    total_occ, total_adr, total_revpar = indicadores(
+        vendidas_noche.sum(), ingresos_noche.sum(), capacidad_noche * noches
+    )
+    return {
+        'desde': ocupacion.desde.isoformat(),
+        'hasta': ocupacion.hasta.isoformat(),
+        'total': {
+            'noches_vendidas': int(vendidas_noche.sum()),
+            'noches_disponibles': capacidad_noche * noches,
+            'ingresos': round(float(ingresos_noche.sum()), 2),
+            'ocupacion': round(float(total_occ), 1),
+            'adr': round(float(total_adr), 2),
+            'revpar': round(float(total_revpar), 2),
+        },
+        'por_noche': {
+            'fechas': fechas,
+            'vendidas': vendidas_noche.tolist(),
+            'ocupacion': np.round(occ, 1).tolist(),
+            'adr': np.round(adr, 2).tolist(),
+            'revpar': np.round(revpar, 2).tolist(),
+        },
+        'por_tipo': [
+            {
+                'id': int(tipo_id),
+                'nombre': nombres.get(int(tipo_id), str(tipo_id)),
+                'stock_total': int(stock[i]),
+                'noches_vendidas': int(vendidas_tipo[i]),
+                'ingresos': round(float(ingresos_tipo[i]), 2),
+                'ocupacion': round(float(occ_tipo[i]), 1),
+                'adr': round(float(adr_tipo[i]), 2),
+                'revpar': round(float(revpar_tipo[i]), 2),
+                'por_noche': {
+                    'vendidas': ocupacion.vendidas[i].tolist(),
+                    'ocupacion': np.round(occ_matriz[i], 1).tolist(),
+                    'adr': np.round(adr_matriz[i], 2).tolist(),
+                    'revpar': np.round(revpar_matriz[i], 2).tolist(),
+                },
+            }
+            for i, tipo_id in enumerate(ocupacion.tipos)
+        ],
+    }
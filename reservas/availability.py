@@ -0,0 +1,101 @@
+"""
+Motor de disponibilidad compartido por el asistente de reservas, el chatbot
+y la búsqueda pública.
+
+Responde "cuántas unidades de cada tipo y qué habitaciones físicas están
+libres para [check_in, check_out) con capacidad >= N" con un número fijo de
+consultas agrupadas, sin importar cuántos tipos o habitaciones existan:
+
+1. los tipos activos que cumplen la capacidad,
+2. el pico de ocupación por tipo en el inventario por noche,
+3. (opcional) las habitaciones físicas sin reservas asignadas que se solapen.
+"""
+from collections import namedtuple
+
+from django.db.models import Exists, OuterRef, Q
+
+from habitaciones import inventario
+from habitaciones.models import Habitacion, TipoHabitacion
+from .models import Reserva
+
+
+# Estados en los que una reserva ocupa la habitación física asignada
+ESTADOS_OCUPAN_HABITACION = ['confirmada', 'activa']
+
+Disponibilidad = namedtuple('Disponibilidad', ['tipos', 'unidades', 'habitaciones'])
+
+
+def _filtrar_tipos(qs, tipos):
+    """Acepta instancias, IDs o nombres de tipo (sin distinguir mayúsculas)."""
+    if not tipos:
+        return qs
+    condicion = Q(pk__in=[])
+    for t in tipos:
+        if isinstance(t, TipoHabitacion):
+            condicion |= Q(pk=t.pk)
+        elif isinstance(t, int):
+            condicion |= Q(pk=t)
+        elif t and str(t).strip():
+            condicion |= Q(nombre__iexact=str(t).strip())
+    return qs.filter(condicion)
+
+
+def tipos_disponibles(check_in, check_out, capacidad_min=1, tipos=None, incluir_agotados=False):
+    """
+    Tipos activos con capacidad >= capacidad_min, cada uno anotado con
+    `stock_disponible_fechas` (unidades libres en todas las noches del rango).
+    Dos consultas en total.
+    """
+    qs = _filtrar_tipos(
+        TipoHabitacion.objects.filter(activo=True, capacidad__gte=capacidad_min),
+        tipos,
+    ).order_by('precio')
+    tipos_list = list(qs)
+    unidades = inventario.disponibilidad(tipos_list, check_in, check_out)
+    for tipo in tipos_list:
+        tipo.stock_disponible_fechas = unidades.get(tipo.id, 0)
+    if incluir_agotados:
+        return tipos_list
+    return [t for t in tipos_list if t.stock_disponible_fechas > 0]
+
+
+def habitaciones_libres(check_in, check_out, capacidad_min=1, tipos=None, excluir=None):
+    """
+    QuerySet de habitaciones físicas utilizables y sin reservas confirmadas o
+    activas asignadas que se solapen con el rango. Una única consulta con
+    NOT EXISTS correlacionado.
+    """
+    solapadas = Reserva.objects.filter(
+        habitacion_asignada=OuterRef('pk'),
+        check_in__lt=check_out,
+        check_out__gt=check_in,
+        estado__in=ESTADOS_OCUPAN_HABITACION,
+    )
+    qs = Habitacion.objects.select_related('tipo_habitacion').filter(
+        disponible=True,
+        en_mantenimiento=False,
+        tipo_habitacion__activo=True,
+        tipo_habitacion__capacidad__gte=capacidad_min,
+    ).exclude(Exists(solapadas))
+    if tipos:
+        qs = qs.filter(tipo_habitacion__in=_filtrar_tipos(TipoHabitacion.objects.all(), tipos))
+    if excluir:
+        qs = qs.exclude(id__in=excluir)
+    return qs.order_by('tipo_habitacion__precio', 'numero')
+
+
+def consultar(check_in, check_out, capacidad_min=1, tipos=None, con_habitaciones=True, limite=None):
+    """
+    Consulta completa: tipos con unidades libres, el mapa {tipo_id: unidades}
+    y, si se pide, las habitaciones físicas libres de esos tipos.
+    Tres consultas como máximo.
+    """
+    tipos_list = tipos_disponibles(check_in, check_out, capacidad_min, tipos)
+    unidades = {t.id: t.stock_disponible_fechas for t in tipos_list}
+    habitaciones = []
+    if con_habitaciones and tipos_list:
+        qs = habitaciones_libres(check_in, check_out, capacidad_min, tipos=tipos_list)
+        if limite:
+            qs = qs[:limite]
+        habitaciones = list(qs)
+    return Disponibilidad(tipos=tipos_list, unidades=unidades, habitaciones=habitaciones)
@@ -0,0 +1,159 @@
+"""
+Estadísticas diarias de reservas (DailyStats) para los dashboards.
+
+Cada reserva aporta a la fila de (día de fecha_reserva, tipo de habitación):
+una reserva creada, una en la columna de su estado, su monto y sus noches de
+habitación. Las filas se mantienen con deltas en lugar de recalcularse:
+
+- Reserva.save() resta el aporte anterior (los valores con que se cargó la
+  instancia, sin volver a leer la fila) y suma el nuevo,
+- post_delete resta el aporte de la reserva borrada,
+- `reservas_transicionadas` mueve una unidad de la columna de un estado a la
+  del siguiente (las transiciones son UPDATE y no pasan por save()),
+- GrupoReserva.crear suma las reservas creadas con bulk_create.
+
+`rebuild_stats` recalcula cualquier rango de fechas desde las reservas.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+
+# Estado de la reserva -> columna de DailyStats
+CAMPOS_ESTADO = {
+    'pendiente': 'pendientes',
+    'confirmada': 'confirmadas',
+    'activa': 'activas',
+    'completada': 'completadas',
+    'cancelada': 'canceladas',
+}
+
+CAMPOS = ('creadas', *CAMPOS_ESTADO.values(), 'ingresos', 'noches')
+
+# Columnas de Reserva que definen su aporte (en el orden de contribucion())
+VALORES_RESERVA = (
+    'fecha_reserva', 'tipo_habitacion_id', 'estado', 'monto', 'cantidad_habitaciones', 'check_in', 'check_out',
+)
+
+
+def contribucion(fecha_reserva, tipo_habitacion_id, estado, monto, cantidad, check_in, check_out):
+    """((fecha, tipo_id), {columna: valor}) que una reserva aporta a DailyStats."""
+    noches = 0
+    if check_in and check_out and check_out > check_in:
+        noches = (check_out - check_in).days * cantidad
+    valores = {'creadas': 1, 'ingresos': monto or 0, 'noches': noches}
+    if estado in CAMPOS_ESTADO:
+        valores[CAMPOS_ESTADO[estado]] = 1
+    return (timezone.localdate(fecha_reserva), tipo_habitacion_id), valores
+
+
+def valores_de(reserva):
+    return tuple(getattr(reserva, campo) for campo in VALORES_RESERVA)
+
+
+def _sumar(deltas, valores, signo):
+    clave, aporte = contribucion(*valores)
+    for campo, valor in aporte.items():
+        deltas[clave][campo] += signo * valor
+
+
+@transaction.atomic
+def aplicar(deltas):
+    """Suma `deltas` ({(fecha, tipo_id): {columna: delta}}) con un UPDATE por fila afectada."""
+    from .models import DailyStats
+
+    deltas = {
+        clave: {campo: valor for campo, valor in cambios.items() if valor}
+        for clave, cambios in deltas.items()
+    }
+    deltas = {clave: cambios for clave, cambios in deltas.items() if cambios}
+    if not deltas:
+        return
+    DailyStats.objects.bulk_create(
+        [DailyStats(fecha=fecha, tipo_habitacion_id=tipo_id) for fecha, tipo_id in deltas],
+        ignore_conflicts=True,
+    )
+    for (fecha, tipo_id), cambios in deltas.items():
+        DailyStats.objects.filter(fecha=fecha, tipo_habitacion_id=tipo_id).update(
+            **{campo: F(campo) + valor for campo, valor in cambios.items()}
+        )
+
+
+def registrar_guardado(anterior, reserva, update_fields=None):
+    """
+    Reserva guardada: `anterior` son sus VALORES_RESERVA antes del save()
+    (None si es nueva). Con update_fields sólo cambian esas columnas.
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    nuevo = valores_de(reserva)
+    if anterior:
+        if update_fields is not None:
+            guardados = {campo for nombre in update_fields for campo in (nombre, f'{nombre}_id')}
+            nuevo = tuple(
+                valor if campo in guardados else previo
+                for campo, valor, previo in zip(VALORES_RESERVA, nuevo, anterior)
+            )
+        _sumar(deltas, anterior, -1)
+    _sumar(deltas, nuevo, 1)
+    aplicar(deltas)
+
+
+def registrar_creadas(reservas):
+    deltas = defaultdict(lambda: defaultdict(int))
+    for reserva in reservas:
+        _sumar(deltas, valores_de(reserva), 1)
+    aplicar(deltas)
+
+
+def registrar_borrado(reserva):
+    deltas = defaultdict(lambda: defaultdict(int))
+    _sumar(deltas, valores_de(reserva), -1)
+    aplicar(deltas)
+
+
+def registrar_transiciones(cambios):
+    """Aplica una lista de transiciones.CambioEstado."""
+    deltas = defaultdict(lambda: defaultdict(int))
+    for cambio in cambios:
+        clave = (timezone.localdate(cambio.fecha_reserva), cambio.tipo_habitacion_id)
+        if cambio.anterior in CAMPOS_ESTADO:
+            deltas[clave][CAMPOS_ESTADO[cambio.anterior]] -= 1
+        if cambio.nuevo in CAMPOS_ESTADO:
+            deltas[clave][CAMPOS_ESTADO[cambio.nuevo]] += 1
+    aplicar(deltas)
+
+
+def calcular(reservas):
+    """{(fecha, tipo_id): {columna: valor}} a partir de un QuerySet de reservas (en una sola pasada)."""
+    totales = defaultdict(lambda: defaultdict(int))
+    for valores in reservas.values_list(*VALORES_RESERVA).iterator(chunk_size=2000):
+        _sumar(totales, valores, 1)
+    return totales
+
+
+@transaction.atomic
+def reconstruir(desde=None, hasta=None):
+    """
+    Recalcula las filas de [desde, hasta] (fechas de reserva, ambas incluidas;
+    None = sin límite) desde las reservas. Devuelve la cantidad de filas escritas.
+    """
+    from .models import DailyStats, Reserva
+
+    filas = DailyStats.objects.all()
+    reservas = Reserva.objects.all()
+    if desde:
+        filas = filas.filter(fecha__gte=desde)
+        reservas = reservas.filter(fecha_reserva__date__gte=desde)
+    if hasta:
+        filas = filas.filter(fecha__lte=hasta)
+        reservas = reservas.filter(fecha_reserva__date__lte=hasta)
+
+    filas.delete()
+    nuevas = [
+        DailyStats(fecha=fecha, tipo_habitacion_id=tipo_id, **valores)
+        for (fecha, tipo_id), valores in calcular(reservas).items()
+    ]
+    DailyStats.objects.bulk_create(nuevas, batch_size=1000)
+    return len(nuevas)
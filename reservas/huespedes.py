@@ -0,0 +1,116 @@
+"""
+Registro masivo de huéspedes.
+
+`registrar_huespedes` guarda la lista de huéspedes de una reserva y la
+sincroniza con el padrón de administración (administracion.Huesped, único
+por DNI) con un puñado de consultas, sin importar cuántos huéspedes sean:
+
+1. DNI (normalizados) ya presentes en el padrón,
+2. upsert masivo en el padrón (bulk_create con update_conflicts sobre dni),
+3. IDs del padrón por DNI normalizado, para vincular cada huésped (y
+   reindexarlos en la búsqueda de administración),
+4. huéspedes de la reserva ya cargados con esos DNI,
+5. inserción masiva de los nuevos y actualización masiva de los existentes.
+"""
+from collections import namedtuple
+
+from django.db import transaction
+
+from administracion import busqueda
+from administracion.models import Huesped as AdminHuesped, normalizar_dni
+from .models import Huesped
+
+
+ResultadoRegistro = namedtuple('ResultadoRegistro', [
+    'insertados', 'actualizados', 'padron_insertados', 'padron_actualizados',
+])
+
+CAMPOS_HUESPED = ['nombre', 'apellido', 'edad', 'genero', 'dni', 'dni_normalizado', 'padron']
+
+
+def _limpiar(datos):
+    return {
+        'nombre': (datos.get('nombre') or '').strip(),
+        'apellido': (datos.get('apellido') or '').strip(),
+        'edad': datos.get('edad') or 0,
+        'genero': datos.get('genero') or 'O',
+        'dni': str(datos.get('dni') or '').strip(),
+    }
+
+
+@transaction.atomic
+def registrar_huespedes(reserva, huespedes, registrar_en_padron=True):
+    """
+    Inserta o actualiza (por DNI dentro de la reserva) los huéspedes de
+    `reserva` a partir de una lista de dicts con nombre, apellido, edad,
+    genero y dni. Si `registrar_en_padron`, también los da de alta o actualiza
+    nombre y apellido en administracion.Huesped. Devuelve un ResultadoRegistro
+    con las cantidades insertadas y actualizadas en cada modelo.
+    """
+    filas = [_limpiar(h) for h in huespedes if h]
+    if not filas:
+        return ResultadoRegistro(0, 0, 0, 0)
+
+    dnis = {f['dni'] for f in filas if f['dni']}
+    for fila in filas:
+        fila['dni_normalizado'] = normalizar_dni(fila['dni'])
+
+    padron_insertados = padron_actualizados = 0
+    if registrar_en_padron and dnis:
+        # Un registro por DNI normalizado (si se repite, vale el último de la lista);
+        # si ya está en el padrón escrito de otra forma, se conserva esa escritura
+        por_dni = {f['dni_normalizado']: f for f in filas if f['dni_normalizado']}
+        en_padron = dict(
+            AdminHuesped.objects.filter(dni_normalizado__in=por_dni).values_list('dni_normalizado', 'dni')
+        )
+        AdminHuesped.objects.bulk_create(
+            [
+                AdminHuesped(
+                    dni=en_padron.get(normalizado, f['dni']), dni_normalizado=normalizado,
+                    nombre=f['nombre'], apellido=f['apellido'], telefono='', email='',
+                )
+                for normalizado, f in por_dni.items()
+            ],
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['dni'],
+            update_fields=['nombre', 'apellido', 'dni_normalizado'],
+        )
+        padron_actualizados = len(en_padron)
+        padron_insertados = len(por_dni) - padron_actualizados
+
+    # Vínculo con el padrón por DNI normalizado
+    padron = {}
+    normalizados = {f['dni_normalizado'] for f in filas if f['dni_normalizado']}
+    if normalizados:
+        padron = dict(
+            AdminHuesped.objects.filter(dni_normalizado__in=normalizados).values_list('dni_normalizado', 'id')
+        )
+    if padron_insertados or padron_actualizados:
+        # El upsert masivo no dispara post_save: se indexan para la búsqueda en un solo paso
+        busqueda.indexar_ids('huespedes', padron.values())
+
+    existentes = {}
+    if dnis:
+        existentes = {h.dni: h for h in Huesped.objects.filter(reserva=reserva, dni__in=dnis)}
+
+    nuevos, modificados = [], []
+    for fila in filas:
+        fila['padron_id'] = padron.get(fila['dni_normalizado'])
+        huesped = existentes.get(fila['dni']) if fila['dni'] else None
+        if huesped is None:
+            nuevos.append(Huesped(reserva=reserva, **fila))
+        else:
+            for campo, valor in fila.items():
+                setattr(huesped, campo, valor)
+            modificados.append(huesped)
+    Huesped.objects.bulk_create(nuevos, batch_size=500)
+    if modificados:
+        Huesped.objects.bulk_update(modificados, CAMPOS_HUESPED, batch_size=500)
+
+    return ResultadoRegistro(
+        insertados=len(nuevos),
+        actualizados=len(modificados),
+        padron_insertados=padron_insertados,
+        padron_actualizados=padron_actualizados,
+    )
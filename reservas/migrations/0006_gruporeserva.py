@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0005_add_codigo_checkin_to_reserva'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GrupoReserva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('check_in', models.DateField()),
+                ('check_out', models.DateField()),
+                ('cantidad_huespedes', models.PositiveIntegerField(default=1)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grupos_reserva', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Reserva grupal',
+                'verbose_name_plural': 'Reservas grupales',
+                'ordering': ['-fecha_creacion'],
+            },
+        ),
+        migrations.AddField(
+            model_name='reserva',
+            name='grupo',
+            field=models.ForeignKey(blank=True, help_text='Reserva grupal (varios tipos de habitación) a la que pertenece', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='reservas.gruporeserva'),
+        ),
+    ]
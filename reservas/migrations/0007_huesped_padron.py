@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0003_huesped_dni_normalizado'),
+        ('reservas', '0006_gruporeserva'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='huesped',
+            name='dni_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='huesped',
+            name='padron',
+            field=models.ForeignKey(blank=True, help_text='Huésped del padrón de administración con el mismo DNI', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='estadias', to='administracion.huesped'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0004_documentobusqueda'),
+        ('habitaciones', '0005_reglatarifa_tarifanoche'),
+        ('reservas', '0007_huesped_padron'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['fecha_reserva', 'id'], name='reserva_fecha_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['estado', 'fecha_reserva', 'id'], name='reserva_estado_fecha_idx'),
+        ),
+    ]
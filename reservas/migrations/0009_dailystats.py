@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def calcular_existentes(apps, schema_editor):
+    from reservas.estadisticas import calcular
+
+    Reserva = apps.get_model('reservas', 'Reserva')
+    DailyStats = apps.get_model('reservas', 'DailyStats')
+    DailyStats.objects.bulk_create([
+        DailyStats(fecha=fecha, tipo_habitacion_id=tipo_id, **valores)
+        for (fecha, tipo_id), valores in calcular(Reserva.objects.all()).items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habitaciones', '0005_reglatarifa_tarifanoche'),
+        ('reservas', '0008_reserva_indices_listado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('creadas', models.IntegerField(default=0)),
+                ('pendientes', models.IntegerField(default=0)),
+                ('confirmadas', models.IntegerField(default=0)),
+                ('activas', models.IntegerField(default=0)),
+                ('completadas', models.IntegerField(default=0)),
+                ('canceladas', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('noches', models.IntegerField(default=0, help_text='Noches de habitación reservadas')),
+                ('tipo_habitacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='estadisticas', to='habitaciones.tipohabitacion')),
+            ],
+            options={
+                'verbose_name': 'Estadística diaria',
+                'verbose_name_plural': 'Estadísticas diarias',
+                'ordering': ['-fecha'],
+                'unique_together': {('fecha', 'tipo_habitacion')},
+            },
+        ),
+        migrations.RunPython(calcular_existentes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0009_dailystats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reserva',
+            name='fecha_salida',
+            field=models.DateField(blank=True, editable=False, help_text='Día real del check-out; lo guarda la transición a completada', null=True),
+        ),
+    ]
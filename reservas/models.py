@@ -1,12 +1,18 @@
 import uuid
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from habitaciones.models import TipoHabitacion, Habitacion
-from administracion.models import Servicio, Plan, Promocion
+from habitaciones import inventario, tarifas
+from . import estadisticas, pricing, transiciones
+from administracion.models import Servicio, Plan, Promocion, Huesped as AdminHuesped, normalizar_dni
+from administracion import reportes, tablero
 from decimal import Decimal
 from django.utils import timezone
+from django.utils.crypto import get_random_string
 
 
 class Reserva(models.Model):
@@ -46,10 +52,19 @@ class Reserva(models.Model):
     monto = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     check_in = models.DateField(null=True, blank=True)
     check_out = models.DateField(null=True, blank=True)
+    fecha_salida = models.DateField(null=True, blank=True, editable=False,
+                                    help_text="Día real del check-out; lo guarda la transición a completada")
     cantidad_huespedes = models.PositiveIntegerField(default=1)
+    grupo = models.ForeignKey('GrupoReserva', on_delete=models.CASCADE, null=True, blank=True, related_name='reservas',
+                              help_text="Reserva grupal (varios tipos de habitación) a la que pertenece")
 
     class Meta:
         ordering = ['-fecha_reserva']
+        indexes = [
+            # Paginación por cursor de administracion.views.ver_reservas
+            models.Index(fields=['fecha_reserva', 'id'], name='reserva_fecha_id_idx'),
+            models.Index(fields=['estado', 'fecha_reserva', 'id'], name='reserva_estado_fecha_idx'),
+        ]
         verbose_name = "Reserva"
         verbose_name_plural = "Reservas"
 
@@ -63,126 +78,289 @@ class Reserva(models.Model):
             detalle += f" - Promoción: {self.promocion.nombre}"
         return detalle
 
-    def save(self, *args, **kwargs):
-        """Override save para gestionar el stock automáticamente"""
-        # Si es una nueva reserva y está confirmada, reservar stock
-        if not self.pk and self.estado == 'confirmada':
-            if not self.tipo_habitacion.reservar_stock(self.cantidad_habitaciones):
-                raise ValidationError(f"No hay suficiente stock disponible para {self.tipo_habitacion.nombre}")
-        
-        # Si se está cambiando el estado
-        elif self.pk:
-            old_reserva = Reserva.objects.get(pk=self.pk)
-            
-            # Si se confirma una reserva pendiente
-            if old_reserva.estado == 'pendiente' and self.estado == 'confirmada':
-                if not self.tipo_habitacion.reservar_stock(self.cantidad_habitaciones):
-                    raise ValidationError(f"No hay suficiente stock disponible para {self.tipo_habitacion.nombre}")
-            
-            # Si se cancela una reserva confirmada/activa
-            elif old_reserva.estado in ['confirmada', 'activa'] and self.estado == 'cancelada':
-                self.tipo_habitacion.liberar_stock(self.cantidad_habitaciones)
-            
-            # Si se completa una reserva activa
-            elif old_reserva.estado == 'activa' and self.estado == 'completada':
-                self.tipo_habitacion.liberar_stock(self.cantidad_habitaciones)
+    # Lo que ubica a la reserva en el inventario y en el stock del tipo
+    CAMPOS_UBICACION = ('tipo_habitacion_id', 'check_in', 'check_out', 'cantidad_habitaciones')
 
-        super().save(*args, **kwargs)
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._guardar_originales()
+        return instancia
+
+    def _guardar_originales(self, campos=None):
+        """
+        Recuerda los valores que tiene la base (de estadisticas.VALORES_RESERVA,
+        que incluyen CAMPOS_UBICACION): save() los compara para mover
+        inventario, stock y DailyStats sin volver a leer la fila.
+        """
+        originales = self.__dict__.setdefault('_originales', {})
+        for campo in estadisticas.VALORES_RESERVA:
+            if campo in self.__dict__ and (campos is None or campo in campos or campo.removesuffix('_id') in campos):
+                originales[campo] = self.__dict__[campo]
+
+    def _ubicacion(self):
+        return tuple(self.__dict__.get(campo) for campo in self.CAMPOS_UBICACION)
 
+    # Transiciones de estado: ver reservas/transiciones.py
     def confirmar(self):
         """Confirma la reserva y reserva el stock"""
-        if self.estado == 'pendiente':
-            if self.tipo_habitacion.reservar_stock(self.cantidad_habitaciones):
-                self.estado = 'confirmada'
-                self.save()
-                return True
-        return False
+        return transiciones.transicionar(self, 'confirmar')
 
     def cancelar(self):
         """Cancela la reserva y libera el stock"""
-        if self.estado in ['pendiente', 'confirmada']:
-            if self.estado == 'confirmada':
-                self.tipo_habitacion.liberar_stock(self.cantidad_habitaciones)
-            self.estado = 'cancelada'
-            self.save()
-            return True
-        return False
+        return transiciones.transicionar(self, 'cancelar')
 
     def activar(self, habitacion_asignada=None):
         """Activa la reserva (check-in)"""
-        if self.estado == 'confirmada':
-            self.estado = 'activa'
-            if habitacion_asignada:
-                self.habitacion_asignada = habitacion_asignada
-            self.save()
-            return True
-        return False
+        campos = {'habitacion_asignada': habitacion_asignada} if habitacion_asignada else {}
+        return transiciones.transicionar(self, 'activar', **campos)
 
     def completar(self):
         """Completa la reserva (check-out) y libera el stock"""
-        if self.estado == 'activa':
-            self.estado = 'completada'
-            self.tipo_habitacion.liberar_stock(self.cantidad_habitaciones)
-            self.save()
-            return True
-        return False
+        return transiciones.transicionar(self, 'completar')
 
     @property
     def precio_total(self):
-        """Calcula el precio total de la reserva"""
-        precio_base = self.tipo_habitacion.precio * self.cantidad_habitaciones
-        
-        # Aplicar descuento de promoción si existe
-        if self.promocion:
-            precio_base = precio_base * (1 - self.promocion.descuento / 100)
-        
-        # Agregar precio del plan si existe
-        if self.plan:
-            precio_base += self.plan.precio
-        
-        return precio_base
+        """Precio total de la reserva (ver reservas/pricing.py)"""
+        return self.calcular_total()
 
     def clean(self):
         if self.plan and self.promocion:
             raise ValidationError("La reserva no puede tener un plan y una promoción al mismo tiempo.")
 
     def calcular_total(self, incluir_servicios=True):
-        precio_base = Decimal('0')
-        noches = 1
-        if self.check_in and self.check_out:
-            try:
-                noches = (self.check_out - self.check_in).days or 1
-            except Exception:
-                noches = 1
+        return pricing.cotizar_reserva(self, incluir_servicios=incluir_servicios).total
 
-        if self.tipo_habitacion:
-            precio_base = (self.tipo_habitacion.precio * self.cantidad_habitaciones * noches)
+    def save(self, *args, **kwargs):
+        nueva = self._state.adding
+        if self.pk:
+            self.monto = self.calcular_total(incluir_servicios=True)
+        else:
+            self.monto = self.calcular_total(incluir_servicios=False)
 
-        precio_servicios = Decimal('0')
-        if incluir_servicios:
-            precio_servicios = sum(Decimal(s.precio) for s in self.servicios.all())
+        # Las reservas nuevas retienen/venden sus noches en el inventario (y
+        # descuentan stock si nacen confirmadas); si no hay lugar se lanza
+        # ValidationError y no se inserta nada
+        update_fields = kwargs.get('update_fields')
+        with transaction.atomic():
+            anterior = None
+            if nueva:
+                inventario.registrar(self)
+                transiciones.tomar_stock(self)
+            else:
+                if self._guarda_ubicacion(update_fields):
+                    self._reubicar()
+                if self._afecta_estadisticas(update_fields):
+                    anterior = self._valores_anteriores()
+            super().save(*args, **kwargs)
+            if nueva or anterior:
+                estadisticas.registrar_guardado(anterior, self, update_fields)
+        self._guardar_originales(update_fields)
 
-        total = precio_base + precio_servicios
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._guardar_originales(kwargs.get('fields'))
 
-        if self.plan:
-            total += self.plan.precio
+    def _reubicar(self):
+        """
+        Si se editó el tipo, las fechas o la cantidad, mueve la huella en el
+        inventario y el stock del tipo (ValidationError si no hay lugar).
+        El estado no se compara: lo cambian sólo las transiciones.
+        """
+        originales = self.__dict__.get('_originales', {})
+        if any(campo not in originales for campo in self.CAMPOS_UBICACION):
+            return
+        original = tuple(originales[campo] for campo in self.CAMPOS_UBICACION)
+        if original == self._ubicacion():
+            return
+        tipo_id, check_in, check_out, cantidad = original
+        inventario.reubicar(self, tipo_id, check_in, check_out, cantidad)
+        transiciones.reubicar_stock(self, tipo_id, cantidad)
 
-        if self.promocion:
-            descuento = (total * self.promocion.descuento) / 100
-            total -= descuento
+    def _valores_anteriores(self):
+        """
+        VALORES_RESERVA de la fila antes de este save(), desde los valores
+        cargados. El estado es el actual: sus cambios los registran las
+        transiciones (reservas_transicionadas). Sólo si la instancia no se leyó
+        de la base (o se leyó con .only()) hace falta consultarla.
+        """
+        originales = self.__dict__.get('_originales', {})
+        if all(campo in originales for campo in estadisticas.VALORES_RESERVA):
+            return tuple(
+                self.estado if campo == 'estado' else originales[campo] for campo in estadisticas.VALORES_RESERVA
+            )
+        return Reserva.objects.filter(pk=self.pk).values_list(*estadisticas.VALORES_RESERVA).first()
 
-        impuestos = total * Decimal('0.18')
-        total_con_impuestos = total + impuestos
+    @classmethod
+    def _guarda_ubicacion(cls, update_fields):
+        if update_fields is None:
+            return True
+        return any(f'{campo}_id' in cls.CAMPOS_UBICACION or campo in cls.CAMPOS_UBICACION for campo in update_fields)
 
-        return total_con_impuestos
+    @staticmethod
+    def _afecta_estadisticas(update_fields):
+        if update_fields is None:
+            return True
+        return any(
+            campo in estadisticas.VALORES_RESERVA or f'{campo}_id' in estadisticas.VALORES_RESERVA
+            for campo in update_fields
+        )
 
-    def save(self, *args, **kwargs):
-        if self.pk:
-            self.monto = self.calcular_total(incluir_servicios=True)
-        else:
-            self.monto = self.calcular_total(incluir_servicios=False)
 
-        super().save(*args, **kwargs)
+@receiver(post_delete, sender=Reserva)
+def liberar_inventario_reserva(sender, instance, **kwargs):
+    """Al eliminar una reserva se liberan las noches que ocupaba."""
+    inventario.liberar(instance)
+    estadisticas.registrar_borrado(instance)
+
+
+@receiver([post_save, post_delete], sender=TipoHabitacion)
+@receiver([post_save, post_delete], sender=Servicio)
+@receiver([post_save, post_delete], sender=Plan)
+@receiver([post_save, post_delete], sender=Promocion)
+def limpiar_cotizaciones(sender, **kwargs):
+    """Un cambio de precio, servicio, plan o promoción invalida las cotizaciones."""
+    pricing.limpiar_cache()
+
+
+@receiver(tarifas.tarifas_regeneradas)
+def limpiar_cotizaciones_tarifas(sender, **kwargs):
+    """La grilla de tarifas cambió: los totales de estadía memorizados ya no valen."""
+    pricing.limpiar_cache()
+
+
+@receiver([post_save, post_delete], sender=Reserva)
+def invalidar_reportes_reserva(sender, instance, **kwargs):
+    """
+    Una reserva creada, editada o eliminada deja obsoletos los reportes de sus
+    meses; al editar las fechas, también los de las fechas que tenía antes.
+    """
+    meses = reportes.meses_afectados(instance.check_in, instance.check_out)
+    # Todavía con los valores leídos de la base: save() los renueva después de post_save
+    originales = instance.__dict__.get('_originales', {})
+    if 'check_in' in originales:
+        meses |= reportes.meses_afectados(originales['check_in'], originales.get('check_out'))
+    reportes.invalidar(meses)
+
+
+@receiver(transiciones.reservas_transicionadas)
+def invalidar_reportes_transicion(sender, cambios, **kwargs):
+    meses = set()
+    for cambio in cambios:
+        meses |= reportes.meses_afectados(cambio.check_in, cambio.check_out)
+    reportes.invalidar(meses)
+
+
+@receiver(transiciones.reservas_transicionadas)
+def actualizar_estadisticas_transicion(sender, cambios, **kwargs):
+    """Las transiciones son UPDATE masivos: mueven los contadores de estado de DailyStats."""
+    estadisticas.registrar_transiciones(cambios)
+    tablero.invalidar()
+
+
+class DailyStats(models.Model):
+    """
+    Resumen diario de reservas por tipo de habitación, para los dashboards.
+    `fecha` es el día en que se hizo la reserva; se mantiene en forma
+    incremental (ver reservas/estadisticas.py) y `rebuild_stats` la recalcula.
+    """
+    fecha = models.DateField()
+    tipo_habitacion = models.ForeignKey(TipoHabitacion, on_delete=models.CASCADE, related_name='estadisticas')
+    creadas = models.IntegerField(default=0)
+    pendientes = models.IntegerField(default=0)
+    confirmadas = models.IntegerField(default=0)
+    activas = models.IntegerField(default=0)
+    completadas = models.IntegerField(default=0)
+    canceladas = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    noches = models.IntegerField(default=0, help_text="Noches de habitación reservadas")
+
+    class Meta:
+        ordering = ['-fecha']
+        unique_together = ('fecha', 'tipo_habitacion')
+        verbose_name = "Estadística diaria"
+        verbose_name_plural = "Estadísticas diarias"
+
+    def __str__(self):
+        return f"{self.fecha} - {self.tipo_habitacion.nombre}"
+
+
+class GrupoReserva(models.Model):
+    """
+    Reserva de varios tipos de habitación para las mismas fechas: una Reserva
+    hija por tipo. Se crean y se confirman juntas, todo o nada. Los huéspedes
+    se cargan una sola vez, en la reserva principal (la primera del grupo).
+    """
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='grupos_reserva')
+    check_in = models.DateField()
+    check_out = models.DateField()
+    cantidad_huespedes = models.PositiveIntegerField(default=1)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-fecha_creacion']
+        verbose_name = "Reserva grupal"
+        verbose_name_plural = "Reservas grupales"
+
+    def __str__(self):
+        return f"Grupo {self.pk} de {self.usuario.username} ({self.check_in} - {self.check_out})"
+
+    @classmethod
+    @transaction.atomic
+    def crear(cls, usuario, check_in, check_out, cantidad_huespedes, seleccion):
+        """
+        Crea el grupo y sus reservas pendientes, una por (tipo, cantidad) de
+        `seleccion`, reteniendo las noches de todos los tipos en la misma
+        transacción. Lanza ValidationError (sin crear nada) si algún tipo ya no
+        tiene lugar. Devuelve (grupo, reservas); la principal es reservas[0].
+        """
+        grupo = cls.objects.create(
+            usuario=usuario, check_in=check_in, check_out=check_out, cantidad_huespedes=cantidad_huespedes,
+        )
+        reservas = []
+        por_tipo = {}
+        for tipo, cantidad in seleccion:
+            reserva = Reserva(
+                grupo=grupo,
+                usuario=usuario,
+                tipo_habitacion=tipo,
+                cantidad_habitaciones=cantidad,
+                check_in=check_in,
+                check_out=check_out,
+                cantidad_huespedes=cantidad_huespedes,
+                estado='pendiente',
+                token=get_random_string(64),
+            )
+            reserva.monto = reserva.calcular_total(incluir_servicios=False)
+            reservas.append(reserva)
+            por_tipo[tipo.pk] = (tipo, por_tipo.get(tipo.pk, (tipo, 0))[1] + cantidad)
+
+        # bulk_create no pasa por save(): las retenciones se registran aquí, una por tipo
+        for tipo, cantidad in por_tipo.values():
+            inventario.ocupar(tipo, check_in, check_out, 'retenidas', cantidad)
+        Reserva.objects.bulk_create(reservas)
+        reportes.invalidar(reportes.meses_afectados(check_in, check_out))
+        estadisticas.registrar_creadas(reservas)
+        tablero.invalidar()
+        if reservas[0].pk is None:
+            # Backends sin RETURNING en inserciones masivas
+            reservas = list(grupo.reservas.order_by('id'))
+        return grupo, reservas
+
+    def confirmar(self, metodo_pago=None):
+        """
+        Confirma todas las reservas pendientes del grupo (stock en un UPDATE por
+        tipo). Si alguna no puede confirmarse no se confirma ninguna.
+        """
+        with transaction.atomic():
+            resultado = transiciones.transicionar_lote(self.reservas.filter(estado='pendiente'), 'confirmar')
+            if any(r != transiciones.OK for r in resultado.values()):
+                transaction.set_rollback(True)
+                return False
+            if metodo_pago:
+                self.reservas.update(metodo_pago=metodo_pago)
+        return True
+
 
 class Huesped(models.Model):
     nombre = models.CharField(max_length=100)
@@ -190,11 +368,20 @@ class Huesped(models.Model):
     edad = models.PositiveIntegerField()
     genero = models.CharField(max_length=10, choices=[('M','Masculino'), ('F','Femenino'), ('O','Otro')])
     dni = models.CharField(max_length=20)
+    dni_normalizado = models.CharField(max_length=20, blank=True, db_index=True, editable=False)
+    padron = models.ForeignKey(AdminHuesped, on_delete=models.SET_NULL, null=True, blank=True, related_name='estadias',
+                               help_text="Huésped del padrón de administración con el mismo DNI")
     reserva = models.ForeignKey('Reserva', on_delete=models.CASCADE, related_name='huespedes')
 
     def __str__(self):
         return f"{self.nombre} {self.apellido}"
 
+    def save(self, *args, **kwargs):
+        self.dni_normalizado = normalizar_dni(self.dni)
+        if self.padron_id is None and self.dni_normalizado:
+            self.padron = AdminHuesped.objects.filter(dni_normalizado=self.dni_normalizado).first()
+        super().save(*args, **kwargs)
+
 class HuespedActivo(models.Model):
     """
     Representa a un huésped que está actualmente en el hotel.
@@ -217,3 +404,22 @@ class HuespedActivo(models.Model):
 
     def __str__(self):
         return f"{self.huesped} — Hab: {self.habitacion or '-'}"
+
+
+@receiver(post_save, sender=AdminHuesped)
+def vincular_estadias_huesped(sender, instance, **kwargs):
+    """Un huésped nuevo (o con DNI corregido) en el padrón se vincula a sus estadías sin vincular."""
+    if instance.dni_normalizado:
+        Huesped.objects.filter(padron__isnull=True, dni_normalizado=instance.dni_normalizado).update(padron=instance)
+
+
+@receiver([post_save, post_delete], sender=Reserva)
+@receiver([post_save, post_delete], sender=Habitacion)
+@receiver([post_save, post_delete], sender=HuespedActivo)
+@receiver([post_save, post_delete], sender=User)
+def invalidar_dashboard(sender, **kwargs):
+    """Cambian los números del dashboard de administración (ver administracion/tablero.py)."""
+    if kwargs.get('update_fields') == frozenset({'last_login'}):
+        # Cada inicio de sesión guarda last_login: no afecta al dashboard
+        return
+    tablero.invalidar()
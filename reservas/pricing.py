@@ -0,0 +1,223 @@
+"""
+Motor de precios de las reservas.
+
+`quote()` es la única fórmula de precio del sitio:
+
+    habitación (tarifa de cada noche x cantidad) + servicios + plan
+    - descuento de la promoción (porcentaje sobre lo anterior)
+    + impuestos (TASA_IMPUESTOS sobre el neto)
+
+Recibe objetos ya cargados y no hace consultas. Las cotizaciones se memorizan
+en cada proceso por (tipo, noches, cantidad, servicios, plan, promoción); la
+clave incluye los precios usados. También se memoriza el precio de las noches
+de cada estadía según la grilla de tarifas. La memoria vale para una versión guardada en
+la caché de Django (como administracion.tablero): las señales de
+reservas.models llaman a `limpiar_cache`, que la cambia al confirmarse la
+transacción, y así cada proceso descarta lo que tenía memorizado.
+"""
+import uuid
+from collections import namedtuple
+from datetime import date
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+
+from habitaciones import tarifas
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+TASA_IMPUESTOS = Decimal('0.18')
+
+_ORDINAL_EPOCH = date(1970, 1, 1).toordinal()
+
+# Máximo de cotizaciones memorizadas antes de vaciar la caché
+MAX_COTIZACIONES = 10000
+CLAVE_VERSION = 'cotizaciones:version'
+
+Cotizacion = namedtuple('Cotizacion', [
+    'noches', 'habitacion', 'servicios', 'plan', 'descuento', 'subtotal', 'impuestos', 'total',
+])
+
+_cotizaciones = {}
+_version = None
+
+
+def noches_de(check_in, check_out):
+    """Noches cobradas de una estadía (mínimo 1, también sin fechas)."""
+    if check_in and check_out:
+        try:
+            return max((check_out - check_in).days, 1)
+        except Exception:
+            return 1
+    return 1
+
+
+def quote(tipo_habitacion, noches=1, cantidad=1, servicios=(), plan=None, promocion=None, precio_noches=None):
+    """
+    Cotización desglosada (Cotizacion) para los objetos indicados.
+    `precio_noches` es lo que cuestan las noches de una habitación según la
+    grilla de tarifas; sin él se usa el precio base del tipo por noche.
+    """
+    servicios = tuple(servicios)
+    clave = (
+        tipo_habitacion.pk if tipo_habitacion else None,
+        tipo_habitacion.precio if tipo_habitacion else None,
+        noches,
+        precio_noches,
+        cantidad,
+        frozenset((s.pk, s.precio) for s in servicios),
+        (plan.pk, plan.precio) if plan else None,
+        (promocion.pk, promocion.descuento) if promocion else None,
+    )
+    memoria = _memoria()
+    cotizacion = memoria.get(clave)
+    if cotizacion is None:
+        cotizacion = _calcular(tipo_habitacion, noches, cantidad, servicios, plan, promocion, precio_noches)
+        if len(memoria) >= MAX_COTIZACIONES:
+            memoria.clear()
+        memoria[clave] = cotizacion
+    return cotizacion
+
+
+def _memoria():
+    """Las cotizaciones memorizadas en este proceso, vacías si cambió la versión compartida."""
+    global _version
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(CLAVE_VERSION, version, None):
+            version = cache.get(CLAVE_VERSION, version)
+    if version != _version:
+        _cotizaciones.clear()
+        _version = version
+    return _cotizaciones
+
+
+def _calcular(tipo_habitacion, noches, cantidad, servicios, plan, promocion, precio_noches):
+    precio_habitacion = Decimal('0')
+    if precio_noches is not None:
+        precio_habitacion = precio_noches * cantidad
+    elif tipo_habitacion:
+        precio_habitacion = tipo_habitacion.precio * cantidad * noches
+    precio_servicios = sum((Decimal(s.precio) for s in servicios), Decimal('0'))
+    precio_plan = plan.precio if plan else Decimal('0')
+
+    subtotal = precio_habitacion + precio_servicios + precio_plan
+    descuento = Decimal('0')
+    if promocion:
+        descuento = (subtotal * promocion.descuento) / 100
+        subtotal -= descuento
+
+    impuestos = subtotal * TASA_IMPUESTOS
+    return Cotizacion(
+        noches=noches,
+        habitacion=precio_habitacion,
+        servicios=precio_servicios,
+        plan=precio_plan,
+        descuento=descuento,
+        subtotal=subtotal,
+        impuestos=impuestos,
+        total=subtotal + impuestos,
+    )
+
+
+def cotizar_reserva(reserva, incluir_servicios=True):
+    """
+    Cotiza una reserva. Con fechas lee dos filas de la grilla de tarifas, sólo
+    la primera vez para cada (tipo, check_in, check_out); para no generar más
+    consultas, cargar antes tipo_habitacion, plan y promocion (select_related)
+    y servicios (prefetch_related).
+    """
+    servicios = reserva.servicios.all() if incluir_servicios and reserva.pk else ()
+    precio_noches = None
+    if reserva.check_in and reserva.check_out:
+        precio_noches = _total_estadia(reserva.tipo_habitacion, reserva.check_in, reserva.check_out)
+    return quote(
+        reserva.tipo_habitacion,
+        noches=noches_de(reserva.check_in, reserva.check_out),
+        precio_noches=precio_noches,
+        cantidad=reserva.cantidad_habitaciones,
+        servicios=servicios,
+        plan=reserva.plan,
+        promocion=reserva.promocion,
+    )
+
+
+def _total_estadia(tipo_habitacion, check_in, check_out):
+    """tarifas.total_estadia memorizado; la señal tarifas_regeneradas cambia la versión."""
+    memoria = _memoria()
+    clave = ('estadia', tipo_habitacion.pk, check_in, check_out)
+    total = memoria.get(clave)
+    if total is None:
+        total = tarifas.total_estadia(tipo_habitacion, check_in, check_out)
+        if len(memoria) >= MAX_COTIZACIONES:
+            memoria.clear()
+        memoria[clave] = total
+    return total
+
+
+def quote_batch(tipos, check_ins, check_outs, cantidades):
+    """
+    Cotiza muchas estadías a la vez (sólo habitación + impuestos, como la
+    búsqueda pública y el chatbot). Recibe secuencias paralelas de tipos
+    (instancias o IDs), fechas de entrada/salida y cantidades, y devuelve un
+    array de NumPy con los totales en centavos (int64), redondeados como
+    Reserva.calcular_total() al centavo (ROUND_HALF_UP).
+    Los precios por noche salen de la grilla de tarifas (una consulta para
+    todo el lote) y el total de cada estadía, de sus sumas acumuladas.
+    """
+    if np is None:
+        raise ImproperlyConfigured('quote_batch requiere numpy (ver requirements.txt)')
+
+    tipos = list(tipos)
+    if not tipos:
+        return np.zeros(0, dtype=np.int64)
+    if hasattr(tipos[0], 'precio'):
+        ids = [t.pk for t in tipos]
+        por_id = {t.pk: t for t in tipos}
+    else:
+        from habitaciones.models import TipoHabitacion
+
+        ids = [int(t) for t in tipos]
+        por_id = TipoHabitacion.objects.in_bulk(set(ids))
+
+    unicos, indice = np.unique(np.asarray(ids, dtype=np.int64), return_inverse=True)
+    entradas = _dias(check_ins)
+    salidas = np.maximum(_dias(check_outs), entradas + 1)  # como rango_cobrado()
+    primer_dia = int(entradas.min())
+    desde, hasta = date.fromordinal(primer_dia), date.fromordinal(int(salidas.max()))
+
+    precios = tarifas.precios_por_noche([por_id[int(pk)] for pk in unicos], desde, hasta)
+    centavos = np.array([[int(p * 100) for p in precios[int(pk)]] for pk in unicos], dtype=np.int64)
+    acumulados = np.zeros((len(unicos), centavos.shape[1] + 1), dtype=np.int64)
+    np.cumsum(centavos, axis=1, out=acumulados[:, 1:])
+
+    noches = acumulados[indice, salidas - primer_dia] - acumulados[indice, entradas - primer_dia]
+    base = noches * np.asarray(cantidades, dtype=np.int64)
+
+    # total = base * (1 + TASA_IMPUESTOS), en aritmética entera exacta
+    tasa = int((1 + TASA_IMPUESTOS) * 10000)
+    return (base * tasa + 5000) // 10000
+
+
+def _dias(fechas):
+    """Fechas (date o datetime64) como ordinal de día (date.toordinal())."""
+    if isinstance(fechas, np.ndarray):
+        return fechas.astype('datetime64[D]').astype(np.int64) + _ORDINAL_EPOCH
+    fechas = list(fechas)
+    return np.fromiter((f.toordinal() for f in fechas), dtype=np.int64, count=len(fechas))
+
+
+def limpiar_cache():
+    """
+    Descarta las cotizaciones memorizadas: ya en este proceso y, al confirmarse
+    la transacción en curso, en todos (cambia la versión compartida).
+    """
+    _cotizaciones.clear()
+    transaction.on_commit(lambda: cache.set(CLAVE_VERSION, uuid.uuid4().hex, None))
@@ -1,3 +1,468 @@
+import io
+import random
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from administracion import reportes
+from administracion.models import Huesped as AdminHuesped, TrabajoReporte
+from habitaciones import inventario
+from habitaciones.models import Habitacion, InventarioNoche, ReglaTarifa, TipoHabitacion
+from . import analitica, availability, pricing, transiciones
+from .huespedes import ResultadoRegistro, registrar_huespedes
+from .models import GrupoReserva, Huesped, Reserva
+
+
+class InventarioReservaTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('titular', 'titular@example.com', 'clave-segura-123')
+        self.tipo = TipoHabitacion.objects.create(nombre='Doble', precio=100, stock_total=2, stock_disponible=2)
+        self.hoy = timezone.localdate()
+
+    def noches(self, campo):
+        filas = InventarioNoche.objects.filter(tipo_habitacion=self.tipo, **{f'{campo}__gt': 0})
+        return [(fecha - self.hoy).days for fecha in filas.order_by('fecha').values_list('fecha', flat=True)]
+
+    def test_huella_de_completada_no_depende_del_dia(self):
+        reserva = Reserva.objects.create(
+            usuario=self.usuario, tipo_habitacion=self.tipo,
+            check_in=self.hoy - timedelta(days=2), check_out=self.hoy + timedelta(days=3),
+        )
+        reserva.confirmar()
+        reserva.activar()
+        reserva.completar()
+        self.assertEqual(reserva.fecha_salida, self.hoy)
+        self.assertEqual(self.noches('vendidas'), [-2, -1])
+
+        with mock.patch('django.utils.timezone.localdate', return_value=self.hoy + timedelta(days=10)):
+            inventario.reconstruir()
+            self.assertEqual(self.noches('vendidas'), [-2, -1])
+            Reserva.objects.get(pk=reserva.pk).delete()
+        self.assertEqual(self.noches('vendidas'), [])
+
+    def test_editar_fechas_mueve_la_huella(self):
+        reserva = Reserva.objects.create(
+            usuario=self.usuario, tipo_habitacion=self.tipo,
+            check_in=self.hoy + timedelta(days=5), check_out=self.hoy + timedelta(days=7),
+        )
+        reserva = Reserva.objects.get(pk=reserva.pk)
+        reserva.check_in = self.hoy + timedelta(days=6)
+        reserva.check_out = self.hoy + timedelta(days=9)
+        reserva.save()
+        self.assertEqual(self.noches('retenidas'), [6, 7, 8])
+
+    def test_mover_fechas_invalida_los_reportes_de_ambos_meses(self):
+        antes = reportes.mes_siguiente(reportes.mes(self.hoy))
+        despues = reportes.mes_siguiente(reportes.mes_siguiente(antes))
+        reserva = Reserva.objects.create(
+            usuario=self.usuario, tipo_habitacion=self.tipo, check_in=antes, check_out=antes + timedelta(days=2),
+        )
+        for periodo in (antes, despues):
+            TrabajoReporte.objects.create(tipo='ocupacion', periodo=periodo, estado='listo')
+
+        reserva = Reserva.objects.get(pk=reserva.pk)
+        reserva.check_in, reserva.check_out = despues, despues + timedelta(days=2)
+        reserva.save()
+        self.assertFalse(TrabajoReporte.objects.filter(obsoleto=False).exists())
+
+    def test_reserva_creada_confirmada_descuenta_stock(self):
+        # Como las crea el chatbot: nacen confirmadas, sin pasar por confirmar()
+        reserva = Reserva.objects.create(
+            usuario=self.usuario, tipo_habitacion=self.tipo, estado='confirmada',
+            check_in=self.hoy + timedelta(days=1), check_out=self.hoy + timedelta(days=3),
+        )
+        self.tipo.refresh_from_db()
+        self.assertEqual(self.tipo.stock_disponible, 1)
+        self.assertEqual(self.noches('vendidas'), [1, 2])
+
+        self.assertTrue(reserva.cancelar())
+        self.tipo.refresh_from_db()
+        self.assertEqual(self.tipo.stock_disponible, 2)
+        self.assertEqual(self.noches('vendidas'), [])
+
+    def test_reserva_confirmada_sin_stock_no_se_crea(self):
+        TipoHabitacion.objects.filter(pk=self.tipo.pk).update(stock_disponible=0)
+        with self.assertRaises(ValidationError):
+            Reserva.objects.create(
+                usuario=self.usuario, tipo_habitacion=self.tipo, estado='confirmada',
+                check_in=self.hoy + timedelta(days=1), check_out=self.hoy + timedelta(days=3),
+            )
+        self.assertFalse(Reserva.objects.exists())
+        self.assertEqual(self.noches('vendidas'), [])
+
+    def test_reenviar_confirmacion_no_revierte_una_confirmada(self):
+        reserva = Reserva.objects.create(
+            usuario=self.usuario, tipo_habitacion=self.tipo,
+            check_in=self.hoy + timedelta(days=1), check_out=self.hoy + timedelta(days=3),
+        )
+        reserva.confirmar()
+        self.client.force_login(self.usuario)
+        respuesta = self.client.post(
+            reverse('reservas:confirmar_reserva', args=[reserva.pk]), {'metodo_pago': 'efectivo'}, secure=True,
+        )
+        self.assertRedirects(respuesta, reverse('reservas:mis_reservas'), fetch_redirect_response=False)
+        reserva.refresh_from_db()
+        self.tipo.refresh_from_db()
+        self.assertEqual(reserva.estado, 'confirmada')
+        self.assertEqual(self.tipo.stock_disponible, 1)
+        self.assertEqual(self.noches('vendidas'), [1, 2])
+
+
+class TransicionesTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('titular', 'titular@example.com', 'clave-segura-123')
+        self.tipo = TipoHabitacion.objects.create(nombre='Doble', precio=100, stock_total=3, stock_disponible=3)
+        self.hoy = timezone.localdate()
+
+    def reservar(self, tipo=None, desde=1, hasta=3, **campos):
+        return Reserva.objects.create(
+            usuario=self.usuario, tipo_habitacion=tipo or self.tipo,
+            check_in=self.hoy + timedelta(days=desde), check_out=self.hoy + timedelta(days=hasta), **campos
+        )
+
+    def estado_tipo(self, tipo=None):
+        tipo = tipo or self.tipo
+        filas = InventarioNoche.objects.filter(tipo_habitacion=tipo).order_by('fecha')
+        return (
+            TipoHabitacion.objects.get(pk=tipo.pk).stock_disponible,
+            [((f - self.hoy).days, r, v) for f, r, v in filas.values_list('fecha', 'retenidas', 'vendidas') if r or v],
+        )
+
+    def test_confirmar_y_cancelar_devuelve_stock_e_inventario(self):
+        inicial = self.estado_tipo()
+        reserva = self.reservar(cantidad_habitaciones=2)
+        self.assertTrue(reserva.confirmar())
+        self.assertEqual(self.estado_tipo(), (1, [(1, 0, 2), (2, 0, 2)]))
+        self.assertTrue(reserva.cancelar())
+        self.assertEqual(self.estado_tipo(), inicial)
+
+    def test_activar_y_completar_devuelve_stock_e_inventario(self):
+        inicial = self.estado_tipo()
+        reserva = self.reservar(desde=0, hasta=2)
+        self.assertTrue(reserva.confirmar())
+        self.assertTrue(reserva.activar())
+        self.assertEqual(self.estado_tipo(), (2, [(0, 0, 1), (1, 0, 1)]))
+        # Sale el mismo día que entró: la huella de la completada queda vacía
+        self.assertTrue(reserva.completar())
+        self.assertEqual(self.estado_tipo(), inicial)
+
+    def test_segunda_transicion_sobre_la_misma_fila_pierde(self):
+        reserva = self.reservar()
+        copia = Reserva.objects.get(pk=reserva.pk)
+        self.assertTrue(reserva.confirmar())
+        # `copia` todavía cree que la reserva está pendiente
+        self.assertFalse(copia.confirmar())
+        self.assertFalse(copia.cancelar())
+        self.assertEqual(copia.estado, 'pendiente')
+        self.assertEqual(Reserva.objects.get(pk=reserva.pk).estado, 'confirmada')
+        self.assertEqual(self.estado_tipo(), (2, [(1, 0, 1), (2, 0, 1)]))
+
+    def test_senal_reservas_transicionadas(self):
+        recibidos = []
+
+        def receptor(sender, cambios, **kwargs):
+            recibidos.append(cambios)
+
+        transiciones.reservas_transicionadas.connect(receptor)
+        self.addCleanup(transiciones.reservas_transicionadas.disconnect, receptor)
+        reserva = self.reservar()
+        otra = self.reservar(desde=4, hasta=5)
+        reserva.confirmar()
+        transiciones.transicionar_lote([reserva.pk, otra.pk], 'cancelar')
+
+        self.assertEqual(len(recibidos), 2)
+        self.assertEqual(recibidos[0], [transiciones.CambioEstado(
+            reserva.pk, self.tipo.pk, reserva.fecha_reserva, reserva.check_in, reserva.check_out, 1,
+            'pendiente', 'confirmada',
+        )])
+        self.assertEqual(
+            sorted((c.reserva_id, c.anterior, c.nuevo) for c in recibidos[1]),
+            [(reserva.pk, 'confirmada', 'cancelada'), (otra.pk, 'pendiente', 'cancelada')],
+        )
+
+    def test_lote_grande_equivale_a_una_por_una(self):
+        cantidad = transiciones.TAMANO_LOTE + 25
+        en_lote = TipoHabitacion.objects.create(nombre='Lote', precio=100, stock_total=2000, stock_disponible=2000)
+        una_a_una = TipoHabitacion.objects.create(nombre='Una', precio=100, stock_total=2000, stock_disponible=2000)
+        for tipo in (en_lote, una_a_una):
+            Reserva.objects.bulk_create([
+                Reserva(
+                    usuario=self.usuario, tipo_habitacion=tipo, cantidad_habitaciones=1 + i % 3,
+                    check_in=self.hoy + timedelta(days=i % 20), check_out=self.hoy + timedelta(days=i % 20 + 1 + i % 4),
+                )
+                for i in range(cantidad)
+            ])
+        inventario.reconstruir()
+
+        resultado = transiciones.transicionar_lote(Reserva.objects.filter(tipo_habitacion=en_lote), 'confirmar')
+        self.assertEqual(set(resultado.values()), {transiciones.OK})
+        for reserva in Reserva.objects.filter(tipo_habitacion=una_a_una).select_related('tipo_habitacion'):
+            self.assertTrue(reserva.confirmar())
+
+        self.assertEqual(self.estado_tipo(en_lote), self.estado_tipo(una_a_una))
+        esperado = self.estado_tipo(en_lote)
+        inventario.reconstruir()
+        self.assertEqual(self.estado_tipo(en_lote), esperado)
+
+
+class CotizacionesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tipo = TipoHabitacion.objects.create(nombre='Doble', precio=100, stock_total=3, stock_disponible=3)
+
+    def test_cambio_de_version_descarta_la_memoria_del_proceso(self):
+        pricing.quote(self.tipo, noches=2)
+        self.assertTrue(pricing._cotizaciones)
+        # Otro proceso invalidó las cotizaciones (p. ej. guardó un Servicio)
+        cache.set(pricing.CLAVE_VERSION, 'de-otro-proceso', None)
+        pricing.quote(self.tipo, noches=3)
+        self.assertEqual(len(pricing._cotizaciones), 1)
+
+    def test_limpiar_cache_cambia_la_version_al_confirmar(self):
+        pricing.quote(self.tipo)
+        version = cache.get(pricing.CLAVE_VERSION)
+        with self.captureOnCommitCallbacks(execute=True):
+            pricing.limpiar_cache()
+            self.assertEqual(cache.get(pricing.CLAVE_VERSION), version)
+        self.assertNotEqual(cache.get(pricing.CLAVE_VERSION), version)
+
+    def test_total_de_la_estadia_se_lee_una_vez_de_la_grilla(self):
+        usuario = User.objects.create_user('titular', 'titular@example.com', 'clave-segura-123')
+        manana = timezone.localdate() + timedelta(days=1)
+        reserva = Reserva.objects.create(
+            usuario=usuario, tipo_habitacion=self.tipo, check_in=manana, check_out=manana + timedelta(days=2),
+        )
+        reserva = Reserva.objects.select_related('tipo_habitacion', 'plan', 'promocion').prefetch_related(
+            'servicios').get(pk=reserva.pk)
+        cache.clear()
+        with self.assertNumQueries(1):
+            pricing.cotizar_reserva(reserva)
+        with self.assertNumQueries(0):
+            self.assertEqual(pricing.cotizar_reserva(reserva).total, Decimal('236.00'))
+
+        # Regenerar la grilla descarta el total memorizado
+        with self.captureOnCommitCallbacks(execute=True):
+            ReglaTarifa.objects.create(tipo_habitacion=self.tipo, nombre='Fijo', precio=Decimal('150.00'))
+        self.assertEqual(pricing.cotizar_reserva(reserva).total, Decimal('354.00'))
+
+    def test_quote_batch_coincide_con_calcular_total(self):
+        azar = random.Random(7)
+        hoy = timezone.localdate()
+        # Precios que dejan medio centavo al sumar impuestos (0.25 * 1.18 = 0.295)
+        tipos = [self.tipo] + [
+            TipoHabitacion.objects.create(nombre=nombre, precio=Decimal(precio), stock_total=3, stock_disponible=3)
+            for nombre, precio in (('Simple', '0.25'), ('Suite', '33.33'), ('Familiar', '99.99'))
+        ]
+        for tipo in tipos[1:]:
+            ReglaTarifa.objects.create(tipo_habitacion=tipo, nombre='Fin de semana', clase='dia_semana',
+                                       dias_semana='4,5', porcentaje=Decimal('12.5'))
+            ReglaTarifa.objects.create(tipo_habitacion=tipo, nombre='Promoción', clase='especial',
+                                       fecha_inicio=hoy + timedelta(days=20), fecha_fin=hoy + timedelta(days=40),
+                                       porcentaje=Decimal('-15'))
+        ReglaTarifa.objects.create(tipo_habitacion=tipos[2], nombre='Temporada', fecha_inicio=hoy + timedelta(days=60),
+                                   precio=Decimal('47.07'))
+
+        estadias = []
+        for _ in range(300):
+            check_in = hoy + timedelta(days=azar.randint(0, 370))  # algunas salen de la grilla
+            estadias.append((azar.choice(tipos), check_in, check_in + timedelta(days=azar.randint(0, 14)),
+                             azar.randint(1, 4)))
+        totales = pricing.quote_batch(*zip(*estadias))
+
+        for (tipo, check_in, check_out, cantidad), total in zip(estadias, totales):
+            esperado = Reserva(
+                tipo_habitacion=tipo, check_in=check_in, check_out=check_out, cantidad_habitaciones=cantidad,
+            ).calcular_total()
+            self.assertEqual(
+                esperado.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP), Decimal(int(total)) / 100,
+                (tipo.nombre, check_in, check_out, cantidad),
+            )
+
+
+class DisponibilidadTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('titular', 'titular@example.com', 'clave-segura-123')
+        self.doble = TipoHabitacion.objects.create(nombre='Doble', precio=100, capacidad=2, stock_total=2, stock_disponible=2)
+        self.suite = TipoHabitacion.objects.create(nombre='Suite', precio=300, capacidad=4, stock_total=1, stock_disponible=1)
+        TipoHabitacion.objects.create(nombre='Simple', precio=50, capacidad=1, stock_total=3, stock_disponible=3)
+        self.d1 = Habitacion.objects.create(numero='101', tipo_habitacion=self.doble)
+        self.d2 = Habitacion.objects.create(numero='102', tipo_habitacion=self.doble)
+        Habitacion.objects.create(numero='103', tipo_habitacion=self.doble, en_mantenimiento=True)
+        self.s1 = Habitacion.objects.create(numero='201', tipo_habitacion=self.suite)
+        self.desde = timezone.localdate() + timedelta(days=10)
+        self.hasta = self.desde + timedelta(days=3)
+
+    def test_unidades_y_habitaciones_libres_en_tres_consultas(self):
+        reserva = Reserva.objects.create(
+            usuario=self.usuario, tipo_habitacion=self.doble, habitacion_asignada=self.d1,
+            check_in=self.desde + timedelta(days=2), check_out=self.hasta + timedelta(days=2),
+        )
+        reserva.confirmar()
+        # Suite agotada sólo la primera noche: no está libre en todo el rango
+        Reserva.objects.create(
+            usuario=self.usuario, tipo_habitacion=self.suite,
+            check_in=self.desde - timedelta(days=1), check_out=self.desde + timedelta(days=1),
+        )
+
+        with self.assertNumQueries(3):
+            resultado = availability.consultar(self.desde, self.hasta, capacidad_min=2)
+        self.assertEqual([t.nombre for t in resultado.tipos], ['Doble'])
+        self.assertEqual(resultado.unidades, {self.doble.pk: 1})
+        self.assertEqual([h.numero for h in resultado.habitaciones], ['102'])
+
+    def test_estadia_sin_reservas(self):
+        resultado = availability.consultar(self.desde, self.hasta, capacidad_min=2, tipos=['suite'])
+        self.assertEqual(resultado.unidades, {self.suite.pk: 1})
+        self.assertEqual(resultado.habitaciones, [self.s1])
+
+
+class GrupoReservaTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('titular', 'titular@example.com', 'clave-segura-123')
+        self.doble = TipoHabitacion.objects.create(nombre='Doble', precio=100, stock_total=2, stock_disponible=2)
+        self.suite = TipoHabitacion.objects.create(nombre='Suite', precio=300, stock_total=1, stock_disponible=1)
+        self.desde = timezone.localdate() + timedelta(days=5)
+        self.hasta = self.desde + timedelta(days=2)
+
+    def crear(self, seleccion):
+        return GrupoReserva.crear(self.usuario, self.desde, self.hasta, 3, seleccion)
+
+    def ocupadas(self):
+        return list(InventarioNoche.objects.filter(retenidas__gt=0).order_by('tipo_habitacion', 'fecha').values_list(
+            'tipo_habitacion__nombre', 'retenidas'))
+
+    def test_crear_retiene_todos_los_tipos(self):
+        grupo, reservas = self.crear([(self.doble, 2), (self.suite, 1)])
+        self.assertEqual([(r.tipo_habitacion, r.cantidad_habitaciones) for r in reservas], [(self.doble, 2), (self.suite, 1)])
+        self.assertEqual(grupo.reservas.count(), 2)
+        self.assertEqual(self.ocupadas(), [('Doble', 2), ('Doble', 2), ('Suite', 1), ('Suite', 1)])
+
+    def test_crear_sin_lugar_no_crea_nada(self):
+        with self.assertRaises(ValidationError):
+            self.crear([(self.doble, 1), (self.suite, 2)])
+        self.assertFalse(GrupoReserva.objects.exists())
+        self.assertFalse(Reserva.objects.exists())
+        self.assertEqual(self.ocupadas(), [])
+
+    def test_confirmar_es_todo_o_nada(self):
+        grupo, reservas = self.crear([(self.doble, 1), (self.suite, 1)])
+        TipoHabitacion.objects.filter(pk=self.suite.pk).update(stock_disponible=0)
+        self.assertFalse(grupo.confirmar(metodo_pago='efectivo'))
+        self.assertEqual(set(grupo.reservas.values_list('estado', flat=True)), {'pendiente'})
+        self.assertEqual(TipoHabitacion.objects.get(pk=self.doble.pk).stock_disponible, 2)
+
+        TipoHabitacion.objects.filter(pk=self.suite.pk).update(stock_disponible=1)
+        self.assertTrue(grupo.confirmar(metodo_pago='efectivo'))
+        self.assertEqual(set(grupo.reservas.values_list('estado', 'metodo_pago')), {('confirmada', 'efectivo')})
+        self.assertEqual(TipoHabitacion.objects.get(pk=self.doble.pk).stock_disponible, 1)
+
+
+class RegistroHuespedesTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('titular', 'titular@example.com', 'clave-segura-123')
+        self.tipo = TipoHabitacion.objects.create(nombre='Doble', precio=100, stock_total=5, stock_disponible=5)
+
+    def reserva(self):
+        hoy = timezone.localdate()
+        return Reserva.objects.create(usuario=self.usuario, tipo_habitacion=self.tipo,
+                                      check_in=hoy + timedelta(days=1), check_out=hoy + timedelta(days=2))
+
+    def huespedes(self, cantidad, inicio=0, apellido='Pérez'):
+        return [{'nombre': f'Huésped {i}', 'apellido': apellido, 'edad': 30, 'genero': 'O', 'dni': f'{40000000 + i}'}
+                for i in range(inicio, inicio + cantidad)]
+
+    def test_consultas_no_dependen_de_la_cantidad(self):
+        consultas = []
+        for inicio, cantidad in ((0, 3), (100, 40)):
+            reserva = self.reserva()
+            with CaptureQueriesContext(connection) as capturadas:
+                registrar_huespedes(reserva, self.huespedes(cantidad, inicio))
+            consultas.append(len(capturadas))
+        self.assertEqual(consultas[0], consultas[1])
+        self.assertEqual(AdminHuesped.objects.count(), 43)
+
+    def test_volver_a_cargar_actualiza(self):
+        reserva = self.reserva()
+        self.assertEqual(registrar_huespedes(reserva, self.huespedes(4)), ResultadoRegistro(4, 0, 4, 0))
+        self.assertEqual(registrar_huespedes(reserva, self.huespedes(4, apellido='Gómez')), ResultadoRegistro(0, 4, 0, 4))
+        self.assertEqual(set(Huesped.objects.values_list('apellido', flat=True)), {'Gómez'})
+        self.assertEqual(set(AdminHuesped.objects.values_list('apellido', flat=True)), {'Gómez'})
+        self.assertEqual(Huesped.objects.count(), 4)
+
+
+class PadronHuespedesTests(TestCase):
+    def setUp(self):
+        usuario = User.objects.create_user('titular', 'titular@example.com', 'clave-segura-123')
+        tipo = TipoHabitacion.objects.create(nombre='Doble', precio=100, stock_total=5, stock_disponible=5)
+        hoy = timezone.localdate()
+        self.reserva = Reserva.objects.create(usuario=usuario, tipo_habitacion=tipo,
+                                              check_in=hoy + timedelta(days=1), check_out=hoy + timedelta(days=2))
+        self.padron = AdminHuesped.objects.create(nombre='Ana', apellido='Pérez', dni='12.345.678', telefono='1')
+
+    def test_vincula_por_dni_normalizado(self):
+        resultado = registrar_huespedes(self.reserva, [
+            {'nombre': 'Ana', 'apellido': 'Pérez', 'edad': 30, 'genero': 'F', 'dni': '12345678'},
+        ])
+        self.assertEqual(resultado.padron_actualizados, 1)
+        self.assertEqual(Huesped.objects.get().padron, self.padron)
+        # Se conserva la escritura del padrón y no se duplica el registro
+        self.assertEqual(list(AdminHuesped.objects.values_list('dni', flat=True)), ['12.345.678'])
+
+    def test_vincular_huespedes_completa_filas_existentes(self):
+        Huesped.objects.bulk_create([
+            Huesped(reserva=self.reserva, nombre='Ana', apellido='Pérez', edad=30, genero='F', dni=' 12345678 '),
+            Huesped(reserva=self.reserva, nombre='Luis', apellido='Sosa', edad=40, genero='M', dni='99.999.999'),
+        ])
+        call_command('vincular_huespedes', stdout=io.StringIO())
+        self.assertEqual(
+            list(Huesped.objects.order_by('nombre').values_list('dni_normalizado', 'padron')),
+            [('12345678', self.padron.pk), ('99999999', None)],
+        )
+        self.assertEqual(list(self.padron.estadias.all()), [Huesped.objects.get(nombre='Ana')])
+
+
+class AnaliticaTests(TestCase):
+    def test_matriz_calculada_a_mano(self):
+        dia = {n: date(2026, 3, 1) + timedelta(days=n) for n in range(-1, 7)}
+        # (tipo, check_in, check_out, cantidad, monto)
+        estadias = [
+            (10, dia[-1], dia[2], 1, 300),  # 100 por noche; dentro del período, noches 0 y 1
+            (10, dia[1], dia[4], 1, 150),   # 50 por noche; noches 1, 2 y 3
+            (20, dia[3], dia[6], 2, 600),   # 200 por noche (dos habitaciones); sólo la noche 3
+            (99, dia[0], dia[2], 1, 999),   # tipo no pedido
+            (20, dia[2], dia[2], 1, 80),    # sin noches
+        ]
+        ocupacion = analitica.calcular(dia[0], dia[4], [10, 20], [2, 4], *zip(*estadias))
+        self.assertEqual(ocupacion.vendidas.tolist(), [[1, 2, 1, 1], [0, 0, 0, 2]])
+        self.assertEqual(ocupacion.ingresos.tolist(), [[100, 150, 50, 50], [0, 0, 0, 200]])
+
+        resumen = analitica.resumen(ocupacion, {10: 'Doble', 20: 'Suite'})
+        self.assertEqual(resumen['por_noche']['vendidas'], [1, 2, 1, 3])
+        self.assertEqual(resumen['por_noche']['ocupacion'], [16.7, 33.3, 16.7, 50.0])
+        self.assertEqual(resumen['por_noche']['adr'], [100.0, 75.0, 50.0, 83.33])
+        self.assertEqual(resumen['por_noche']['revpar'], [16.67, 25.0, 8.33, 41.67])
+        self.assertEqual(resumen['total'], {
+            'noches_vendidas': 7, 'noches_disponibles': 24, 'ingresos': 550.0,
+            'ocupacion': 29.2, 'adr': 78.57, 'revpar': 22.92,
+        })
+        doble, suite = resumen['por_tipo']
+        self.assertEqual(
+            (doble['nombre'], doble['noches_vendidas'], doble['ingresos'], doble['ocupacion'], doble['adr'], doble['revpar']),
+            ('Doble', 5, 350.0, 62.5, 70.0, 43.75),
+        )
+        self.assertEqual((suite['ocupacion'], suite['adr'], suite['revpar']), (12.5, 100.0, 12.5))
+        self.assertEqual(suite['por_noche']['adr'], [0.0, 0.0, 0.0, 100.0])
 
-# Create your tests here.
+    def test_sin_estadias(self):
+        ocupacion = analitica.calcular(date(2026, 3, 1), date(2026, 3, 3), [10], [2], [], [], [], [], [])
+        self.assertEqual(analitica.resumen(ocupacion)['total']['ocupacion'], 0.0)
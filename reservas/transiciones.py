@@ -0,0 +1,254 @@
+"""
+Máquina de estados de Reserva:
+
+    pendiente -> confirmada -> activa -> completada
+    pendiente / confirmada -> cancelada
+
+Cada transición es un compare-and-swap: un único
+`UPDATE ... WHERE id = ? AND estado = ?` sin leer antes la fila. Si otra
+petición cambió el estado primero, no se actualiza nada y la transición
+devuelve False. El stock del tipo y el inventario por noche se ajustan en la
+misma transacción.
+
+`transicionar_lote` aplica la misma transición a miles de reservas con unas
+pocas sentencias: un UPDATE por estado de origen, uno de stock por tipo y, en
+el inventario, los deltas por noche de todo el lote sumados en un UPDATE por
+tipo (inventario.aplicar_deltas).
+
+Como los UPDATE no disparan post_save, ambas envían `reservas_transicionadas`
+(dentro de la transacción) con la lista de CambioEstado aplicados.
+"""
+from collections import defaultdict, namedtuple
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, QuerySet
+from django.db.models.functions import Least
+from django.dispatch import Signal
+from django.utils import timezone
+
+from habitaciones import inventario
+from habitaciones.models import TipoHabitacion
+
+
+# accion: (estados de origen, estado destino)
+TRANSICIONES = {
+    'confirmar': (('pendiente',), 'confirmada'),
+    'activar': (('confirmada',), 'activa'),
+    'completar': (('activa',), 'completada'),
+    'cancelar': (('pendiente', 'confirmada'), 'cancelada'),
+}
+
+# Signo del cambio en stock_disponible por (estado anterior, estado nuevo)
+SIGNO_STOCK = {
+    ('pendiente', 'confirmada'): -1,
+    ('confirmada', 'cancelada'): 1,
+    ('activa', 'completada'): 1,
+}
+
+# Estados que descuentan stock_disponible
+ESTADOS_CON_STOCK = ('confirmada', 'activa')
+
+# Resultados por reserva de transicionar_lote
+OK = 'ok'
+NO_ENCONTRADA = 'no encontrada'
+SIN_STOCK = 'sin stock'
+CONFLICTO = 'conflicto'
+
+# Reservas por transacción en transicionar_lote
+TAMANO_LOTE = 500
+
+CambioEstado = namedtuple('CambioEstado', [
+    'reserva_id', 'tipo_habitacion_id', 'fecha_reserva', 'check_in', 'check_out', 'cantidad', 'anterior', 'nuevo',
+])
+
+# Argumento: cambios (lista de CambioEstado)
+reservas_transicionadas = Signal()
+
+
+class _Conflicto(Exception):
+    """Otra petición modificó el lote mientras se procesaba."""
+
+
+def _con_fecha_salida(destino, campos):
+    """Al completar se guarda el día real de salida, hasta donde llega la huella en el inventario."""
+    if destino == 'completada' and 'fecha_salida' not in campos:
+        return dict(campos, fecha_salida=timezone.localdate())
+    return campos
+
+
+def transicionar(reserva, accion, **campos):
+    """
+    Aplica `accion` ('confirmar', 'activar', 'completar', 'cancelar') a una
+    reserva. `campos` se escriben en el mismo UPDATE (p. ej. habitacion_asignada).
+    Devuelve True si la reserva cambió de estado.
+    """
+    from .models import Reserva
+
+    origenes, destino = TRANSICIONES[accion]
+    anterior = reserva.estado
+    if anterior not in origenes:
+        return False
+    campos = _con_fecha_salida(destino, campos)
+    originales = {campo: getattr(reserva, campo) for campo in campos}
+
+    tipo = reserva.tipo_habitacion  # se carga antes de abrir la transacción
+    delta = SIGNO_STOCK.get((anterior, destino), 0) * reserva.cantidad_habitaciones
+    try:
+        with transaction.atomic():
+            if not Reserva.objects.filter(pk=reserva.pk, estado=anterior).update(estado=destino, **campos):
+                return False
+            if delta < 0 and not tipo.reservar_stock(-delta):
+                raise ValidationError(f"No hay suficiente stock disponible para {tipo.nombre}")
+            if delta > 0:
+                tipo.liberar_stock(delta)
+            for campo, valor in campos.items():
+                setattr(reserva, campo, valor)
+            inventario.aplicar_transicion(reserva, anterior, destino)
+            reservas_transicionadas.send(sender=Reserva, cambios=[CambioEstado(
+                reserva.pk, tipo.pk, reserva.fecha_reserva, reserva.check_in, reserva.check_out,
+                reserva.cantidad_habitaciones, anterior, destino,
+            )])
+    except ValidationError:
+        for campo, valor in originales.items():
+            setattr(reserva, campo, valor)
+        return False
+
+    reserva.estado = destino
+    return True
+
+
+def tomar_stock(reserva):
+    """
+    Descuenta stock_disponible para una reserva nueva que ya nace confirmada o
+    activa (p. ej. las del chatbot). ValidationError si el tipo no tiene stock.
+    """
+    if reserva.estado not in ESTADOS_CON_STOCK:
+        return
+    tipo = reserva.tipo_habitacion
+    if not tipo.reservar_stock(reserva.cantidad_habitaciones):
+        raise ValidationError(f"No hay suficiente stock disponible para {tipo.nombre}")
+
+
+def reubicar_stock(reserva, tipo_id, cantidad):
+    """
+    Ajusta stock_disponible cuando una reserva que lo descuenta cambia de tipo
+    o de cantidad (`tipo_id` y `cantidad` son los anteriores). ValidationError
+    si el tipo nuevo no tiene stock.
+    """
+    if reserva.estado not in ESTADOS_CON_STOCK:
+        return
+    if (tipo_id, cantidad) == (reserva.tipo_habitacion_id, reserva.cantidad_habitaciones):
+        return
+    TipoHabitacion.objects.filter(pk=tipo_id).update(
+        stock_disponible=Least(F('stock_disponible') + cantidad, F('stock_total'))
+    )
+    tipo = reserva.tipo_habitacion
+    if not tipo.reservar_stock(reserva.cantidad_habitaciones):
+        raise ValidationError(f"No hay suficiente stock disponible para {tipo.nombre}")
+
+
+def transicionar_lote(reservas, accion, **campos):
+    """
+    Aplica `accion` a un QuerySet o lista de IDs de reservas.
+    Devuelve {id: resultado}, donde resultado es OK, NO_ENCONTRADA, SIN_STOCK,
+    CONFLICTO o el estado actual de las reservas que no admiten la transición.
+    """
+    if isinstance(reservas, QuerySet):
+        ids = list(reservas.values_list('pk', flat=True))
+    else:
+        ids = list(dict.fromkeys(int(i) for i in reservas))
+
+    campos = _con_fecha_salida(TRANSICIONES[accion][1], campos)
+    resultado = {}
+    for inicio in range(0, len(ids), TAMANO_LOTE):
+        parte = ids[inicio:inicio + TAMANO_LOTE]
+        try:
+            resultado.update(_transicionar_parte(parte, accion, campos))
+        except _Conflicto:
+            resultado.update(_transicionar_una_a_una(parte, accion, campos))
+    return resultado
+
+
+@transaction.atomic
+def _transicionar_parte(ids, accion, campos):
+    from .models import Reserva
+
+    origenes, destino = TRANSICIONES[accion]
+    resultado = dict.fromkeys(ids, NO_ENCONTRADA)
+    filas = (
+        Reserva.objects.select_for_update()
+        .filter(pk__in=ids)
+        .values_list('id', 'estado', 'tipo_habitacion_id', 'cantidad_habitaciones', 'check_in', 'check_out', 'fecha_reserva')
+    )
+    candidatas = []
+    for fila in filas:
+        if fila[1] in origenes:
+            candidatas.append(fila)
+        else:
+            resultado[fila[0]] = fila[1]
+    if not candidatas:
+        return resultado
+
+    tipos = TipoHabitacion.objects.select_for_update().in_bulk({fila[2] for fila in candidatas})
+    libres = {pk: (tipo.stock_disponible if tipo.activo else 0) for pk, tipo in tipos.items()}
+    deltas = defaultdict(int)
+    por_origen = defaultdict(list)
+    noches = defaultdict(lambda: defaultdict(int))
+    cambios = []
+    for reserva_id, estado, tipo_id, cantidad, check_in, check_out, fecha_reserva in candidatas:
+        delta = SIGNO_STOCK.get((estado, destino), 0) * cantidad
+        if delta < 0:
+            if libres[tipo_id] < -delta:
+                resultado[reserva_id] = SIN_STOCK
+                continue
+            libres[tipo_id] += delta
+        deltas[tipo_id] += delta
+        por_origen[estado].append(reserva_id)
+        muestra = Reserva(check_in=check_in, check_out=check_out, fecha_salida=campos.get('fecha_salida'))
+        inventario.acumular(noches, tipo_id, inventario.huella(muestra, estado), -cantidad)
+        inventario.acumular(noches, tipo_id, inventario.huella(muestra, destino), cantidad)
+        cambios.append(CambioEstado(reserva_id, tipo_id, fecha_reserva, check_in, check_out, cantidad, estado, destino))
+
+    # Un compare-and-swap por estado de origen
+    for estado, grupo in por_origen.items():
+        if Reserva.objects.filter(pk__in=grupo, estado=estado).update(estado=destino, **campos) != len(grupo):
+            raise _Conflicto
+
+    # Un UPDATE de stock por tipo
+    for tipo_id, delta in deltas.items():
+        if delta < 0:
+            if not TipoHabitacion.objects.filter(pk=tipo_id, stock_disponible__gte=-delta).update(
+                stock_disponible=F('stock_disponible') + delta
+            ):
+                raise _Conflicto
+        elif delta > 0:
+            TipoHabitacion.objects.filter(pk=tipo_id).update(
+                stock_disponible=Least(F('stock_disponible') + delta, F('stock_total'))
+            )
+
+    # Inventario: los deltas por noche de todo el lote, un UPDATE por tipo. Las
+    # transiciones sólo pasan noches de una columna a otra o las liberan, así
+    # que no hace falta el control de lugar de inventario.ocupar()
+    inventario.aplicar_deltas(noches)
+
+    if cambios:
+        reservas_transicionadas.send(sender=Reserva, cambios=cambios)
+    for grupo in por_origen.values():
+        resultado.update(dict.fromkeys(grupo, OK))
+    return resultado
+
+
+def _transicionar_una_a_una(ids, accion, campos):
+    """Camino lento ante un conflicto: cada reserva en su propia transacción."""
+    from .models import Reserva
+
+    resultado = dict.fromkeys(ids, NO_ENCONTRADA)
+    for reserva in Reserva.objects.select_related('tipo_habitacion').filter(pk__in=ids):
+        if reserva.estado not in TRANSICIONES[accion][0]:
+            resultado[reserva.pk] = reserva.estado
+        elif transicionar(reserva, accion, **campos):
+            resultado[reserva.pk] = OK
+        else:
+            resultado[reserva.pk] = SIN_STOCK if accion == 'confirmar' else CONFLICTO
+    return resultado
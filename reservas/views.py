@@ -1,6 +1,7 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from .models import Reserva
+from .models import Reserva, GrupoReserva
 from habitaciones.models import Habitacion, TipoHabitacion
+from . import availability, huespedes, pricing
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from usuarios.decorators import require_login_and_not_blocked
@@ -11,10 +12,11 @@ import json
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.crypto import get_random_string
-from django.core.mail import send_mail
+from administracion import correo
 from django.urls import reverse
 from django.conf import settings
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
 from django.core.serializers.json import DjangoJSONEncoder
 
 from datetime import date, datetime
@@ -31,12 +33,16 @@ def detalle_reserva(request, reserva_id):
     reservation = get_object_or_404(Reserva, id=reserva_id, usuario=request.user)
 
     # Aliases para que el template actual funcione aunque el modelo use otros nombres
-    reservation.room = reservation.habitacion
+    reservation.room = reservation.habitacion_asignada
     reservation.checkin = reservation.check_in
     reservation.checkout = reservation.check_out
     reservation.guests = reservation.cantidad_huespedes
     reservation.total_price = reservation.monto
-    reservation.status = 'confirmed' if reservation.confirmada else 'pending'
+    reservation.status = {
+        'confirmada': 'confirmed',
+        'activa': 'confirmed',
+        'cancelada': 'cancelled',
+    }.get(reservation.estado, 'pending')
 
     # Calcular el número de noches
     try:
@@ -56,20 +62,12 @@ def detalle_reserva(request, reserva_id):
     # Calcular habitaciones disponibles para agregar en las mismas fechas y capacidad
     available_rooms = []
     if reservation.checkin and reservation.checkout:
-        candidate_qs = Habitacion.objects.filter(
-            disponible=True,
-            capacidad__gte=reservation.guests
-        ).exclude(id=reservation.habitacion_id)
-
-        for hab in candidate_qs:
-            # verificar solapamiento con otras reservas de esa habitación
-            overlapping = Reserva.objects.filter(
-                habitacion=hab,
-                check_in__lt=reservation.checkout,
-                check_out__gt=reservation.checkin,
-            ).exists()
-            if not overlapping:
-                available_rooms.append(hab)
+        available_rooms = list(availability.habitaciones_libres(
+            reservation.checkin,
+            reservation.checkout,
+            capacidad_min=reservation.guests,
+            excluir=[reservation.habitacion_asignada_id] if reservation.habitacion_asignada_id else None,
+        ))
 
     context = {
         'reservation': reservation,
@@ -354,18 +352,7 @@ def seleccionar_servicio(request, reserva_id=None):
             servicios_obj = Servicio.objects.filter(id__in=servicios_seleccionados)
             reserva.servicios.add(*servicios_obj)
         
-        # Calcular precio
-        if reserva.check_in and reserva.check_out:
-            noches = (reserva.check_out - reserva.check_in).days or 1
-        else:
-            noches = 1
-        precio_habitacion = reserva.tipo_habitacion.precio * reserva.cantidad_habitaciones * noches
-        precio_servicios = sum(servicio.precio for servicio in reserva.servicios.all())
-        subtotal = precio_habitacion + precio_servicios
-        impuestos = subtotal * Decimal("0.18")
-        precio_total = subtotal + impuestos
-        
-        reserva.monto = precio_total
+        # save() recalcula el monto con los servicios elegidos (reservas/pricing.py)
         reserva.save()
 
         # Redirigir a la página de confirmación con el ID de la reserva
@@ -392,46 +379,34 @@ from datetime import datetime
 
 @require_login_and_not_blocked
 def confirmar_reserva(request, reserva_id):
-    reserva = get_object_or_404(Reserva, id=reserva_id, usuario=request.user)
-
-    noches = 1
-    if reserva.check_in and reserva.check_out:
-        noches = (reserva.check_out - reserva.check_in).days or 1
-
-    precio_habitacion = reserva.tipo_habitacion.precio * reserva.cantidad_habitaciones * noches
-    precio_servicios = sum(servicio.precio for servicio in reserva.servicios.all())
-    subtotal = precio_habitacion + precio_servicios
-
-    if reserva.plan:
-        subtotal += reserva.plan.precio
-
-    descuento = 0
-    if reserva.promocion:
-        descuento = (subtotal * reserva.promocion.descuento) / 100
-        subtotal -= descuento
-
-    impuestos = subtotal * Decimal("0.18")
-    precio_total = subtotal + impuestos
+    reserva = get_object_or_404(
+        Reserva.objects.select_related('tipo_habitacion', 'plan', 'promocion').prefetch_related('servicios'),
+        id=reserva_id, usuario=request.user,
+    )
+    cotizacion = pricing.cotizar_reserva(reserva)
 
     if request.method == "POST":
+        # Sólo una reserva pendiente espera el correo de confirmación; el
+        # estado lo cambian las transiciones (reservas/transiciones.py)
+        if reserva.estado != 'pendiente':
+            messages.info(request, f'La reserva #{reserva.id} ya está {reserva.get_estado_display().lower()}.')
+            return redirect('reservas:mis_reservas')
         metodo_pago = request.POST.get("metodo_pago")
         if metodo_pago:
             reserva.metodo_pago = metodo_pago
-            reserva.monto = precio_total
-            reserva.estado = 'pendiente'  # aún pendiente de confirmar por email
-            reserva.save()
+            reserva.monto = cotizacion.total
 
-            # Enviar correo de confirmación
+            # Encolar correo de confirmación (lo entrega send_outbox)
             confirm_url = request.build_absolute_uri(
                 reverse("reservas:confirmar_reserva_token", args=[reserva.token])
             )
-            send_mail(
-                "Confirma tu reserva",
-                f"Hola {request.user.username}, por favor confirma tu reserva haciendo clic en el siguiente enlace:\n{confirm_url}",
-                settings.DEFAULT_FROM_EMAIL,
-                [request.user.email],
-                fail_silently=False,
-            )
+            with transaction.atomic():
+                reserva.save(update_fields=['metodo_pago', 'monto'])
+                correo.encolar(
+                    "Confirma tu reserva",
+                    f"Hola {request.user.username}, por favor confirma tu reserva haciendo clic en el siguiente enlace:\n{confirm_url}",
+                    [request.user.email],
+                )
 
             # Datos de pago SIMULADO (no se realiza ningún cobro real)
             sim_tx_id = None
@@ -474,25 +449,35 @@ def confirmar_reserva(request, reserva_id):
         "tipo_habitacion": reserva.tipo_habitacion,
         "cantidad_habitaciones": reserva.cantidad_habitaciones,
         "servicios_seleccionados": reserva.servicios.all(),
-        "precio_habitacion": precio_habitacion,
-        "precio_servicios": precio_servicios,
-        "descuento": descuento,
-        "impuestos": impuestos,
-        "precio_total": precio_total,
-        "noches": noches,
+        "precio_habitacion": cotizacion.habitacion,
+        "precio_servicios": cotizacion.servicios,
+        "descuento": cotizacion.descuento,
+        "impuestos": cotizacion.impuestos,
+        "precio_total": cotizacion.total,
+        "noches": cotizacion.noches,
         "simulate_payments": getattr(settings, "SIMULATE_PAYMENTS", False),
     })
 
 @login_required
+@transaction.atomic
 def confirmar_reserva_token(request, token):
-    reserva = get_object_or_404(Reserva, token=token, usuario=request.user)
-    reserva.estado = 'confirmada'
-    reserva.save()
+    reserva = get_object_or_404(Reserva.objects.select_related('grupo'), token=token, usuario=request.user)
+    if reserva.estado == 'pendiente':
+        # Una reserva grupal se confirma completa (todas sus reservas) o no se confirma
+        if reserva.grupo_id:
+            confirmada = reserva.grupo.confirmar(metodo_pago=reserva.metodo_pago)
+            if confirmada:
+                reserva.refresh_from_db(fields=['estado'])
+        else:
+            confirmada = reserva.confirmar()
+        if not confirmada:
+            messages.error(request, f'No hay disponibilidad suficiente para confirmar la reserva de {reserva.tipo_habitacion.nombre}.')
+            return redirect('reservas:mis_reservas')
 
     # Generar código de seguridad para check-in si no existe
     if not getattr(reserva, 'codigo_checkin', None):
         reserva.codigo_checkin = get_random_string(6, allowed_chars='ABCDEFGHJKLMNPQRSTUVWXYZ23456789')
-        reserva.save()
+        reserva.save(update_fields=['codigo_checkin'])
 
     # Enviar correo con detalles de la reserva y código de check-in
     try:
@@ -531,108 +516,22 @@ def confirmar_reserva_token(request, token):
             f"Gracias por elegirnos.\n"
         )
 
-        send_mail(
-            "Reserva confirmada: código de check-in",
-            cuerpo,
-            settings.DEFAULT_FROM_EMAIL,
-            [request.user.email],
-            fail_silently=False,
-        )
+        correo.encolar("Reserva confirmada: código de check-in", cuerpo, [request.user.email])
     except Exception:
-        # No bloquear la confirmación si falla el envío de email
+        # No bloquear la confirmación si falla el armado del email
         pass
     
-    # Procesar tipos adicionales si existen
-    tipos_adicionales = request.session.get('tipos_adicionales', [])
-    if tipos_adicionales:
-        for tipo_id, qty in tipos_adicionales:
-            try:
-                tipo = TipoHabitacion.objects.get(id=tipo_id)
-                # Crear reserva adicional
-                nueva_reserva = Reserva.objects.create(
-                    usuario=request.user,
-                    tipo_habitacion=tipo,
-                    cantidad_habitaciones=qty,
-                    check_in=reserva.check_in,
-                    check_out=reserva.check_out,
-                    cantidad_huespedes=reserva.cantidad_huespedes,
-                    estado='confirmada',
-                    metodo_pago=reserva.metodo_pago,
-                    token=get_random_string(64),
-                )
-                # Calcular monto
-                noches = (reserva.check_out - reserva.check_in).days or 1
-                precio_total = tipo.precio * qty * noches
-                impuestos = precio_total * Decimal('0.18')
-                nueva_reserva.monto = precio_total + impuestos
-                nueva_reserva.save()
-                
-                # Reservar stock
-                tipo.reservar_stock(qty)
-                
-                # Copiar huéspedes de la reserva principal a la nueva
-                try:
-                    for h in Huesped.objects.filter(reserva=reserva):
-                        Huesped.objects.create(
-                            reserva=nueva_reserva,
-                            nombre=h.nombre,
-                            apellido=h.apellido,
-                            edad=h.edad,
-                            genero=h.genero,
-                            dni=h.dni,
-                        )
-                        # asegurar que exista el huésped en administración por DNI
-                        try:
-                            if h.dni:
-                                admin_h, _ = AdminHuesped.objects.get_or_create(
-                                    dni=h.dni,
-                                    defaults={
-                                        'nombre': h.nombre,
-                                        'apellido': h.apellido,
-                                        'telefono': '',
-                                        'email': '',
-                                    }
-                                )
-                                admin_h.nombre = h.nombre
-                                admin_h.apellido = h.apellido
-                                admin_h.save()
-                        except Exception:
-                            pass
-                except Exception:
-                    pass
-            except TipoHabitacion.DoesNotExist:
-                pass
-        
-        # Limpiar la sesión
-        del request.session['tipos_adicionales']
-    
-    noches = 1
-    if reserva.check_in and reserva.check_out:
-        try:
-            noches = (reserva.check_out - reserva.check_in).days or 1
-        except Exception:
-            noches = 1
-    precio_habitacion = reserva.tipo_habitacion.precio * reserva.cantidad_habitaciones * noches
-    precio_servicios = sum(s.precio for s in reserva.servicios.all())
-    subtotal = precio_habitacion + precio_servicios
-    if reserva.plan:
-        subtotal += reserva.plan.precio
-    descuento = 0
-    if reserva.promocion:
-        descuento = (subtotal * reserva.promocion.descuento) / 100
-        subtotal -= descuento
-    impuestos = subtotal * Decimal('0.18')
-    precio_total = subtotal + impuestos
+    cotizacion = pricing.cotizar_reserva(reserva)
 
     return render(request, 'reservas/reserva_confirmada.html', {
         'reserva': reserva,
         'simulate_payments': getattr(settings, "SIMULATE_PAYMENTS", False),
-        'noches': noches,
-        'precio_habitacion': precio_habitacion,
-        'precio_servicios': precio_servicios,
-        'descuento': descuento,
-        'impuestos': impuestos,
-        'precio_total': precio_total,
+        'noches': cotizacion.noches,
+        'precio_habitacion': cotizacion.habitacion,
+        'precio_servicios': cotizacion.servicios,
+        'descuento': cotizacion.descuento,
+        'impuestos': cotizacion.impuestos,
+        'precio_total': cotizacion.total,
     })
 
 @login_required
@@ -727,18 +626,7 @@ def agregar_reservas_multiples(request):
                 nueva.servicios.add(*servicios_copiar)
 
         # Calcular monto
-        nights = (base_reserva.check_out - base_reserva.check_in).days or 1
-        precio_habitacion = hab.precio * nights
-        precio_servicios = sum(s.precio for s in nueva.servicios.all())
-        subtotal = precio_habitacion + precio_servicios
-        if base_reserva.plan:
-            subtotal += base_reserva.plan.precio
-        if base_reserva.promocion:
-            descuento = (subtotal * base_reserva.promocion.descuento) / 100
-            subtotal -= descuento
-        impuestos = subtotal * Decimal('0.18')
-        total = subtotal + impuestos
-        nueva.monto = total
+        nueva.monto = pricing.cotizar_reserva(nueva).total
         nueva.save()
 
         created_ids.append(nueva.id)
@@ -783,29 +671,9 @@ def seleccionar_tipos(request):
         messages.error(request, 'Fechas inválidas.')
         return redirect('reservas:seleccionar_huespedes')
 
-    # Obtener todos los tipos de habitaciones activos
-    tipos = TipoHabitacion.objects.filter(activo=True).order_by('precio')
-
-    # Calcular disponibilidad por tipo en el rango de fechas
-    disponibles = {}
-    # Asegurar lista para anotación y filtrado posterior
-    tipos_list = list(tipos)
-    for tipo in tipos_list:
-        # Contar reservas que se solapan con las fechas solicitadas
-        reservas_solapadas = Reserva.objects.filter(
-            tipo_habitacion=tipo,
-            check_in__lt=check_out,
-            check_out__gt=check_in,
-            estado__in=['confirmada', 'activa']
-        ).aggregate(total=models.Sum('cantidad_habitaciones'))['total'] or 0
-        disponibles[tipo.id] = max(0, tipo.stock_disponible - reservas_solapadas)
-
-    # Anotar cada tipo con su stock disponible para el template
-    for tipo in tipos_list:
-        tipo.stock_disponible_fechas = disponibles.get(tipo.id, 0)
-
-    # Filtrar para mostrar solo tipos con stock en las fechas
-    tipos = [t for t in tipos_list if t.stock_disponible_fechas > 0]
+    # Tipos activos con stock en las fechas (anotados con stock_disponible_fechas)
+    tipos = availability.tipos_disponibles(check_in, check_out)
+    disponibles = {t.id: t.stock_disponible_fechas for t in tipos}
     if request.method == 'POST':
         # Recoger cantidades solicitadas
         seleccion = []  # lista de (tipo_habitacion_obj, cantidad)
@@ -853,80 +721,51 @@ def seleccionar_tipos(request):
                 'fecha_salida': fecha_salida,
             })
 
-        # Crear reservas con el nuevo modelo
-        noches = (check_out - check_in).days or 1
-        created = []
-        
-        # Crear una sola reserva para el primer tipo seleccionado
-        # (para mantener el flujo de selección de servicios y confirmación)
-        tipo, qty = seleccion[0]
-        reserva = Reserva.objects.create(
-            usuario=request.user,
-            tipo_habitacion=tipo,
-            cantidad_habitaciones=qty,
-            check_in=check_in,
-            check_out=check_out,
-            cantidad_huespedes=int(numero_huespedes),
-            estado='pendiente',
-            token=get_random_string(64),
-        )
-        
-        # Calcular monto inicial (se actualizará en pasos posteriores)
-        precio_total = tipo.precio * qty * noches
-        impuestos = precio_total * Decimal('0.18')
-        reserva.monto = precio_total + impuestos
-        reserva.save()
+        # Un solo tipo: una reserva. Varios tipos: una reserva grupal con una
+        # reserva por tipo, creadas juntas; la primera sigue el flujo de
+        # servicios y confirmación y lleva los huéspedes.
+        try:
+            if len(seleccion) > 1:
+                grupo, reservas_grupo = GrupoReserva.crear(
+                    request.user, check_in, check_out, int(numero_huespedes), seleccion,
+                )
+                reserva = reservas_grupo[0]
+            else:
+                tipo, qty = seleccion[0]
+                reserva = Reserva.objects.create(
+                    usuario=request.user,
+                    tipo_habitacion=tipo,
+                    cantidad_habitaciones=qty,
+                    check_in=check_in,
+                    check_out=check_out,
+                    cantidad_huespedes=int(numero_huespedes),
+                    estado='pendiente',
+                    token=get_random_string(64),
+                )
+        except ValidationError:
+            # Otra reserva tomó las últimas habitaciones mientras se completaba el formulario
+            messages.error(request, 'Ya no quedan suficientes habitaciones de los tipos elegidos para esas fechas.')
+            return render(request, 'reservas/seleccionar_tipos.html', {
+                'tipos': tipos,
+                'disponibles': disponibles,
+                'numero_huespedes': numero_huespedes,
+                'fecha_entrada': fecha_entrada,
+                'fecha_salida': fecha_salida,
+            })
         
-        # Reservar stock
-        tipo.reservar_stock(qty)
+        # El monto inicial lo calcula save() (se actualizará en pasos posteriores)
+        # Las noches quedan retenidas en el inventario al crear la reserva pendiente;
+        # el stock se reserva al confirmarla.
         
         # Guardar huéspedes capturados en sesión dentro de la reserva
-        try:
-            huespedes_session = request.session.get('huespedes', [])
-            if huespedes_session:
-                for data in huespedes_session:
-                    if not data:
-                        continue
-                    Huesped.objects.create(
-                        reserva=reserva,
-                        nombre=data.get('nombre', ''),
-                        apellido=data.get('apellido', ''),
-                        edad=data.get('edad') or 0,
-                        genero=data.get('genero', 'O'),
-                        dni=data.get('dni', ''),
-                    )
-                    # asegurar que exista el huésped en administración por DNI
-                    try:
-                        dni_val = data.get('dni', '').strip()
-                        if dni_val:
-                            admin_h, _ = AdminHuesped.objects.get_or_create(
-                                dni=dni_val,
-                                defaults={
-                                    'nombre': data.get('nombre', ''),
-                                    'apellido': data.get('apellido', ''),
-                                    'telefono': '',
-                                    'email': '',
-                                }
-                            )
-                            # si existe, actualizar nombre/apellido si han cambiado
-                            admin_h.nombre = data.get('nombre', admin_h.nombre)
-                            admin_h.apellido = data.get('apellido', admin_h.apellido)
-                            admin_h.save()
-                    except Exception:
-                        pass
-            # limpiar dato de sesión para evitar duplicados
-            del request.session['huespedes']
-        except Exception:
-            # En caso de que no existan datos de huéspedes, continuar sin bloquear el flujo
-            pass
+        # (y en el padrón de administración por DNI), en bloque
+        huespedes_session = request.session.pop('huespedes', [])
+        if huespedes_session:
+            huespedes.registrar_huespedes(reserva, huespedes_session)
         
         # Guardar el ID de la reserva en la sesión para el siguiente paso
         request.session['reserva_id'] = reserva.id
         
-        # Si hay más tipos seleccionados, los guardamos para procesarlos después
-        if len(seleccion) > 1:
-            request.session['tipos_adicionales'] = [(t.id, q) for t, q in seleccion[1:]]
-        
         # Redirigir a la selección de servicios
         return redirect('reservas:seleccionar_servicio_con_id', reserva_id=reserva.id)
 
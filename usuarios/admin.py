@@ -60,14 +60,14 @@ class UserAdmin(BaseUserAdmin):
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'phone', 'city', 'country', 'is_blocked', 'created_at', 'blocked_status')
-    list_filter = ('is_blocked', 'created_at', 'city', 'country')
+    list_filter = ('is_blocked', 'notifications_enabled', 'created_at', 'city', 'country')
     search_fields = ('user__username', 'user__email', 'phone', 'city', 'country')
     readonly_fields = ('created_at', 'blocked_at', 'blocked_by')
     ordering = ('-created_at',)
     
     fieldsets = (
         ('Información Personal', {
-            'fields': ('user', 'avatar', 'phone', 'address', 'city', 'country')
+            'fields': ('user', 'avatar', 'phone', 'address', 'city', 'country', 'notifications_enabled')
         }),
         ('Sistema de Bloqueo', {
             'fields': ('is_blocked', 'blocked_at', 'blocked_by', 'block_reason'),
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+
+def copiar_preferencias(apps, schema_editor):
+    """notifications_enabled = preferences.get('notifications_enabled', True) (como se leía antes)."""
+    Profile = apps.get_model('usuarios', 'Profile')
+    desactivados = [
+        pk
+        for pk, prefs in Profile.objects.exclude(preferences=None).values_list('pk', 'preferences').iterator(chunk_size=2000)
+        if isinstance(prefs, dict) and not prefs.get('notifications_enabled', True)
+    ]
+    for inicio in range(0, len(desactivados), 1000):
+        Profile.objects.filter(pk__in=desactivados[inicio:inicio + 1000]).update(notifications_enabled=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0003_profile_two_factor_enabled_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='notifications_enabled',
+            field=models.BooleanField(db_index=True, default=True, verbose_name='Notificaciones por email'),
+        ),
+        migrations.RunPython(copiar_preferencias, migrations.RunPython.noop),
+    ]
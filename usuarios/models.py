@@ -12,6 +12,8 @@ class Profile(models.Model):
     city = models.CharField(max_length=100, blank=True, null=True)
     country = models.CharField(max_length=100, blank=True, null=True)
     preferences = models.JSONField(default=dict, blank=True, null=True)
+    # Suscripción a planes y promociones por email (espejo indexado de preferences['notifications_enabled'])
+    notifications_enabled = models.BooleanField(default=True, db_index=True, verbose_name="Notificaciones por email")
 
     # Campos de 2FA
     two_factor_enabled = models.BooleanField(default=False)
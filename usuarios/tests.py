@@ -1,3 +1,26 @@
+import importlib
+
+from django.apps import apps
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-# Create your tests here.
+from .models import Profile
+
+
+class NotificacionesTests(TestCase):
+    def test_migracion_copia_la_preferencia_guardada(self):
+        migracion = importlib.import_module('usuarios.migrations.0004_profile_notifications_enabled')
+        for nombre, preferencias in (
+            ('apagado', {'notifications_enabled': False}),
+            ('encendido', {'notifications_enabled': True}),
+            ('sin_clave', {'tema': 'oscuro'}),
+            ('sin_preferencias', None),
+        ):
+            usuario = User.objects.create_user(nombre, f'{nombre}@example.com', 'clave-segura-123')
+            Profile.objects.filter(user=usuario).update(preferences=preferencias)
+
+        migracion.copiar_preferencias(apps, None)
+        self.assertEqual(
+            dict(Profile.objects.values_list('user__username', 'notifications_enabled')),
+            {'apagado': False, 'encendido': True, 'sin_clave': True, 'sin_preferencias': True},
+        )
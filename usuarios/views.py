@@ -2,14 +2,14 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth import login, logout, update_session_auth_hash, authenticate
 from django.contrib.auth.models import User
-from .forms import RegistroForm, ProfileForm
+from .forms import RegistroForm, ProfileForm, PasswordResetEncoladoForm
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib.auth.views import PasswordResetView, PasswordResetDoneView, PasswordResetConfirmView, PasswordResetCompleteView
 from django.urls import reverse_lazy
 from django.contrib import messages
-from django.core.mail import send_mail
-from django.conf import settings
+from django.db import transaction
+from administracion import correo
 from django.utils import timezone
 import random
 
@@ -137,12 +137,8 @@ def profile(request):
             'average_spent': Decimal('0'),
         }
     
-    # Estado actual de notificaciones (desde JSON preferences)
-    try:
-        prefs = profile.preferences or {}
-    except Exception:
-        prefs = {}
-    notifications_enabled = prefs.get('notifications_enabled', True)
+    # Estado actual de notificaciones
+    notifications_enabled = getattr(profile, 'notifications_enabled', True)
     
     context = {
         'page_title': 'Mi Perfil - Hotel Elegante',
@@ -189,10 +185,11 @@ def logout_view(request):
     return redirect('index')
 
 class CustomPasswordResetView(PasswordResetView):
+    form_class = PasswordResetEncoladoForm
     template_name = 'password_reset.html'
     email_template_name = 'registration/password_reset_email.html'
     subject_template_name = 'registration/password_reset_subject.txt'
-    success_url = reverse_lazy('password_reset_done')
+    success_url = reverse_lazy('usuarios:password_reset_done')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -211,7 +208,7 @@ class CustomPasswordResetDoneView(PasswordResetDoneView):
 
 class CustomPasswordResetConfirmView(PasswordResetConfirmView):
     template_name = 'password_reset_confirm.html'
-    success_url = reverse_lazy('password_reset_complete')
+    success_url = reverse_lazy('usuarios:password_reset_complete')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -286,21 +283,18 @@ def enable_two_factor(request):
         profile.two_factor_pending_code = code
         profile.two_factor_enabled = False
         profile.two_factor_last_sent_at = timezone.now()
-        profile.save()
-        # Enviar email con el código si hay email
+        # Encolar email con el código si hay email (lo entrega send_outbox)
         if request.user.email:
-            try:
-                send_mail(
-                    subject='Código de verificación 2FA - Hotel Elegante',
-                    message=f'Tu código de verificación es: {code}',
-                    from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', None),
-                    recipient_list=[request.user.email],
-                    fail_silently=True,
+            with transaction.atomic():
+                profile.save()
+                correo.encolar(
+                    'Código de verificación 2FA - Hotel Elegante',
+                    f'Tu código de verificación es: {code}',
+                    [request.user.email],
                 )
-                messages.info(request, 'Te enviamos un código a tu correo.')
-            except Exception:
-                messages.warning(request, 'No se pudo enviar el email. Ingresa el código mostrado si aplica.')
+            messages.info(request, 'Te enviamos un código a tu correo.')
         else:
+            profile.save()
             messages.warning(request, 'No tienes email configurado. Contacta soporte para completar 2FA.')
         return redirect('usuarios:verify_two_factor_page')
     return redirect('usuarios:profile')
@@ -373,7 +367,8 @@ def toggle_notifications(request):
         enabled = new_value == 'on' or new_value == 'true' or new_value == '1'
         prefs['notifications_enabled'] = enabled
         profile.preferences = prefs
-        profile.save()
+        profile.notifications_enabled = enabled
+        profile.save(update_fields=['preferences', 'notifications_enabled'])
         
         if enabled:
             messages.success(request, 'Has activado las notificaciones y promociones por email.')